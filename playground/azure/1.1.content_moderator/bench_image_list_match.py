@@ -0,0 +1,119 @@
+"""
+Benchmark - Local Pre-Filter vs All-Remote Image List Matching
+Builds a synthetic image list, then matches a stream of candidates (re-encoded
+list images mixed with unrelated ones) both ways. No Azure credentials are
+needed: the service is a call counter with a fixed simulated latency.
+"""
+
+import argparse
+import io
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from image_list_hash_index import ImageListHashIndex, PrefilteredMatcher, image_phash
+
+LIST_ID = "bench"
+
+
+class FakeImageModeration:
+    """Stands in for ``image_moderation``; the ground truth rides in the JPEG comment."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def match_file_input(self, image_stream, list_id):
+        self.calls += 1
+        with Image.open(image_stream) as image:
+            origin = image.info.get("comment", b"").decode()
+        is_match = origin.startswith("list-")
+        return SimpleNamespace(
+            as_dict=lambda: {
+                "is_match": is_match,
+                "matches": [origin] if is_match else [],
+            }
+        )
+
+
+def _base_image(rng: np.random.Generator, size: int = 128) -> Image.Image:
+    coarse = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC)
+
+
+def _reencode(image: Image.Image, rng: random.Random, origin: str) -> bytes:
+    """Simulate a repost of ``image``: rescale, brightness tweak, lossy JPEG."""
+    scale = rng.uniform(0.6, 1.0)
+    variant = image.resize((int(image.width * scale), int(image.height * scale)))
+    variant = ImageEnhance.Brightness(variant).enhance(rng.uniform(0.9, 1.1))
+    buffer = io.BytesIO()
+    variant.save(buffer, "JPEG", quality=rng.randint(50, 95), comment=origin.encode())
+    return buffer.getvalue()
+
+
+def build_corpus(
+    list_size: int, queries: int, match_ratio: float, seed: int = 11
+) -> Tuple[List[Image.Image], List[Tuple[bool, bytes]]]:
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    listed = [_base_image(np_rng) for _ in range(list_size)]
+    candidates = []
+    for i in range(queries):
+        if rng.random() < match_ratio:
+            j = rng.randrange(list_size)
+            candidates.append((True, _reencode(listed[j], rng, f"list-{j}")))
+        else:
+            candidates.append((False, _reencode(_base_image(np_rng), rng, f"new-{i}")))
+    return listed, candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--list-size", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--match-ratio", type=float, default=0.1)
+    parser.add_argument("--remote-latency-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    listed, candidates = build_corpus(args.list_size, args.queries, args.match_ratio)
+    index = ImageListHashIndex(Path(tempfile.mkdtemp()) / "hashes.json")
+    started = time.perf_counter()
+    for content_id, image in enumerate(listed):
+        index.add(LIST_ID, str(content_id), image_phash(image))
+    build_s = time.perf_counter() - started
+
+    service = FakeImageModeration()
+    matcher = PrefilteredMatcher(
+        LIST_ID, index, SimpleNamespace(image_moderation=service)
+    )
+    missed = 0
+    started = time.perf_counter()
+    for expected, data in candidates:
+        result = matcher.match_bytes(data)
+        missed += expected and not result["is_match"]
+    local_s = time.perf_counter() - started
+
+    latency_s = args.remote_latency_ms / 1000
+    all_remote_s = len(candidates) * latency_s
+    prefilter_s = local_s + service.calls * latency_s
+    print(f"List: {len(listed)} images (hashed in {build_s:.1f}s)")
+    matcher.stats.print()
+    print("\n--- Matching Cost ---")
+    print(
+        f"All remote:  {len(candidates)} calls, ~{all_remote_s:.1f}s "
+        f"at {args.remote_latency_ms:.0f} ms/call"
+    )
+    print(
+        f"Pre-filter:  {service.calls} calls, ~{prefilter_s:.1f}s "
+        f"(local work {local_s * 1000 / len(candidates):.2f} ms/query)"
+    )
+    print(f"True matches answered 'no match' locally: {missed}")
+
+
+if __name__ == "__main__":
+    main()
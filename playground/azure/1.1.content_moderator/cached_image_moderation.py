@@ -0,0 +1,308 @@
+"""
+Azure Content Moderator - Upload-Once Image Moderation
+Sends each image to the service once with CacheImage=true, records the returned
+cache ID in a local ledger and runs the remaining checks (evaluate, OCR,
+find-faces, list matching) against the cached copy instead of the URL.
+"""
+
+import argparse
+import io
+import json
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import requests
+from azure.cognitiveservices.vision.contentmoderator import ContentModeratorClient
+from azure.cognitiveservices.vision.contentmoderator.models import APIErrorException
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+from image_moderation_pipeline import DEFAULT_CONCURRENCY, IMAGE_LIST
+from moderator_client import create_moderator_client
+
+DEFAULT_LEDGER_PATH = Path(__file__).resolve().parent / ".image_cache_ledger.json"
+# Stay well inside the service's retention window for cached images.
+DEFAULT_CACHE_TTL_SECONDS = 15 * 60
+CACHED_CHECKS = ("ocr", "faces", "match")
+
+
+class CacheLedger:
+    """Thread-safe, JSON-persisted map of image source → live service cache ID."""
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_LEDGER_PATH,
+        ttl_seconds: float = DEFAULT_CACHE_TTL_SECONDS,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+        self.purge_expired()
+
+    def get(self, source: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(source)
+            if entry is None:
+                return None
+            if entry["expires_at"] <= time.time():
+                del self._entries[source]
+                return None
+            return entry["cache_id"]
+
+    def put(self, source: str, cache_id: str) -> None:
+        with self._lock:
+            self._entries[source] = {
+                "cache_id": cache_id,
+                "expires_at": time.time() + self.ttl_seconds,
+            }
+
+    def forget(self, source: str) -> None:
+        with self._lock:
+            self._entries.pop(source, None)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, v in self._entries.items() if v["expires_at"] <= now]
+            for source in expired:
+                del self._entries[source]
+        return len(expired)
+
+    def save(self) -> None:
+        with self._lock:
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            tmp.replace(self.path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@dataclass
+class UploadOnceStats:
+    images: int = 0
+    uploads: int = 0
+    bytes_uploaded: int = 0
+    ledger_hits: int = 0
+    cached_calls: int = 0
+    fallback_calls: int = 0
+
+    def print(self, checks_per_image: int) -> None:
+        per_check = self.images * checks_per_image
+        print("\n--- Upload-Once Moderation ---")
+        print(f"Images: {self.images}, checks per image: {checks_per_image}")
+        print(
+            f"Image transfers: {self.uploads + self.fallback_calls} "
+            f"({self.bytes_uploaded / 1024:.0f} KB) vs {per_check} when sent per check"
+        )
+        print(
+            f"Ledger hits: {self.ledger_hits}, calls on cached copy: "
+            f"{self.cached_calls}, fallbacks to local bytes: {self.fallback_calls}"
+        )
+
+
+class UploadOnceModerator:
+    """Runs several Content Moderator checks on one image with a single upload.
+
+    The first call uploads the bytes with ``CacheImage=true`` and doubles as
+    the evaluate check. Follow-up checks use the body-less operations with the
+    returned ``CacheID``. If the service refuses a cache ID (for example after
+    it expired early), the image bytes already held in memory are sent again
+    rather than letting the service re-fetch the URL.
+    """
+
+    def __init__(
+        self,
+        client: Optional[ContentModeratorClient] = None,
+        ledger: Optional[CacheLedger] = None,
+        list_id: Optional[str] = None,
+    ):
+        self.client = client or create_moderator_client()
+        self.ledger = ledger or CacheLedger()
+        self.list_id = list_id
+        self.stats = UploadOnceStats()
+        self._stats_lock = threading.Lock()
+
+    def _count(self, **increments: int) -> None:
+        with self._stats_lock:
+            for name, value in increments.items():
+                setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    @staticmethod
+    def fetch_bytes(source: str) -> bytes:
+        """Read a local file or download a URL exactly once."""
+        if source.startswith(("http://", "https://")):
+            response = requests.get(source, timeout=30)
+            response.raise_for_status()
+            return response.content
+        return Path(source).read_bytes()
+
+    def _call_cached(self, operation, cache_id: str, model: str, **query) -> dict:
+        """Invoke a body-less ProcessImage operation against a cached image."""
+        ops = self.client.image_moderation
+        url = ops._client.format_url(
+            operation.metadata["url"], Endpoint=self.client.config.endpoint
+        )
+        query_parameters = {"CacheID": cache_id}
+        for name, value in query.items():
+            if value is not None:
+                query_parameters[name] = (
+                    str(value).lower() if isinstance(value, bool) else str(value)
+                )
+        request = ops._client.post(
+            url, query_parameters, {"Accept": "application/json"}
+        )
+        response = ops._client.send(request, stream=False)
+        if response.status_code != 200:
+            raise APIErrorException(ops._deserialize, response)
+        return ops._deserialize(model, response).as_dict()
+
+    def _upload(self, source: str, data: bytes) -> dict:
+        evaluation = self.client.image_moderation.evaluate_file_input(
+            image_stream=io.BytesIO(data), cache_image=True
+        )
+        self._count(uploads=1, bytes_uploaded=len(data))
+        if evaluation.cache_id:
+            self.ledger.put(source, evaluation.cache_id)
+        return evaluation.as_dict()
+
+    def _run_cached(self, check: str, cache_id: str) -> dict:
+        ops = self.client.image_moderation
+        if check == "evaluate":
+            return self._call_cached(ops.evaluate_method, cache_id, "Evaluate")
+        if check == "ocr":
+            return self._call_cached(ops.ocr_method, cache_id, "OCR", language="eng")
+        if check == "faces":
+            return self._call_cached(ops.find_faces, cache_id, "FoundFaces")
+        if check == "match":
+            return self._call_cached(
+                ops.match_method, cache_id, "MatchResponse", listId=self.list_id
+            )
+        raise ValueError(f"Unknown check: {check}")
+
+    def _run_with_bytes(self, check: str, data: bytes) -> dict:
+        ops = self.client.image_moderation
+        stream = io.BytesIO(data)
+        if check == "evaluate":
+            result = ops.evaluate_file_input(image_stream=stream)
+        elif check == "ocr":
+            result = ops.ocr_file_input(language="eng", image_stream=stream)
+        elif check == "faces":
+            result = ops.find_faces_file_input(image_stream=stream)
+        elif check == "match":
+            result = ops.match_file_input(image_stream=stream, list_id=self.list_id)
+        else:
+            raise ValueError(f"Unknown check: {check}")
+        self._count(bytes_uploaded=len(data))
+        return result.as_dict()
+
+    def moderate(self, source: str, checks: Sequence[str] = CACHED_CHECKS) -> dict:
+        """Return ``{"source", "evaluate", <check>..., "errors"}`` for one image."""
+        record: dict = {"source": source, "errors": {}}
+        data: Optional[bytes] = None
+        cache_id = self.ledger.get(source)
+
+        try:
+            if cache_id is not None:
+                self._count(ledger_hits=1)
+                try:
+                    record["evaluate"] = self._run_cached("evaluate", cache_id)
+                    self._count(cached_calls=1)
+                except APIErrorException:
+                    self.ledger.forget(source)
+                    cache_id = None
+            if cache_id is None:
+                data = self.fetch_bytes(source)
+                record["evaluate"] = self._upload(source, data)
+                cache_id = self.ledger.get(source)
+        except (HttpOperationError, ClientRequestError, requests.RequestException) as e:
+            record["errors"]["evaluate"] = str(e)
+            self._count(images=1)
+            return record
+
+        for check in checks:
+            if check == "match" and not self.list_id:
+                continue
+            try:
+                if cache_id is not None:
+                    try:
+                        record[check] = self._run_cached(check, cache_id)
+                        self._count(cached_calls=1)
+                        continue
+                    except APIErrorException:
+                        # The cached copy is gone; stop relying on it.
+                        self.ledger.forget(source)
+                        cache_id = None
+                if data is None:
+                    data = self.fetch_bytes(source)
+                record[check] = self._run_with_bytes(check, data)
+                self._count(fallback_calls=1)
+            except (
+                HttpOperationError,
+                ClientRequestError,
+                requests.RequestException,
+            ) as e:
+                record["errors"][check] = str(e)
+
+        self._count(images=1)
+        return record
+
+    def moderate_many(
+        self,
+        sources: Iterable[str],
+        checks: Sequence[str] = CACHED_CHECKS,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> Iterator[dict]:
+        """Moderate many images in parallel, yielding records as each finishes.
+
+        Sources are consumed lazily and at most ``2 * concurrency`` images are
+        in flight, so memory stays flat however many are given.
+        """
+        pending = iter(sources)
+        running: set = set()
+        window = 2 * concurrency
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+
+            def refill() -> None:
+                for source in pending:
+                    running.add(pool.submit(self.moderate, source, checks))
+                    if len(running) >= window:
+                        return
+
+            refill()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.discard(future)
+                    yield future.result()
+                refill()
+        self.ledger.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("images", nargs="*", help="image URLs or local paths")
+    parser.add_argument("--list-id", help="image list to match against")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    args = parser.parse_args()
+
+    moderator = UploadOnceModerator(list_id=args.list_id)
+    checks: List[str] = [c for c in CACHED_CHECKS if c != "match" or args.list_id]
+    for record in moderator.moderate_many(
+        args.images or IMAGE_LIST, checks, args.concurrency
+    ):
+        print(json.dumps(record))
+    moderator.stats.print(checks_per_image=1 + len(checks))
+
+
+if __name__ == "__main__":
+    main()
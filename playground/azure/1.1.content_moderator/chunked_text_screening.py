@@ -0,0 +1,345 @@
+"""
+Azure Content Moderator - Chunked Text Screening
+Screens documents larger than the screen_text request limit: the file is read as
+a stream, split on whitespace into overlapping chunks that are screened
+concurrently, and every term, PII and autocorrect hit is reported as a JSONL
+event with offsets into the original document. Hits seen twice in an overlap
+are reported once.
+"""
+
+import argparse
+import io
+import json
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from azure.cognitiveservices.vision.contentmoderator import ContentModeratorClient
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+from moderator_client import (
+    DEFAULT_RATE_PER_SECOND,
+    MAX_ATTEMPTS,
+    RateLimiter,
+    create_moderator_client,
+)
+
+MAX_CHUNK_CHARS = 1024  # screen_text accepts at most 1,024 characters
+DEFAULT_OVERLAP = 128
+DEFAULT_CONCURRENCY = 8
+READ_BLOCK_CHARS = 64 * 1024
+PII_KINDS = ("email", "ssn", "ipa", "phone", "address")
+
+
+@dataclass
+class TextChunk:
+    """A slice of the document; ``text[:context]`` repeats the previous chunk."""
+
+    index: int
+    start: int
+    text: str
+    context: int
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+
+def _last_space(text: str, lo: int, hi: int) -> int:
+    """Index just after the last whitespace in ``text[lo:hi]``, or -1."""
+    for i in range(hi - 1, lo - 1, -1):
+        if text[i].isspace():
+            return i + 1
+    return -1
+
+
+def _first_token_start(text: str, lo: int, hi: int) -> int:
+    """First index in ``[lo, hi)`` that follows whitespace, or -1."""
+    for i in range(max(lo, 1), hi):
+        if text[i - 1].isspace() and not text[i].isspace():
+            return i
+    return -1
+
+
+def iter_chunks(
+    stream: TextIO,
+    max_chars: int = MAX_CHUNK_CHARS,
+    overlap: int = DEFAULT_OVERLAP,
+) -> Iterator[TextChunk]:
+    """Split a text stream into whitespace-aligned chunks of at most ``max_chars``.
+
+    Each chunk after the first starts with up to ``overlap`` characters of the
+    previous one, beginning on a token boundary. Only about one read block is
+    held in memory at a time.
+    """
+    if not 0 <= overlap < max_chars // 2:
+        raise ValueError("overlap must be smaller than half of max_chars")
+    buffer, buffer_start = "", 0  # buffer[0] is document offset buffer_start
+    start, context, index, eof = 0, 0, 0, False
+    while True:
+        while not eof and len(buffer) - (start - buffer_start) < max_chars + 1:
+            block = stream.read(READ_BLOCK_CHARS)
+            eof = not block
+            buffer += block
+        local = start - buffer_start
+        remaining = len(buffer) - local
+        if remaining <= context:
+            return
+        if remaining <= max_chars:
+            cut = len(buffer)
+        else:
+            hi = local + max_chars
+            # Prefer to cut on whitespace, but never give up more than half a chunk.
+            cut = _last_space(buffer, local + max_chars // 2, hi)
+            cut = hi if cut < 0 else cut
+        yield TextChunk(index, start, buffer[local:cut], context)
+        if cut == len(buffer) and eof:
+            return
+
+        next_local = _first_token_start(buffer, max(cut - overlap, local + 1), cut)
+        next_local = cut if next_local < 0 else next_local
+        context = cut - next_local
+        start = buffer_start + next_local
+        index += 1
+        if next_local > READ_BLOCK_CHARS:
+            buffer, buffer_start = buffer[next_local:], start
+
+
+@dataclass
+class Hit:
+    """One term, PII or autocorrect finding with document offsets."""
+
+    kind: str
+    start: int
+    text: str
+    details: dict = field(default_factory=dict)
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+    def as_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "index": self.start,
+            "text": self.text,
+            **self.details,
+        }
+
+
+def _corrections(chunk: TextChunk, corrected: Optional[str]) -> List[Hit]:
+    """Token-align the autocorrected chunk with the original to locate edits."""
+    if not corrected or corrected == chunk.text:
+        return []
+    original_tokens: List[Tuple[int, str]] = []
+    position = 0
+    for token in chunk.text.split():
+        position = chunk.text.index(token, position)
+        original_tokens.append((position, token))
+        position += len(token)
+    corrected_tokens = corrected.split()
+    if len(corrected_tokens) != len(original_tokens):
+        return []  # not a token-for-token correction; nothing reliable to report
+    return [
+        Hit("autocorrect", chunk.start + pos, token, {"corrected": fixed})
+        for (pos, token), fixed in zip(original_tokens, corrected_tokens)
+        if token != fixed
+    ]
+
+
+def chunk_hits(chunk: TextChunk, screen: dict) -> List[Hit]:
+    """Turn one screen_text answer into hits with document offsets."""
+    hits = []
+    for term in screen.get("terms") or []:
+        position = term.get("original_index", term.get("index", 0))
+        details = {"list_id": term.get("list_id")}
+        hits.append(Hit("term", chunk.start + position, term["term"], details))
+    pii = screen.get("pii") or {}
+    for kind in PII_KINDS:
+        for item in pii.get(kind) or []:
+            details = {k: v for k, v in item.items() if k not in ("index", "text")}
+            hits.append(Hit(kind, chunk.start + item["index"], item["text"], details))
+    hits.extend(_corrections(chunk, screen.get("auto_corrected_text")))
+    return sorted(hits, key=lambda hit: hit.start)
+
+
+class HitMerger:
+    """Drops overlap duplicates while keeping only recent hits in memory.
+
+    Two hits of the same kind whose spans intersect describe the same finding
+    seen from two chunks; the longer one wins, since the earlier chunk may
+    have seen only the part of a multi-token PII match that fit in it.
+    """
+
+    def __init__(self):
+        self._pending: List[Hit] = []
+        self.duplicates = 0
+
+    def push(self, chunk: TextChunk, hits: List[Hit]) -> Iterator[Hit]:
+        # Only hits from earlier chunks can be twins; distinct findings within
+        # one chunk may legitimately overlap.
+        carried, fresh = self._pending, []
+        for hit in hits:
+            twin = next(
+                (
+                    i
+                    for i, old in enumerate(carried)
+                    if old.kind == hit.kind
+                    and old.start < hit.end
+                    and hit.start < old.end
+                ),
+                None,
+            )
+            if twin is None:
+                fresh.append(hit)
+                continue
+            self.duplicates += 1
+            if len(hit.text) > len(carried[twin].text):
+                carried[twin] = hit
+        # Chunk starts only increase, so hits ending before this chunk's start
+        # can no longer gain a twin, however far later chunks reach back.
+        pending = carried + fresh
+        settled = [hit for hit in pending if hit.end <= chunk.start]
+        self._pending = [hit for hit in pending if hit.end > chunk.start]
+        yield from sorted(settled, key=lambda hit: hit.start)
+
+    def flush(self) -> Iterator[Hit]:
+        yield from sorted(self._pending, key=lambda hit: hit.start)
+        self._pending = []
+
+
+@dataclass
+class ScreeningStats:
+    chunks: int = 0
+    characters: int = 0
+    failed_chunks: int = 0
+    hits: Dict[str, int] = field(default_factory=dict)
+    duplicates_dropped: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float = 0.0
+
+    def print(self) -> None:
+        elapsed = max(self.finished_at - self.started_at, 1e-9)
+        print("\n--- Chunked Screening ---", file=sys.stderr)
+        print(
+            f"Chunks: {self.chunks} ({self.failed_chunks} failed), "
+            f"{self.characters} characters in {elapsed:.2f}s",
+            file=sys.stderr,
+        )
+        print(
+            f"Hits: {self.hits or 'none'}, "
+            f"overlap duplicates dropped: {self.duplicates_dropped}",
+            file=sys.stderr,
+        )
+
+
+class ChunkedScreener:
+    """Screens chunks concurrently and emits hits in document order."""
+
+    def __init__(
+        self,
+        client: Optional[ContentModeratorClient] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        language: str = "eng",
+        autocorrect: bool = True,
+        pii: bool = True,
+        list_id: Optional[str] = None,
+    ):
+        self.client = client or create_moderator_client()
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate_per_second)
+        self.options = {
+            "language": language,
+            "autocorrect": autocorrect,
+            "pii": pii,
+            "list_id": list_id,
+        }
+
+    def screen_chunk(self, chunk: TextChunk) -> dict:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.limiter.wait()
+            try:
+                return self.client.text_moderation.screen_text(
+                    text_content_type="text/plain",
+                    text_content=io.BytesIO(chunk.text.encode("utf-8")),
+                    **self.options,
+                ).as_dict()
+            except (HttpOperationError, ClientRequestError) as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if status not in (None, 429, 500, 503) or attempt == MAX_ATTEMPTS:
+                    raise
+                time.sleep(2 ** (attempt - 1) + random.uniform(0, 0.5))
+        raise AssertionError("unreachable")
+
+    def screen(
+        self,
+        chunks: Iterator[TextChunk],
+        stats: Optional[ScreeningStats] = None,
+    ) -> Iterator[dict]:
+        """Yield hit and error events chunk by chunk, in document order per chunk."""
+        stats = stats or ScreeningStats()
+        merger = HitMerger()
+        window: Deque[Tuple[TextChunk, Future]] = deque()
+
+        def emit(hits: Iterator[Hit]) -> Iterator[dict]:
+            for hit in hits:
+                stats.hits[hit.kind] = stats.hits.get(hit.kind, 0) + 1
+                yield hit.as_dict()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            pending = iter(chunks)
+            while True:
+                # A bounded window keeps memory flat for arbitrarily long input.
+                while len(window) < self.concurrency * 2:
+                    chunk = next(pending, None)
+                    if chunk is None:
+                        break
+                    window.append((chunk, pool.submit(self.screen_chunk, chunk)))
+                if not window:
+                    break
+                chunk, future = window.popleft()
+                stats.chunks += 1
+                stats.characters += len(chunk.text) - chunk.context
+                try:
+                    hits = chunk_hits(chunk, future.result())
+                except (HttpOperationError, ClientRequestError) as e:
+                    stats.failed_chunks += 1
+                    hits = []
+                    yield {"kind": "error", "index": chunk.start, "error": str(e)}
+                yield from emit(merger.push(chunk, hits))
+        yield from emit(merger.flush())
+        stats.duplicates_dropped = merger.duplicates
+        stats.finished_at = time.perf_counter()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("path", help="UTF-8 text file to screen")
+    parser.add_argument("-o", "--output", help="JSONL file for hits (default stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--overlap", type=int, default=DEFAULT_OVERLAP)
+    parser.add_argument("--list-id", help="custom term list to screen against")
+    args = parser.parse_args()
+
+    screener = ChunkedScreener(concurrency=args.concurrency, list_id=args.list_id)
+    stats = ScreeningStats()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        # newline="" keeps \r\n intact so offsets match the file on disk.
+        with open(args.path, "r", encoding="utf-8", newline="") as f:
+            chunks = iter_chunks(f, overlap=args.overlap)
+            for event in screener.screen(chunks, stats):
+                out.write(json.dumps(event) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    stats.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Azure Content Moderator - Local Image List Pre-Filter
+Keeps a perceptual hash of every image added to a custom image list and answers
+match requests locally when no list image is perceptually close; only near-hits
+are sent to match_file_input for confirmation.
+"""
+
+import argparse
+import io
+import json
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import combinations
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import requests
+from azure.cognitiveservices.vision.contentmoderator import ContentModeratorClient
+from msrest.exceptions import ClientRequestError, HttpOperationError
+from PIL import Image
+
+from moderator_client import create_moderator_client
+
+DEFAULT_HASH_PATH = Path(__file__).resolve().parent / ".image_list_hashes.json"
+# Generous on purpose: a local miss is final, so the filter must not be stricter
+# than the service's own matching. Re-encodes and resizes land well below this.
+DEFAULT_MAX_DISTANCE = 10
+BLOCKS = 4  # 64-bit hash → four 16-bit blocks for multi-index hashing
+BLOCK_BITS = 64 // BLOCKS
+PHASH_SAMPLE = 32
+
+
+# Sample folders are self-contained; this is the same DCT pHash as
+# 1.2.content_safety/near_dedup.py, so hashes from either one compare equal.
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(PHASH_SAMPLE)
+
+
+def phash_batch(gray: np.ndarray) -> np.ndarray:
+    """64-bit DCT perceptual hashes of an (N, 32, 32) grayscale stack."""
+    low = (_DCT @ gray @ _DCT.T)[:, :8, :8].reshape(len(gray), -1)
+    bits = low > np.median(low[:, 1:], axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view(">u8").reshape(-1).astype(np.uint64)
+
+
+def image_phash(image: Image.Image) -> int:
+    image.draft("L", (PHASH_SAMPLE * 4, PHASH_SAMPLE * 4))
+    small = image.convert("L").resize(
+        (PHASH_SAMPLE, PHASH_SAMPLE), Image.Resampling.LANCZOS
+    )
+    return int(phash_batch(np.asarray(small, dtype=np.float32)[None])[0])
+
+
+def bytes_phash(data: bytes) -> int:
+    with Image.open(io.BytesIO(data)) as image:
+        return image_phash(image)
+
+
+def fetch_bytes(url: str) -> bytes:
+    response = requests.get(url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+
+def _blocks(image_hash: int) -> List[int]:
+    mask = (1 << BLOCK_BITS) - 1
+    return [(image_hash >> (i * BLOCK_BITS)) & mask for i in range(BLOCKS)]
+
+
+class MultiIndexHash:
+    """Multi-index hashing over 64-bit hashes (Norouzi et al.).
+
+    The hash is split into ``BLOCKS`` substrings with one table each. Two
+    hashes within distance ``d`` agree to within ``d // BLOCKS`` bits on at
+    least one block, so probing each table with that small radius finds every
+    candidate; candidates are then verified with a vectorized popcount.
+    """
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE):
+        self.max_distance = max_distance
+        radius = max_distance // BLOCKS
+        self._flips = [0] + [
+            sum(1 << bit for bit in bits)
+            for r in range(1, radius + 1)
+            for bits in combinations(range(BLOCK_BITS), r)
+        ]
+        self._tables: List[Dict[int, List[int]]] = [
+            defaultdict(list) for _ in range(BLOCKS)
+        ]
+        self._hashes: List[int] = []
+        self._payloads: List[object] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, image_hash: int, payload) -> None:
+        with self._lock:
+            slot = len(self._hashes)
+            self._hashes.append(image_hash)
+            self._payloads.append(payload)
+            for table, block in zip(self._tables, _blocks(image_hash)):
+                table[block].append(slot)
+
+    def near(self, image_hash: int) -> List[Tuple[int, object]]:
+        """Return ``(distance, payload)`` of every entry within range, closest first."""
+        with self._lock:
+            slots: Set[int] = set()
+            for table, block in zip(self._tables, _blocks(image_hash)):
+                for flip in self._flips:
+                    slots.update(table.get(block ^ flip, ()))
+            if not slots:
+                return []
+            ordered = sorted(slots)
+            candidates = np.fromiter(
+                (self._hashes[s] for s in ordered), np.uint64, len(ordered)
+            )
+            payloads = [self._payloads[s] for s in ordered]
+        distances = np.bitwise_count(candidates ^ np.uint64(image_hash))
+        keep = np.flatnonzero(distances <= self.max_distance)
+        return sorted((int(distances[i]), payloads[i]) for i in keep)
+
+
+class ImageListHashIndex:
+    """Per-list perceptual hashes of list images, persisted as JSON."""
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_HASH_PATH,
+        max_distance: int = DEFAULT_MAX_DISTANCE,
+    ):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._hashes: Dict[str, Dict[str, str]] = {}  # list_id → content_id → hex
+        self._indexes: Dict[str, MultiIndexHash] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                self._hashes = json.load(f)
+            for list_id, entries in self._hashes.items():
+                index = self._index(list_id)
+                for content_id, hex_hash in entries.items():
+                    index.add(int(hex_hash, 16), content_id)
+
+    def _index(self, list_id: str) -> MultiIndexHash:
+        with self._lock:
+            if list_id not in self._indexes:
+                self._indexes[list_id] = MultiIndexHash(self.max_distance)
+            return self._indexes[list_id]
+
+    def add(self, list_id: str, content_id: str, image_hash: int) -> None:
+        with self._lock:
+            entries = self._hashes.setdefault(list_id, {})
+            if content_id in entries:
+                return
+            entries[content_id] = f"{image_hash:016x}"
+        self._index(list_id).add(image_hash, content_id)
+
+    def add_bytes(self, list_id: str, content_id: str, data: bytes) -> None:
+        self.add(list_id, content_id, bytes_phash(data))
+
+    def loader_hook(self, list_id: str):
+        """``on_added`` callback for ``ImageListLoader`` that hashes each new image."""
+
+        def on_added(url: str, content_id: str, label: str) -> None:
+            try:
+                self.add_bytes(list_id, content_id, fetch_bytes(url))
+            except (requests.RequestException, OSError) as e:
+                # Without a hash the filter would miss this image; say so loudly.
+                print(f"Unable to hash list image {url}: {e}")
+
+        return on_added
+
+    def covers(self, list_id: str, content_ids: Iterable[str]) -> bool:
+        """True when every remote list image has a local hash."""
+        with self._lock:
+            known = self._hashes.get(list_id, {})
+        return all(str(cid) in known for cid in content_ids)
+
+    def near(self, list_id: str, image_hash: int) -> List[Tuple[int, object]]:
+        return self._index(list_id).near(image_hash)
+
+    def save(self) -> None:
+        with self._lock:
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(self._hashes, f)
+            tmp.replace(self.path)
+
+
+@dataclass
+class PrefilterStats:
+    queries: int = 0
+    local_misses: int = 0
+    remote_calls: int = 0
+    remote_matches: int = 0
+
+    def print(self) -> None:
+        print("\n--- Local Pre-Filter ---")
+        print(
+            f"Queries: {self.queries}, answered locally: {self.local_misses}, "
+            f"sent to service: {self.remote_calls} "
+            f"({self.remote_matches} confirmed)"
+        )
+
+
+class PrefilteredMatcher:
+    """``match_url_input`` replacement that skips the service on clear misses.
+
+    Only valid while the hash index covers every image in the list; check with
+    ``ImageListHashIndex.covers`` after loading images from another source.
+    """
+
+    def __init__(
+        self,
+        list_id: str,
+        index: ImageListHashIndex,
+        client: Optional[ContentModeratorClient] = None,
+    ):
+        self.list_id = list_id
+        self.index = index
+        self.client = client or create_moderator_client()
+        self.stats = PrefilterStats()
+        self._lock = threading.Lock()
+
+    def match_bytes(self, data: bytes) -> dict:
+        candidates = self.index.near(self.list_id, bytes_phash(data))
+        with self._lock:
+            self.stats.queries += 1
+            if not candidates:
+                self.stats.local_misses += 1
+        if not candidates:
+            return {"is_match": False, "matches": [], "source": "local"}
+
+        result = self.client.image_moderation.match_file_input(
+            image_stream=io.BytesIO(data), list_id=self.list_id
+        ).as_dict()
+        with self._lock:
+            self.stats.remote_calls += 1
+            self.stats.remote_matches += bool(result.get("is_match"))
+        result["source"] = "service"
+        result["local_candidates"] = [
+            {"content_id": cid, "distance": d} for d, cid in candidates
+        ]
+        return result
+
+    def match_url(self, image_url: str) -> dict:
+        # Download once: the same bytes are hashed and, on a near-hit, uploaded.
+        return self.match_bytes(fetch_bytes(image_url))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("list_id", help="image list loaded via image_list_loader")
+    parser.add_argument("urls", nargs="+", help="image URLs to match")
+    parser.add_argument("--max-distance", type=int, default=DEFAULT_MAX_DISTANCE)
+    args = parser.parse_args()
+
+    client = create_moderator_client()
+    index = ImageListHashIndex(max_distance=args.max_distance)
+    remote = client.list_management_image.get_all_image_ids(list_id=args.list_id)
+    if not index.covers(args.list_id, remote.content_ids or []):
+        raise SystemExit(
+            "Some list images have no local hash; reload them with "
+            "image_list_loader.py --hash before pre-filtering."
+        )
+
+    matcher = PrefilteredMatcher(args.list_id, index, client)
+    for url in args.urls:
+        try:
+            print(json.dumps({"url": url, **matcher.match_url(url)}))
+        except (HttpOperationError, ClientRequestError, requests.RequestException) as e:
+            print(json.dumps({"url": url, "error": str(e)}))
+    matcher.stats.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+Azure Content Moderator - Bulk Image List Loader
+Adds many images to a custom image list concurrently under a request-rate limit,
+persists the URL → content_id index so reruns skip images already present, waits
+for the list by polling instead of sleeping, and refreshes the index once.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from azure.cognitiveservices.vision.contentmoderator import ContentModeratorClient
+from azure.cognitiveservices.vision.contentmoderator.models import APIErrorException
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+from image_list_hash_index import ImageListHashIndex
+from moderator_client import (
+    DEFAULT_RATE_PER_SECOND,
+    MAX_ATTEMPTS,
+    RateLimiter,
+    create_moderator_client,
+)
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent / ".image_list_index.json"
+DEFAULT_CONCURRENCY = 8
+SAVE_EVERY = 50
+
+IMAGE_LIST = {
+    "Sports": [
+        "https://media.istockphoto.com/id/1550540247/photo/decision-thinking-and-asian-man-in-studio-with-glasses-questions-and-brainstorming-on-grey.jpg?s=2048x2048&w=is&k=20&c=AHKcPCjnl3pP21Kl9G8JA4N22lZLICuoyKlJTHU9D-E="
+    ]
+}
+
+
+class ImageListIndex:
+    """JSON-persisted ``{list_id: {url: content_id}}`` map."""
+
+    def __init__(self, path: Path = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._lists: Dict[str, Dict[str, str]] = {}
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                self._lists = json.load(f)
+
+    def images(self, list_id: str) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._lists.get(list_id, {}))
+
+    def add(self, list_id: str, url: str, content_id: str) -> None:
+        with self._lock:
+            self._lists.setdefault(list_id, {})[url] = content_id
+
+    def retain(self, list_id: str, content_ids: Iterable[str]) -> int:
+        """Drop entries whose images no longer exist remotely; return how many."""
+        alive = set(content_ids)
+        with self._lock:
+            entries = self._lists.get(list_id, {})
+            stale = [url for url, cid in entries.items() if cid not in alive]
+            for url in stale:
+                del entries[url]
+        return len(stale)
+
+    def forget_list(self, list_id: str) -> None:
+        with self._lock:
+            self._lists.pop(list_id, None)
+
+    def save(self) -> None:
+        with self._lock:
+            tmp = self.path.with_suffix(".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(self._lists, f, indent=1)
+            tmp.replace(self.path)
+
+
+@dataclass
+class LoadReport:
+    requested: int = 0
+    skipped: int = 0
+    added: int = 0
+    failed: int = 0
+    pruned: int = 0
+    retries: int = 0
+    elapsed_s: float = 0.0
+
+    def print(self) -> None:
+        print("\n--- Image List Load ---")
+        print(
+            f"Requested: {self.requested}, already present: {self.skipped}, "
+            f"added: {self.added}, failed: {self.failed}"
+        )
+        print(f"Stale index entries pruned: {self.pruned}, retries: {self.retries}")
+        rate = self.added / self.elapsed_s if self.elapsed_s else 0.0
+        print(f"Elapsed: {self.elapsed_s:.1f}s → {rate:.2f} images/s")
+
+
+def _is_throttled(e: Exception) -> bool:
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None) in (429, 500, 503)
+
+
+def create_image_list(
+    client: ContentModeratorClient, name: str, description: str = ""
+) -> str:
+    custom_list = client.list_management_image_lists.create(
+        content_type="application/json",
+        body={"name": name, "description": description},
+    )
+    return str(custom_list.id)
+
+
+def wait_until_ready(
+    client: ContentModeratorClient, list_id: str, timeout_s: float = 30.0
+) -> None:
+    """Poll the list details with backoff until the service can serve the list."""
+    delay, deadline = 0.25, time.monotonic() + timeout_s
+    while True:
+        try:
+            client.list_management_image_lists.get_details(list_id=list_id)
+            return
+        except APIErrorException:
+            if time.monotonic() + delay > deadline:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 4.0)
+
+
+class ImageListLoader:
+    """Concurrent, rate-limited, resumable loader for one image list."""
+
+    def __init__(
+        self,
+        list_id: str,
+        client: Optional[ContentModeratorClient] = None,
+        index: Optional[ImageListIndex] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        on_added: Optional[Callable[[str, str, str], None]] = None,
+    ):
+        self.list_id = list_id
+        self.client = client or create_moderator_client()
+        self.index = index or ImageListIndex()
+        self.concurrency = concurrency
+        self.limiter = RateLimiter(rate_per_second)
+        self.on_added = on_added
+        self.report = LoadReport()
+        self._lock = threading.Lock()
+
+    def _add_one(self, url: str, label: str) -> Optional[str]:
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.limiter.wait()
+            try:
+                image = self.client.list_management_image.add_image_url_input(
+                    list_id=self.list_id,
+                    content_type="application/json",
+                    data_representation="URL",
+                    value=url,
+                    label=label,
+                )
+                return str(image.content_id)
+            except (HttpOperationError, ClientRequestError) as e:
+                retryable = isinstance(e, ClientRequestError) or _is_throttled(e)
+                if not retryable or attempt == MAX_ATTEMPTS:
+                    print(f"Unable to add image {url} to list: {e}")
+                    return None
+                with self._lock:
+                    self.report.retries += 1
+                time.sleep(2 ** (attempt - 1) + random.uniform(0, 0.5))
+        return None
+
+    def _worker(self, job: Tuple[str, str]) -> None:
+        url, label = job
+        content_id = self._add_one(url, label)
+        with self._lock:
+            if content_id is None:
+                self.report.failed += 1
+                return
+            self.report.added += 1
+            save_now = self.report.added % SAVE_EVERY == 0
+        self.index.add(self.list_id, url, content_id)
+        if self.on_added:
+            self.on_added(url, content_id, label)
+        if save_now:
+            self.index.save()
+
+    def load(self, images: Dict[str, List[str]], verify: bool = True) -> LoadReport:
+        """Add every ``{label: [urls]}`` image not yet in the list, then refresh."""
+        started = time.perf_counter()
+        if verify:
+            # One listing call catches images deleted outside this tool.
+            remote = self.client.list_management_image.get_all_image_ids(
+                list_id=self.list_id
+            )
+            self.report.pruned = self.index.retain(
+                self.list_id, (str(cid) for cid in remote.content_ids or [])
+            )
+
+        known = self.index.images(self.list_id)
+        jobs = []
+        for label, urls in images.items():
+            for url in urls:
+                self.report.requested += 1
+                if url in known:
+                    self.report.skipped += 1
+                else:
+                    jobs.append((url, label))
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                list(pool.map(self._worker, jobs))
+        finally:
+            self.index.save()
+
+        if self.report.added:
+            self.client.list_management_image_lists.refresh_index_method(
+                list_id=self.list_id
+            )
+        self.report.elapsed_s = time.perf_counter() - started
+        return self.report
+
+
+def load_url_file(path: Path, label: str) -> Dict[str, List[str]]:
+    """Read ``url`` or ``url<TAB>label`` lines into ``{label: [urls]}``."""
+    images: Dict[str, List[str]] = {}
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            url, _, line_label = line.partition("\t")
+            images.setdefault(line_label or label, []).append(url)
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--list-id", help="existing image list (created if omitted)")
+    parser.add_argument("--name", default="MyList", help="name for a new list")
+    parser.add_argument("-f", "--file", type=Path, help="url[<TAB>label] per line")
+    parser.add_argument("--label", default="Default", help="label for unlabeled URLs")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_SECOND)
+    parser.add_argument(
+        "--hash", action="store_true", help="record perceptual hashes for pre-filtering"
+    )
+    args = parser.parse_args()
+
+    client = create_moderator_client()
+    list_id = args.list_id
+    if not list_id:
+        list_id = create_image_list(client, args.name, "Bulk-loaded image list")
+        print(f"Created list {list_id}")
+    wait_until_ready(client, list_id)
+
+    images = load_url_file(args.file, args.label) if args.file else IMAGE_LIST
+    hashes = ImageListHashIndex() if args.hash else None
+    loader = ImageListLoader(
+        list_id,
+        client,
+        None,
+        args.concurrency,
+        args.rate,
+        on_added=hashes.loader_hook(list_id) if hashes else None,
+    )
+    loader.load(images).print()
+    if hashes:
+        hashes.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Azure Content Moderator - Parallel Image Moderation Pipeline
+Runs evaluate, OCR and find-faces for many images concurrently over one client and
+merges the three answers into a single record per image.
+"""
+
+import argparse
+import json
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+    Set,
+)
+
+from azure.cognitiveservices.vision.contentmoderator import ContentModeratorClient
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+from moderator_client import create_moderator_client
+
+DEFAULT_CONCURRENCY = 8
+CHECKS = ("evaluate", "ocr", "faces")
+
+IMAGE_LIST = [
+    "https://content.api.news/v3/images/bin/756692568a236c94619b202e9b68687a?width=650",
+    "https://mockuptree.com/wp-content/uploads/edd/2022/01/minecraft-text-effect-psd.jpg",
+    "https://media.istockphoto.com/id/1550540247/photo/decision-thinking-and-asian-man-in-studio-with-glasses-questions-and-brainstorming-on-grey.jpg?s=2048x2048&w=is&k=20&c=AHKcPCjnl3pP21Kl9G8JA4N22lZLICuoyKlJTHU9D-E=",
+]
+
+
+def evaluate_url(client: ContentModeratorClient, image_url: str):
+    return client.image_moderation.evaluate_url_input(
+        content_type="application/json", data_representation="URL", value=image_url
+    )
+
+
+def ocr_url(client: ContentModeratorClient, image_url: str):
+    return client.image_moderation.ocr_url_input(
+        language="eng",
+        content_type="application/json",
+        data_representation="URL",
+        value=image_url,
+    )
+
+
+def find_faces_url(client: ContentModeratorClient, image_url: str):
+    return client.image_moderation.find_faces_url_input(
+        content_type="application/json", data_representation="URL", value=image_url
+    )
+
+
+CHECK_FUNCTIONS: Dict[str, Callable] = {
+    "evaluate": evaluate_url,
+    "ocr": ocr_url,
+    "faces": find_faces_url,
+}
+
+
+@dataclass
+class ImageRecord:
+    """Merged answers of every check run for one image."""
+
+    url: str
+    results: Dict[str, dict] = field(default_factory=dict)
+    errors: Dict[str, str] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+    latency_ms: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "url": self.url,
+            **self.results,
+            "errors": self.errors,
+            "latency_ms": round(self.latency_ms, 2),
+        }
+
+
+@dataclass
+class PipelineStats:
+    images: int = 0
+    calls: int = 0
+    failed_calls: int = 0
+    call_time_s: float = 0.0  # sum of call latencies, i.e. the sequential cost
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: float = 0.0
+
+    def print(self) -> None:
+        elapsed = max(self.finished_at - self.started_at, 1e-9)
+        print("\n--- Moderation Pipeline ---")
+        print(
+            f"Images: {self.images}, calls: {self.calls} "
+            f"({self.failed_calls} failed)"
+        )
+        print(
+            f"Elapsed: {elapsed:.2f}s → {self.images / elapsed:.2f} images/s, "
+            f"{self.calls / elapsed:.2f} calls/s"
+        )
+        print(
+            f"Sequential call time: {self.call_time_s:.2f}s "
+            f"(speedup x{self.call_time_s / elapsed:.1f})"
+        )
+
+
+def _run_check(client: ContentModeratorClient, check: str, image_url: str) -> tuple:
+    started = time.perf_counter()
+    try:
+        result = CHECK_FUNCTIONS[check](client, image_url).as_dict()
+        error = None
+    except (HttpOperationError, ClientRequestError) as e:
+        result, error = None, str(e)
+    return result, error, time.perf_counter() - started
+
+
+def moderate_images(
+    image_urls: Iterable[str],
+    checks: Sequence[str] = CHECKS,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    client: Optional[ContentModeratorClient] = None,
+    stats: Optional[PipelineStats] = None,
+) -> Iterator[ImageRecord]:
+    """Yield one merged record per image as soon as all of its checks finish.
+
+    Every (image, check) pair is an independent call; at most ``concurrency``
+    of them are in flight, so the checks of one image overlap with each other
+    and with those of the following images.
+    """
+    if not checks:
+        raise ValueError("At least one check is required")
+    unknown = set(checks) - CHECK_FUNCTIONS.keys()
+    if unknown:
+        raise ValueError(f"Unknown checks: {sorted(unknown)}")
+
+    client = client or create_moderator_client()
+    stats = stats or PipelineStats()
+    urls = iter(image_urls)
+    backlog: Deque[tuple] = deque()  # (record, check) pairs not yet submitted
+    remaining: Dict[int, int] = {}  # id(record) → checks still running
+    in_flight: Dict[Future, tuple] = {}
+
+    def refill(pool: ThreadPoolExecutor) -> None:
+        while len(in_flight) < concurrency:
+            if not backlog:
+                url = next(urls, None)
+                if url is None:
+                    return
+                record = ImageRecord(url=url)
+                remaining[id(record)] = len(checks)
+                backlog.extend((record, check) for check in checks)
+            record, check = backlog.popleft()
+            future = pool.submit(_run_check, client, check, record.url)
+            in_flight[future] = (record, check)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        refill(pool)
+        while in_flight:
+            done: Set[Future] = wait(in_flight, return_when=FIRST_COMPLETED)[0]
+            for future in done:
+                record, check = in_flight.pop(future)
+                result, error, elapsed = future.result()
+                stats.calls += 1
+                stats.call_time_s += elapsed
+                if error:
+                    stats.failed_calls += 1
+                    record.errors[check] = error
+                else:
+                    record.results[check] = result
+                remaining[id(record)] -= 1
+                if remaining[id(record)] == 0:
+                    del remaining[id(record)]
+                    record.latency_ms = (time.perf_counter() - record.started_at) * 1000
+                    stats.images += 1
+                    yield record
+            refill(pool)
+    stats.finished_at = time.perf_counter()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("urls", nargs="*", help="image URLs (defaults to samples)")
+    parser.add_argument("-f", "--file", help="text file with one image URL per line")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--checks", default=",".join(CHECKS), help="comma-separated subset of checks"
+    )
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip()]
+    else:
+        urls = args.urls or IMAGE_LIST
+
+    stats = PipelineStats()
+    for record in moderate_images(
+        urls, args.checks.split(","), args.concurrency, stats=stats
+    ):
+        print(json.dumps(record.as_dict()))
+    stats.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Azure Content Moderator - shared client factory
+"""
+
+import os
+import threading
+import time
+
+from azure.cognitiveservices.vision.contentmoderator import ContentModeratorClient
+from msrest.authentication import CognitiveServicesCredentials
+
+try:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+except ImportError:
+    pass
+
+CONTENT_MODERATOR_ENDPOINT = os.getenv("CONTENT_MODERATOR_ENDPOINT")
+CONTENT_MODERATOR_KEY = os.getenv("CONTENT_MODERATOR_KEY")
+
+DEFAULT_RATE_PER_SECOND = 10.0  # S0 tier limit; use 1 on the free tier
+MAX_ATTEMPTS = 5
+
+
+def create_moderator_client() -> ContentModeratorClient:
+    """Initialize and return the Content Moderator client."""
+    if not CONTENT_MODERATOR_ENDPOINT or not CONTENT_MODERATOR_KEY:
+        raise EnvironmentError("Content Moderator endpoint or key is missing.")
+
+    return ContentModeratorClient(
+        endpoint=CONTENT_MODERATOR_ENDPOINT,
+        credentials=CognitiveServicesCredentials(CONTENT_MODERATOR_KEY),
+    )
+
+
+class RateLimiter:
+    """Spaces calls evenly so no more than ``rate`` start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
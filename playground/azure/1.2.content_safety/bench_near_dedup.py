@@ -0,0 +1,157 @@
+"""
+Benchmark - Near-Duplicate Suppression
+Runs the text and image dedup gates over a synthetic corpus of reposts, light
+edits and re-encodes, and reports how many service calls they avoid. No Azure
+credentials are needed: the service is replaced by a call counter.
+"""
+
+import argparse
+import io
+import random
+import string
+import time
+from typing import List, Tuple
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from near_dedup import ImageDedupGate, TextDedupGate, image_hashes
+
+VOCABULARY = [
+    "".join(
+        random.Random(i).choices(
+            string.ascii_lowercase, k=random.Random(-i).randint(3, 9)
+        )
+    )
+    for i in range(2000)
+]
+
+
+def _edit_text(text: str, rng: random.Random) -> str:
+    """Simulate copy-paste spam: a few typos, casing and trailing noise."""
+    chars = list(text)
+    for _ in range(rng.randint(0, 3)):
+        chars[rng.randrange(len(chars))] = rng.choice(string.ascii_lowercase)
+    edited = "".join(chars)
+    if rng.random() < 0.3:
+        edited = edited.upper()
+    if rng.random() < 0.5:
+        edited += rng.choice(["!!!", " :)", " 🔥", " ...", " click now"])
+    return edited
+
+
+def synthetic_texts(
+    count: int, base_count: int, duplicate_ratio: float, seed: int = 7
+) -> List[Tuple[int, str]]:
+    """Return ``(cluster_id, text)`` pairs; edits of a base share its cluster."""
+    rng = random.Random(seed)
+    bases = [
+        " ".join(rng.choices(VOCABULARY, k=rng.randint(12, 40)))
+        for _ in range(base_count)
+    ]
+    corpus = []
+    for i in range(count):
+        if rng.random() < duplicate_ratio:
+            cluster = rng.randrange(base_count)
+            corpus.append((cluster, _edit_text(bases[cluster], rng)))
+        else:
+            unique = " ".join(rng.choices(VOCABULARY, k=rng.randint(12, 40)))
+            corpus.append((base_count + i, unique))
+    return corpus
+
+
+def _base_image(rng: np.random.Generator, size: int = 256) -> Image.Image:
+    # Upscaled low-resolution noise gives smooth, photo-like structure.
+    coarse = rng.integers(0, 256, (8, 8, 3), dtype=np.uint8)
+    return Image.fromarray(coarse).resize((size, size), Image.Resampling.BICUBIC)
+
+
+def _reencode(image: Image.Image, rng: random.Random) -> Image.Image:
+    """Simulate a repost: rescale, brightness tweak and lossy re-encoding."""
+    scale = rng.uniform(0.6, 1.0)
+    variant = image.resize((int(image.width * scale), int(image.height * scale)))
+    variant = ImageEnhance.Brightness(variant).enhance(rng.uniform(0.9, 1.1))
+    buffer = io.BytesIO()
+    variant.save(buffer, "JPEG", quality=rng.randint(50, 95))
+    buffer.seek(0)
+    return Image.open(buffer)
+
+
+def synthetic_images(
+    count: int, base_count: int, duplicate_ratio: float, seed: int = 7
+) -> List[Tuple[int, Image.Image]]:
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    bases = [_base_image(np_rng) for _ in range(base_count)]
+    corpus = []
+    for i in range(count):
+        if rng.random() < duplicate_ratio:
+            cluster = rng.randrange(base_count)
+            corpus.append((cluster, _reencode(bases[cluster], rng)))
+        else:
+            corpus.append((base_count + i, _reencode(_base_image(np_rng), rng)))
+    return corpus
+
+
+def report(
+    name: str, corpus: List[Tuple[int, object]], calls: int, wrong: int, elapsed: float
+) -> None:
+    total = len(corpus)
+    avoided = total - calls
+    # Only the first input of each cluster really needs the service.
+    best = total - len({cluster for cluster, _ in corpus})
+    print(f"\n--- {name} ---")
+    print(f"Inputs: {total}, service calls: {calls}")
+    print(f"Calls avoided: {avoided} ({avoided / total:.1%}), best possible: {best}")
+    print(f"Verdicts reused from a different original: {wrong}")
+    print(f"Dedup overhead: {elapsed * 1000 / total:.3f} ms/input")
+
+
+def bench_texts(count: int, base_count: int, duplicate_ratio: float) -> None:
+    corpus = synthetic_texts(count, base_count, duplicate_ratio)
+    gate = TextDedupGate()
+    calls = wrong = 0
+    started = time.perf_counter()
+    for cluster, text in corpus:
+        signature = gate.signature(text)
+        verdict = gate.lookup(signature)
+        if verdict is None:
+            calls += 1
+            gate.add(signature, {"cluster": cluster})
+        elif verdict["cluster"] != cluster:
+            wrong += 1
+    report("Text (MinHash + LSH)", corpus, calls, wrong, time.perf_counter() - started)
+
+
+def bench_images(count: int, base_count: int, duplicate_ratio: float) -> None:
+    corpus = synthetic_images(count, base_count, duplicate_ratio)
+    gate = ImageDedupGate()
+    calls = wrong = 0
+    started = time.perf_counter()
+    hashes = image_hashes([image for _, image in corpus], gate.method)
+    for (cluster, _), image_hash in zip(corpus, hashes.tolist()):
+        verdict = gate.lookup(image_hash)
+        if verdict is None:
+            calls += 1
+            gate.add(image_hash, {"cluster": cluster})
+        elif verdict["cluster"] != cluster:
+            wrong += 1
+    report(
+        "Image (pHash + BK-tree)", corpus, calls, wrong, time.perf_counter() - started
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--texts", type=int, default=20000)
+    parser.add_argument("--images", type=int, default=2000)
+    parser.add_argument("--bases", type=int, default=200)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.5)
+    args = parser.parse_args()
+
+    bench_texts(args.texts, args.bases, args.duplicate_ratio)
+    bench_images(args.images, args.bases, args.duplicate_ratio)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Azure AI Content Safety - Local Blocklist Matcher
+Mirrors remote TextBlocklist items into an in-process Aho-Corasick automaton so
+definite blocklist hits are rejected without a network round trip.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from azure.ai.contentsafety import BlocklistClient, ContentSafetyClient
+from azure.ai.contentsafety.models import AnalyzeTextOptions
+from azure.core.exceptions import HttpResponseError
+
+from text_analysis import to_severity_dict
+from text_blockList import (
+    BLOCKLIST_NAME,
+    create_blocklist_client,
+    create_content_safety_client,
+    fetch_block_items,
+    handle_error,
+)
+
+WILDCARD = "*"
+DEFAULT_REFRESH_SECONDS = 300
+
+
+@dataclass(frozen=True)
+class BlocklistMatch:
+    """A blocklist item found in a text, with its character span."""
+
+    blocklist_name: str
+    blocklist_item_id: str
+    blocklist_item_text: str
+    start: int
+    end: int
+    exact: bool  # False for wildcard expansions, which are only a strong hint
+
+    def as_dict(self) -> dict:
+        return {
+            "blocklist_name": self.blocklist_name,
+            "blocklist_item_id": self.blocklist_item_id,
+            "blocklist_item_text": self.blocklist_item_text,
+            "offset": self.start,
+            "length": self.end - self.start,
+            "exact": self.exact,
+        }
+
+
+def _fold(ch: str) -> str:
+    # Per-character folding keeps match offsets aligned with the input text.
+    lowered = ch.lower()
+    return lowered if len(lowered) == 1 else ch
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def compile_wildcard(pattern: str) -> Pattern[str]:
+    """Compile ``k*ll``-style items: ``*`` stands for any run of word characters
+    (or a literal asterisk) within a single word."""
+    body = r"[\w*]*".join(re.escape(part) for part in pattern.split(WILDCARD))
+    return re.compile(rf"(?<!\w){body}(?!\w)", re.IGNORECASE)
+
+
+class AhoCorasick:
+    """Case-insensitive multi-pattern matcher over literal strings."""
+
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        # Node 0 is the root; each node has goto edges, a fail link and outputs.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]
+
+        for text, payload in patterns:
+            if not text:
+                continue
+            node = 0
+            for ch in map(_fold, text):
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((len(text), payload))
+
+        self._build_fail_links()
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child].extend(self._out[self._fail[child]])
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int, object]]:
+        """Yield ``(start, end, payload)`` for every pattern occurrence."""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for index, ch in enumerate(text):
+            ch = _fold(ch)
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in out[node]:
+                yield index + 1 - length, index + 1, payload
+
+
+class BlocklistMatcher:
+    """Immutable local index of blocklist items (literal and wildcard)."""
+
+    def __init__(
+        self,
+        items: Iterable[Tuple[str, str, str]],
+        whole_words: bool = True,
+    ):
+        """``items`` are ``(blocklist_name, blocklist_item_id, text)`` triples."""
+        literals = []
+        self._wildcards: List[Tuple[Pattern[str], Tuple[str, str, str]]] = []
+        self.size = 0
+        for blocklist_name, item_id, text in items:
+            self.size += 1
+            entry = (blocklist_name, item_id, text)
+            # Verbatim occurrences are exactly what the service matches; the
+            # wildcard expansion additionally flags obfuscated variants.
+            literals.append((text, entry))
+            if WILDCARD in text.strip(WILDCARD):
+                self._wildcards.append((compile_wildcard(text), entry))
+        self._automaton = AhoCorasick(literals)
+        self.whole_words = whole_words
+
+    def _on_word_boundary(self, text: str, start: int, end: int) -> bool:
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        return not (
+            (_is_word_char(before) and _is_word_char(text[start]))
+            or (_is_word_char(after) and _is_word_char(text[end - 1]))
+        )
+
+    def find(self, text: str) -> List[BlocklistMatch]:
+        """Return every blocklist item found in ``text``."""
+        matches = []
+        for start, end, (name, item_id, item_text) in self._automaton.iter_matches(
+            text
+        ):
+            if self.whole_words and not self._on_word_boundary(text, start, end):
+                continue
+            matches.append(
+                BlocklistMatch(name, item_id, item_text, start, end, exact=True)
+            )
+        exact_spans = {(match.start, match.end) for match in matches}
+        for pattern, (name, item_id, item_text) in self._wildcards:
+            for hit in pattern.finditer(text):
+                if hit.span() in exact_spans:
+                    continue
+                matches.append(
+                    BlocklistMatch(
+                        name, item_id, item_text, hit.start(), hit.end(), exact=False
+                    )
+                )
+        return matches
+
+    def has_definite_hit(self, text: str) -> bool:
+        return any(match.exact for match in self.find(text))
+
+
+class LocalBlocklist:
+    """Keeps a BlocklistMatcher in sync with one or more remote blocklists."""
+
+    def __init__(
+        self,
+        blocklist_names: Optional[List[str]] = None,
+        refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+        client: Optional[BlocklistClient] = None,
+    ):
+        self.blocklist_names = blocklist_names or [BLOCKLIST_NAME]
+        self.refresh_seconds = refresh_seconds
+        self._client = client
+        self._matcher = BlocklistMatcher([])
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def matcher(self) -> BlocklistMatcher:
+        return self._matcher
+
+    def refresh(self) -> BlocklistMatcher:
+        """Pull every item from the remote blocklists and swap in a new matcher."""
+        client = self._client or create_blocklist_client()
+        items = [
+            (name, item.blocklist_item_id, item.text)
+            for name in self.blocklist_names
+            for item in fetch_block_items(name, client)
+        ]
+        matcher = BlocklistMatcher(items)
+        with self._lock:
+            self._matcher = matcher
+            self._refreshed_at = time.monotonic()
+        return matcher
+
+    def start(self) -> None:
+        """Refresh now and then every ``refresh_seconds`` on a daemon thread."""
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_seconds):
+            try:
+                self.refresh()
+            except Exception as e:  # any error would otherwise end the thread
+                # Keep serving the previous snapshot until the next attempt.
+                age = time.monotonic() - self._refreshed_at
+                print(
+                    f"[WARN] Blocklist refresh failed ({type(e).__name__}: {e}); "
+                    f"serving the snapshot from {age:.0f}s ago"
+                )
+
+
+def analyze_text_with_local_blocklist(
+    text: str,
+    local: LocalBlocklist,
+    client: Optional[ContentSafetyClient] = None,
+    halt_on_blocklist_hit: bool = True,
+) -> dict:
+    """Check ``text`` locally first, falling back to the service.
+
+    A definite local hit with ``halt_on_blocklist_hit`` returns immediately,
+    matching what the service would answer, without a network round trip.
+    """
+    matches = local.matcher.find(text)
+    if halt_on_blocklist_hit and any(match.exact for match in matches):
+        return {
+            "source": "local",
+            "blocklists_match": [match.as_dict() for match in matches],
+            "categories": None,
+        }
+
+    client = client or create_content_safety_client()
+    try:
+        result = client.analyze_text(
+            AnalyzeTextOptions(
+                text=text,
+                blocklist_names=local.blocklist_names,
+                halt_on_blocklist_hit=halt_on_blocklist_hit,
+            )
+        )
+    except HttpResponseError as e:
+        handle_error("Analyze text", e)
+
+    return {
+        "source": "remote",
+        "blocklists_match": [
+            {
+                "blocklist_name": match.blocklist_name,
+                "blocklist_item_id": match.blocklist_item_id,
+                "blocklist_item_text": match.blocklist_item_text,
+            }
+            for match in result.blocklists_match or []
+        ],
+        "categories": to_severity_dict(result.categories_analysis or []),
+    }
+
+
+if __name__ == "__main__":
+    local = LocalBlocklist(refresh_seconds=60)
+    local.start()
+    print(f"\nLoaded {local.matcher.size} block items.")
+    try:
+        for sample in [
+            "I h*te you and I want to k*ll you.",
+            "What a lovely morning.",
+        ]:
+            print(f'\nAnalyzing: "{sample}"')
+            print(analyze_text_with_local_blocklist(sample, local))
+    finally:
+        local.stop()
@@ -0,0 +1,242 @@
+"""
+Azure AI Content Safety - Blocklist Sync
+Makes a remote TextBlocklist match a local term file using one listing pass and
+bulk, parallel add/remove calls instead of per-item round trips.
+"""
+
+import argparse
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, TypeVar
+
+from azure.ai.contentsafety import BlocklistClient
+from azure.ai.contentsafety.models import (
+    AddOrUpdateTextBlocklistItemsOptions,
+    RemoveTextBlocklistItemsOptions,
+    TextBlocklist,
+    TextBlocklistItem,
+)
+from azure.core.exceptions import (
+    HttpResponseError,
+    ResourceNotFoundError,
+    ServiceRequestError,
+)
+
+from text_blockList import BLOCKLIST_NAME, create_blocklist_client
+
+# Service limits for a single add/remove request
+MAX_ITEMS_PER_CALL = 100
+MAX_ITEM_TEXT_LENGTH = 128
+
+DEFAULT_WORKERS = 4
+MAX_ATTEMPTS = 5
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+T = TypeVar("T")
+
+
+@dataclass
+class SyncReport:
+    """What a sync run changed and how many service calls it took."""
+
+    desired: int = 0
+    remote: int = 0
+    added: int = 0
+    removed: int = 0
+    list_calls: int = 0
+    add_calls: int = 0
+    remove_calls: int = 0
+    retries: int = 0
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, repr=False, compare=False
+    )
+
+    def count_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    @property
+    def calls(self) -> int:
+        return self.list_calls + self.add_calls + self.remove_calls + self.retries
+
+    @property
+    def per_item_calls(self) -> int:
+        # add_block_items per term, and remove_block_items_by_text needs an
+        # add (to learn the ID) plus a remove for each term.
+        return self.added + 2 * self.removed
+
+    def print(self) -> None:
+        print("\n--- Blocklist Sync ---")
+        print(f"Desired terms: {self.desired}, remote items: {self.remote}")
+        print(f"Added: {self.added}, Removed: {self.removed}")
+        print(
+            f"Service calls: {self.calls} "
+            f"(list {self.list_calls}, add {self.add_calls}, "
+            f"remove {self.remove_calls}, retries {self.retries})"
+        )
+        saved = self.per_item_calls - self.calls
+        print(
+            f"Per-item operations would need {self.per_item_calls} calls → saved {saved}"
+        )
+
+
+def load_terms(path: Path) -> Set[str]:
+    """Read one term per line, skipping blanks and '#' comments."""
+    terms = set()
+    with path.open("r", encoding="utf-8") as file:
+        for line_no, line in enumerate(file, start=1):
+            term = line.strip()
+            if not term or term.startswith("#"):
+                continue
+            if len(term) > MAX_ITEM_TEXT_LENGTH:
+                raise ValueError(
+                    f"{path}:{line_no}: term longer than {MAX_ITEM_TEXT_LENGTH} chars"
+                )
+            terms.add(term)
+    return terms
+
+
+def fetch_remote_index(
+    client: BlocklistClient, blocklist_name: str, report: SyncReport
+) -> Dict[str, str]:
+    """Page through the blocklist once and index item text → item ID.
+
+    Each page is fetched under ``with_retry``; the pager keeps its
+    continuation token when a request fails, so a retry re-reads that page.
+    """
+    index: Dict[str, str] = {}
+    pages = client.list_text_blocklist_items(blocklist_name=blocklist_name).by_page()
+    while True:
+        page = with_retry(lambda: next(pages, None), report)
+        if page is None:
+            return index
+        report.list_calls += 1
+        for item in page:
+            index[item.text] = item.blocklist_item_id
+
+
+def chunked(values: List[T], size: int = MAX_ITEMS_PER_CALL) -> List[List[T]]:
+    return [values[i : i + size] for i in range(0, len(values), size)]
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Retry-After as seconds; it may be delta-seconds or an HTTP-date."""
+    value = getattr(response, "headers", {}).get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def with_retry(call: Callable[[], T], report: SyncReport) -> T:
+    """Run ``call`` retrying throttling/transient failures with jittered backoff."""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return call()
+        except (HttpResponseError, ServiceRequestError) as e:
+            status = getattr(e, "status_code", None)
+            retryable = isinstance(e, ServiceRequestError) or status in RETRYABLE_STATUS
+            if not retryable or attempt == MAX_ATTEMPTS:
+                raise
+            report.count_retry()
+            delay = retry_after_seconds(getattr(e, "response", None))
+            if delay is None:
+                delay = 2 ** (attempt - 1)
+            time.sleep(delay + random.uniform(0, 0.5))
+
+
+def sync_blocklist(
+    terms: Set[str],
+    blocklist_name: str = BLOCKLIST_NAME,
+    client: Optional[BlocklistClient] = None,
+    workers: int = DEFAULT_WORKERS,
+    dry_run: bool = False,
+) -> SyncReport:
+    """Add missing terms and remove stale items so the blocklist equals ``terms``."""
+    client = client or create_blocklist_client()
+    report = SyncReport(desired=len(terms))
+
+    exists = True
+    try:
+        remote = fetch_remote_index(client, blocklist_name, report)
+    except ResourceNotFoundError:
+        exists, remote = False, {}
+    report.remote = len(remote)
+
+    to_add = sorted(terms - remote.keys())
+    to_remove = sorted(remote[text] for text in remote.keys() - terms)
+    if dry_run:
+        report.added, report.removed = len(to_add), len(to_remove)
+        return report
+
+    if not exists:
+        client.create_or_update_text_blocklist(
+            blocklist_name=blocklist_name,
+            options=TextBlocklist(blocklist_name=blocklist_name),
+        )
+
+    def add_chunk(chunk: List[str]) -> int:
+        with_retry(
+            lambda: client.add_or_update_blocklist_items(
+                blocklist_name=blocklist_name,
+                options=AddOrUpdateTextBlocklistItemsOptions(
+                    blocklist_items=[TextBlocklistItem(text=text) for text in chunk]
+                ),
+            ),
+            report,
+        )
+        return len(chunk)
+
+    def remove_chunk(chunk: List[str]) -> int:
+        with_retry(
+            lambda: client.remove_blocklist_items(
+                blocklist_name=blocklist_name,
+                options=RemoveTextBlocklistItemsOptions(blocklist_item_ids=chunk),
+            ),
+            report,
+        )
+        return len(chunk)
+
+    add_chunks, remove_chunks = chunked(to_add), chunked(to_remove)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        added = pool.map(add_chunk, add_chunks)
+        removed = pool.map(remove_chunk, remove_chunks)
+        report.added = sum(added)
+        report.removed = sum(removed)
+    report.add_calls = len(add_chunks)
+    report.remove_calls = len(remove_chunks)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("terms", type=Path, help="text file with one term per line")
+    parser.add_argument("-b", "--blocklist", default=BLOCKLIST_NAME)
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only report the computed diff"
+    )
+    args = parser.parse_args()
+
+    terms = load_terms(args.terms)
+    print(f"Syncing {len(terms)} terms into blocklist '{args.blocklist}'...")
+    report = sync_blocklist(
+        terms, args.blocklist, workers=args.workers, dry_run=args.dry_run
+    )
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
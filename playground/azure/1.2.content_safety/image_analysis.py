@@ -5,7 +5,7 @@ Refactored by OpenAI ChatGPT
 
 import os
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 
 from azure.ai.contentsafety import ContentSafetyClient
 from azure.ai.contentsafety.models import AnalyzeImageOptions, ImageData, ImageCategory
@@ -13,6 +13,8 @@ from azure.core.credentials import AzureKeyCredential
 from azure.core.exceptions import HttpResponseError
 from dotenv import load_dotenv
 
+from verdict_cache import VerdictCache, image_cache_key, print_cache_stats
+
 # Optional: load from .env file (if using python-dotenv)
 try:
     from dotenv import load_dotenv
@@ -41,15 +43,36 @@ def create_contentsafety_client() -> ContentSafetyClient:
     )
 
 
-def analyze_image_file(image_path: Path) -> Optional[dict]:
-    """Analyze an image using Azure AI Content Safety."""
+def analyze_image_file(
+    image_path: Path,
+    categories: Optional[List[str]] = None,
+    output_type: Optional[str] = None,
+    cache: Optional[VerdictCache] = None,
+) -> Optional[dict]:
+    """Analyze an image using Azure AI Content Safety.
+
+    When a ``cache`` is given, verdicts for byte-identical images analyzed
+    with the same options are served locally instead of calling the service.
+    """
+    with image_path.open("rb") as file:
+        image_bytes = file.read()
+
+    cache_key = None
+    if cache is not None:
+        cache_key = image_cache_key(image_bytes, categories, output_type)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     client = create_contentsafety_client()
 
     try:
-        with image_path.open("rb") as file:
-            image_data = ImageData(content=file.read())
-            request = AnalyzeImageOptions(image=image_data)
-            response = client.analyze_image(request)
+        request = AnalyzeImageOptions(
+            image=ImageData(content=image_bytes),
+            categories=categories,
+            output_type=output_type,
+        )
+        response = client.analyze_image(request)
 
         # Extract categories
 
@@ -57,15 +80,10 @@ def analyze_image_file(image_path: Path) -> Optional[dict]:
         #     item.category: item.severity for item in response.categories_analysis
         # }
 
-        results = {
-            (
-                item.category.name
-                if isinstance(item.category, ImageCategory)
-                else item.category
-            ): item.severity
-            for item in response.categories_analysis
-        }
+        results = to_severity_dict(response.categories_analysis)
 
+        if cache is not None:
+            cache.put(cache_key, results)
         return results
 
     except HttpResponseError as e:
@@ -78,6 +96,18 @@ def analyze_image_file(image_path: Path) -> Optional[dict]:
         return None
 
 
+def to_severity_dict(categories_analysis) -> dict:
+    """Convert a categories_analysis list into a {category: severity} dict."""
+    return {
+        (
+            item.category.name
+            if isinstance(item.category, ImageCategory)
+            else item.category
+        ): item.severity
+        for item in categories_analysis
+    }
+
+
 def print_analysis_results(results: dict) -> None:
     """Print the severity levels for each category."""
     print("\n--- Analysis Results ---")
@@ -93,11 +123,13 @@ def main():
     image_path = get_image_path("porn-image.jpg")
     print(f"Analyzing image: {image_path}")
 
-    results = analyze_image_file(image_path)
-    if results:
-        print_analysis_results(results)
-    else:
-        print("Image analysis failed or returned no results.")
+    with VerdictCache() as cache:
+        results = analyze_image_file(image_path, cache=cache)
+        if results:
+            print_analysis_results(results)
+        else:
+            print("Image analysis failed or returned no results.")
+        print_cache_stats(cache)
 
 
 if __name__ == "__main__":
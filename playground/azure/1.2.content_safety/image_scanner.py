@@ -0,0 +1,276 @@
+"""
+Azure AI Content Safety - Image Directory Scanner
+Walks a directory tree (or a manifest), pre-checks images from their headers and
+streams them through one async client with a bounded number of buffers in memory.
+Results are appended to JSONL as they complete, so an interrupted scan resumes
+where it stopped.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Set
+
+from azure.ai.contentsafety.aio import ContentSafetyClient
+from azure.ai.contentsafety.models import AnalyzeImageOptions, ImageData
+from azure.core.exceptions import AzureError
+from PIL import Image, UnidentifiedImageError
+
+from image_analysis import to_severity_dict
+from text_batch_analysis import create_async_contentsafety_client, describe_error
+from verdict_cache import VerdictCache, image_cache_key, print_cache_stats
+
+# Content Safety image limits
+MAX_IMAGE_BYTES = 4 * 1024 * 1024
+MIN_DIMENSION = 50
+MAX_DIMENSION = 7200
+SUPPORTED_FORMATS = {"JPEG", "PNG", "GIF", "BMP", "TIFF", "WEBP"}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_BUFFERS = 16
+
+
+@dataclass
+class ScanStats:
+    """Counters for one scanner run."""
+
+    analyzed: int = 0  # sent to the service
+    cached: int = 0
+    skipped: int = 0
+    failed: int = 0
+    resumed: int = 0
+    bytes_sent: int = 0
+    started_at: float = 0.0
+    finished_at: float = 0.0
+
+    def print(self) -> None:
+        elapsed = max(self.finished_at - self.started_at, 1e-9)
+        print("\n--- Image Scan Summary ---")
+        print(
+            f"Analyzed: {self.analyzed}, From cache: {self.cached}, "
+            f"Skipped: {self.skipped}, Failed: {self.failed}, "
+            f"Already done: {self.resumed}"
+        )
+        print(f"Uploaded: {self.bytes_sent / 1024 / 1024:.1f} MB")
+        # Cache hits never reach the service, so they stay out of the rate.
+        print(
+            f"Elapsed: {elapsed:.1f}s → {self.analyzed / elapsed:.2f} "
+            "analyzed images/s"
+        )
+
+
+def iter_directory(root: Path) -> Iterator[Path]:
+    """Lazily yield image files under ``root`` in a stable order."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if Path(filename).suffix.lower() in IMAGE_EXTENSIONS:
+                yield Path(dirpath) / filename
+
+
+def iter_manifest(manifest: Path) -> Iterator[Path]:
+    """Lazily yield paths from a manifest of one path (or JSON object) per line."""
+    base = manifest.resolve().parent
+    with manifest.open("r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            value = json.loads(line)["path"] if line.startswith("{") else line
+            path = Path(value)
+            yield path if path.is_absolute() else base / path
+
+
+def precheck_image(path: Path) -> Optional[str]:
+    """Return why ``path`` cannot be sent, reading only the file header."""
+    try:
+        size = path.stat().st_size
+    except OSError as e:
+        return f"unreadable: {e}"
+    if size > MAX_IMAGE_BYTES:
+        return f"too large: {size} bytes"
+
+    try:
+        # Image.open only parses the header; pixel data is never decoded here.
+        with Image.open(path) as image:
+            width, height = image.size
+            image_format = image.format
+    except (UnidentifiedImageError, OSError) as e:
+        return f"not an image: {e}"
+
+    if image_format not in SUPPORTED_FORMATS:
+        return f"unsupported format: {image_format}"
+    if min(width, height) < MIN_DIMENSION or max(width, height) > MAX_DIMENSION:
+        return f"unsupported dimensions: {width}x{height}"
+    return None
+
+
+def load_checkpoint(output_path: Path) -> Set[str]:
+    """Paths already recorded as analyzed or skipped in a previous run."""
+    done: Set[str] = set()
+    if not output_path.exists():
+        return done
+    with output_path.open("r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line behind.
+                continue
+            if record.get("status") in ("ok", "skipped"):
+                done.add(record["path"])
+    return done
+
+
+async def scan_images(
+    paths: Iterable[Path],
+    output_path: Path,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_buffers: int = DEFAULT_MAX_BUFFERS,
+    client: Optional[ContentSafetyClient] = None,
+    cache: Optional[VerdictCache] = None,
+) -> ScanStats:
+    """Analyze every image in ``paths``, appending one JSONL record per image.
+
+    At most ``max_buffers`` image payloads are held in memory at any time: a
+    buffer slot is taken before a file is read and released once its analysis
+    finishes. Errored images are retried on the next run; analyzed and skipped
+    ones are not.
+    """
+    stats = ScanStats(started_at=time.perf_counter())
+    done = load_checkpoint(output_path)
+    buffers = asyncio.Semaphore(max_buffers)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffers)
+    owns_client = client is None
+    client = client or create_async_contentsafety_client()
+    output = output_path.open("a", encoding="utf-8")
+
+    def write(record: dict) -> None:
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+
+    async def produce() -> None:
+        try:
+            for path in paths:
+                key = str(path)
+                if key in done:
+                    stats.resumed += 1
+                    continue
+                reason = await asyncio.to_thread(precheck_image, path)
+                if reason:
+                    stats.skipped += 1
+                    write({"path": key, "status": "skipped", "reason": reason})
+                    continue
+                await buffers.acquire()
+                try:
+                    data = await asyncio.to_thread(path.read_bytes)
+                except OSError as e:
+                    buffers.release()
+                    stats.failed += 1
+                    write({"path": key, "status": "error", "error": str(e)})
+                    continue
+                await queue.put((key, data))
+        finally:
+            for _ in range(concurrency):
+                await queue.put(None)
+
+    async def consume() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            key, data = item
+            try:
+                record = await analyze(key, data)
+            finally:
+                # Drop our references before freeing the slot so the bound holds.
+                item = data = None
+                buffers.release()
+            write(record)
+
+    async def analyze(key: str, data: bytes) -> dict:
+        cache_key = image_cache_key(data) if cache is not None else None
+        if cache is not None:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                stats.cached += 1
+                return {"path": key, "status": "ok", "results": cached}
+
+        started = time.perf_counter()
+        try:
+            response = await client.analyze_image(
+                AnalyzeImageOptions(image=ImageData(content=data))
+            )
+        except AzureError as e:
+            stats.failed += 1
+            return {"path": key, "status": "error", "error": describe_error(e)}
+
+        results = to_severity_dict(response.categories_analysis)
+        if cache is not None:
+            cache.put(cache_key, results)
+        stats.analyzed += 1
+        stats.bytes_sent += len(data)
+        return {
+            "path": key,
+            "status": "ok",
+            "results": results,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    try:
+        await asyncio.gather(produce(), *(consume() for _ in range(concurrency)))
+    finally:
+        output.close()
+        if owns_client:
+            await client.close()
+        stats.finished_at = time.perf_counter()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--root", type=Path, help="directory tree to scan")
+    source.add_argument("--manifest", type=Path, help="file listing image paths")
+    parser.add_argument(
+        "-o", "--output", type=Path, default=Path("image_scan_results.jsonl")
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--max-buffers",
+        type=int,
+        default=DEFAULT_MAX_BUFFERS,
+        help="maximum number of image payloads held in memory",
+    )
+    parser.add_argument("--cache", type=Path, help="SQLite verdict cache path")
+    args = parser.parse_args()
+
+    if args.manifest:
+        paths = iter_manifest(args.manifest)
+    else:
+        paths = iter_directory(
+            args.root or Path(__file__).resolve().parent / "sample_data"
+        )
+
+    cache = VerdictCache(args.cache) if args.cache else None
+    try:
+        stats = asyncio.run(
+            scan_images(
+                paths, args.output, args.concurrency, args.max_buffers, cache=cache
+            )
+        )
+        stats.print()
+        if cache:
+            print_cache_stats(cache)
+    finally:
+        if cache:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
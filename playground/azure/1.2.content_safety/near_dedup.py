@@ -0,0 +1,314 @@
+"""
+Azure AI Content Safety - Near-Duplicate Suppression
+Reuses earlier verdicts for re-encoded images (pHash/dHash + BK-tree) and lightly
+edited texts (MinHash + LSH banding) instead of calling the service again.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from verdict_cache import normalize_text
+
+HASH_SIZE = 8  # 8x8 → 64-bit image hashes
+PHASH_SAMPLE = 32  # pHash takes the low frequencies of a 32x32 DCT
+
+DEFAULT_IMAGE_DISTANCE = 6
+DEFAULT_TEXT_THRESHOLD = 0.7
+DEFAULT_SHINGLE_SIZE = 5
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+
+# ---------------------------------------------------------------------------
+# Perceptual image hashes
+# ---------------------------------------------------------------------------
+
+
+def _pack_bits(bits: np.ndarray) -> np.ndarray:
+    """Pack an (N, 64) boolean array into N uint64 hashes."""
+    packed = np.packbits(bits.astype(np.uint8), axis=1)
+    return packed.view(">u8").reshape(-1).astype(np.uint64)
+
+
+def load_grayscale(image: Image.Image, width: int, height: int) -> np.ndarray:
+    """Downscale to ``width`` x ``height`` grayscale as a float32 array."""
+    # draft() lets the JPEG decoder skip most of the work for small targets.
+    image.draft("L", (width * 4, height * 4))
+    small = image.convert("L").resize((width, height), Image.Resampling.LANCZOS)
+    return np.asarray(small, dtype=np.float32)
+
+
+def dhash_batch(gray: np.ndarray) -> np.ndarray:
+    """Difference hashes of an (N, 8, 9) stack of grayscale thumbnails."""
+    bits = gray[:, :, 1:] > gray[:, :, :-1]
+    return _pack_bits(bits.reshape(len(gray), -1))
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(PHASH_SAMPLE)
+
+
+def phash_batch(gray: np.ndarray) -> np.ndarray:
+    """DCT perceptual hashes of an (N, 32, 32) stack of grayscale thumbnails."""
+    coeffs = _DCT @ gray @ _DCT.T
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(gray), -1)
+    # The DC term only reflects overall brightness; exclude it from the median.
+    median = np.median(low[:, 1:], axis=1, keepdims=True)
+    return _pack_bits(low > median)
+
+
+def image_hashes(images: Iterable[Image.Image], method: str = "phash") -> np.ndarray:
+    """Hash many images at once; decoding is per image, hashing is vectorized."""
+    if method == "dhash":
+        stack = [load_grayscale(image, HASH_SIZE + 1, HASH_SIZE) for image in images]
+        return dhash_batch(np.stack(stack)) if stack else np.empty(0, np.uint64)
+    if method == "phash":
+        stack = [load_grayscale(image, PHASH_SAMPLE, PHASH_SAMPLE) for image in images]
+        return phash_batch(np.stack(stack)) if stack else np.empty(0, np.uint64)
+    raise ValueError(f"Unknown image hash method: {method}")
+
+
+def image_file_hash(path: Path, method: str = "phash") -> int:
+    with Image.open(path) as image:
+        return int(image_hashes([image], method)[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes under Hamming distance."""
+
+    def __init__(self):
+        self._root: Optional[list] = None  # [hash, payload, {distance: child}]
+        self.size = 0
+
+    def add(self, key: int, payload) -> None:
+        self.size += 1
+        if self._root is None:
+            self._root = [key, payload, {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, payload, {}]
+                return
+            node = child
+
+    def nearest(self, key: int, max_distance: int) -> Optional[Tuple[int, object]]:
+        """Return ``(distance, payload)`` of the closest key within range."""
+        if self._root is None:
+            return None
+        best: Optional[Tuple[int, object]] = None
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance and (best is None or distance < best[0]):
+                best = (distance, node[1])
+                if distance == 0:
+                    break
+            radius = best[0] if best else max_distance
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return best
+
+
+# ---------------------------------------------------------------------------
+# MinHash over character shingles
+# ---------------------------------------------------------------------------
+
+
+def _mix64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer so every input bit affects every output bit."""
+    values = values ^ (values >> np.uint64(30))
+    values = values * np.uint64(0xBF58476D1CE4E5B9)
+    values = values ^ (values >> np.uint64(27))
+    values = values * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+
+def shingle_hashes(text: str, k: int = DEFAULT_SHINGLE_SIZE) -> np.ndarray:
+    """64-bit hashes of every ``k``-character shingle, deduplicated."""
+    normalized = normalize_text(text).lower()
+    codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32)
+    if len(codes) < k:
+        codes = np.pad(codes, (0, k - len(codes)))
+    codes = codes.astype(np.uint64)
+    count = len(codes) - k + 1
+    hashes = np.zeros(count, dtype=np.uint64)
+    prime = np.uint64(1099511628211)  # FNV prime; uint64 wraparound is intended
+    with np.errstate(over="ignore"):
+        for offset in range(k):
+            hashes = hashes * prime + codes[offset : offset + count]
+        return np.unique(_mix64(hashes))
+
+
+class MinHasher:
+    """Fixed family of multiply-shift hash functions ``(a * x + b) >> 32``."""
+
+    def __init__(self, num_perm: int = DEFAULT_NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # Odd multipliers make x → a * x a bijection modulo 2^64.
+        self._a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * 2 + 1
+        self._b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+
+    def signature(self, shingles: np.ndarray) -> np.ndarray:
+        with np.errstate(over="ignore"):
+            values = self._a[:, None] * shingles[None, :] + self._b[:, None]
+        return (values >> np.uint64(32)).min(axis=1)
+
+
+class MinHashLSH:
+    """Banded LSH index returning the best candidate above a Jaccard threshold."""
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_TEXT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+        self._payloads: List[object] = []
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, self.rows)]
+
+    def add(self, signature: np.ndarray, payload) -> None:
+        item = len(self._signatures)
+        self._signatures.append(signature)
+        self._payloads.append(payload)
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, []).append(item)
+
+    def nearest(self, signature: np.ndarray) -> Optional[Tuple[float, object]]:
+        """Return ``(similarity, payload)`` of the most similar indexed item."""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        if not candidates:
+            return None
+        ids = np.fromiter(candidates, dtype=np.int64)
+        stacked = np.stack([self._signatures[i] for i in ids])
+        similarity = (stacked == signature).mean(axis=1)
+        best = int(similarity.argmax())
+        if similarity[best] < self.threshold:
+            return None
+        return float(similarity[best]), self._payloads[ids[best]]
+
+    @property
+    def size(self) -> int:
+        return len(self._signatures)
+
+
+# ---------------------------------------------------------------------------
+# Dedup gates in front of the analyze_* functions
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class DedupStats:
+    lookups: int = 0
+    reused: int = 0
+
+    @property
+    def avoided_ratio(self) -> float:
+        return self.reused / self.lookups if self.lookups else 0.0
+
+
+class ImageDedupGate:
+    """Serves image verdicts for perceptually near-identical images."""
+
+    def __init__(
+        self, max_distance: int = DEFAULT_IMAGE_DISTANCE, method: str = "phash"
+    ):
+        self.max_distance = max_distance
+        self.method = method
+        self.index = BKTree()
+        self.stats = DedupStats()
+
+    def lookup(self, image_hash: int) -> Optional[dict]:
+        self.stats.lookups += 1
+        hit = self.index.nearest(image_hash, self.max_distance)
+        if hit is None:
+            return None
+        self.stats.reused += 1
+        return hit[1]
+
+    def add(self, image_hash: int, verdict: dict) -> None:
+        self.index.add(image_hash, verdict)
+
+    def analyze(
+        self, image_path: Path, analyze_fn: Callable[[Path], Optional[dict]]
+    ) -> Optional[dict]:
+        """Return a reused verdict or call ``analyze_fn`` (e.g. analyze_image_file)."""
+        image_hash = image_file_hash(image_path, self.method)
+        verdict = self.lookup(image_hash)
+        if verdict is None:
+            verdict = analyze_fn(image_path)
+            if verdict is not None:
+                self.add(image_hash, verdict)
+        return verdict
+
+
+class TextDedupGate:
+    """Serves text verdicts for texts whose shingle sets nearly coincide."""
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_TEXT_THRESHOLD,
+        num_perm: int = DEFAULT_NUM_PERM,
+        bands: int = DEFAULT_BANDS,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+    ):
+        self.shingle_size = shingle_size
+        self.hasher = MinHasher(num_perm)
+        self.index = MinHashLSH(threshold, num_perm, bands)
+        self.stats = DedupStats()
+
+    def signature(self, text: str) -> np.ndarray:
+        return self.hasher.signature(shingle_hashes(text, self.shingle_size))
+
+    def lookup(self, signature: np.ndarray) -> Optional[dict]:
+        self.stats.lookups += 1
+        hit = self.index.nearest(signature)
+        if hit is None:
+            return None
+        self.stats.reused += 1
+        return hit[1]
+
+    def add(self, signature: np.ndarray, verdict: dict) -> None:
+        self.index.add(signature, verdict)
+
+    def analyze(
+        self, text: str, analyze_fn: Callable[[str], Optional[dict]]
+    ) -> Optional[dict]:
+        """Return a reused verdict or call ``analyze_fn`` (e.g. analyze_text_content)."""
+        signature = self.signature(text)
+        verdict = self.lookup(signature)
+        if verdict is None:
+            verdict = analyze_fn(text)
+            if verdict is not None:
+                self.add(signature, verdict)
+        return verdict
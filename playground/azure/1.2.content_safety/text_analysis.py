@@ -4,13 +4,15 @@ Refactored by OpenAI ChatGPT
 """
 
 import os
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 from azure.ai.contentsafety import ContentSafetyClient
 from azure.ai.contentsafety.models import AnalyzeTextOptions, TextCategory
 from azure.core.credentials import AzureKeyCredential
 from azure.core.exceptions import HttpResponseError
 
+from verdict_cache import VerdictCache, print_cache_stats, text_cache_key
+
 # Optional: load from .env file (if using python-dotenv)
 try:
     from dotenv import load_dotenv
@@ -35,10 +37,32 @@ def create_contentsafety_client() -> ContentSafetyClient:
     )
 
 
-def analyze_text_content(text: str) -> Optional[Dict[str, int]]:
-    """Analyze text for harmful content categories."""
+def analyze_text_content(
+    text: str,
+    categories: Optional[List[str]] = None,
+    blocklist_names: Optional[List[str]] = None,
+    output_type: Optional[str] = None,
+    cache: Optional[VerdictCache] = None,
+) -> Optional[Dict[str, int]]:
+    """Analyze text for harmful content categories.
+
+    When a ``cache`` is given, verdicts for identical (normalized) text and
+    options are served locally instead of calling the service again.
+    """
+    cache_key = None
+    if cache is not None:
+        cache_key = text_cache_key(text, categories, blocklist_names, output_type)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     client = create_contentsafety_client()
-    request = AnalyzeTextOptions(text=text)
+    request = AnalyzeTextOptions(
+        text=text,
+        categories=categories,
+        blocklist_names=blocklist_names,
+        output_type=output_type,
+    )
 
     try:
         response = client.analyze_text(request)
@@ -51,13 +75,21 @@ def analyze_text_content(text: str) -> Optional[Dict[str, int]]:
             print(e)
         return None
 
+    results = to_severity_dict(response.categories_analysis)
+    if cache is not None:
+        cache.put(cache_key, results)
+    return results
+
+
+def to_severity_dict(categories_analysis) -> Dict[str, int]:
+    """Convert a categories_analysis list into a {category: severity} dict."""
     return {
         (
             item.category.name
             if isinstance(item.category, TextCategory)
             else item.category
         ): item.severity
-        for item in response.categories_analysis
+        for item in categories_analysis
         if item.severity is not None
     }
 
@@ -77,12 +109,17 @@ def main():
     sample_text = "You are an idiot. I will kill you."
     print(f'Analyzing text: "{sample_text}"\n')
 
-    results = analyze_text_content(sample_text)
+    with VerdictCache() as cache:
+        results = analyze_text_content(sample_text, cache=cache)
+
+        if results:
+            print_analysis_results(results)
+        else:
+            print("No results or analysis failed.")
 
-    if results:
-        print_analysis_results(results)
-    else:
-        print("No results or analysis failed.")
+        # A repost of the same text is answered from the local cache
+        analyze_text_content(f"  {sample_text} ", cache=cache)
+        print_cache_stats(cache)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,302 @@
+"""
+Azure AI Content Safety - Batch Text Analysis
+Streams many texts through one shared async client with bounded concurrency.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+)
+
+from azure.ai.contentsafety.aio import ContentSafetyClient
+from azure.ai.contentsafety.models import AnalyzeTextOptions
+from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import AzureError, HttpResponseError
+
+from text_analysis import (
+    AZURE_CONTENT_SAFETY_ENDPOINT,
+    AZURE_CONTENT_SAFETY_KEY,
+    to_severity_dict,
+)
+from verdict_cache import VerdictCache, print_cache_stats, text_cache_key
+
+DEFAULT_CONCURRENCY = 16
+
+
+@dataclass
+class TextResult:
+    """Outcome of analyzing a single text of a batch."""
+
+    index: int
+    text: str
+    results: Optional[Dict[str, int]] = None
+    error: Optional[str] = None
+    latency_ms: float = 0.0
+    cached: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def as_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "results": self.results,
+            "error": self.error,
+            "latency_ms": round(self.latency_ms, 2),
+            "cached": self.cached,
+        }
+
+
+@dataclass
+class BatchStats:
+    """Throughput and latency counters collected while a batch runs."""
+
+    succeeded: int = 0
+    failed: int = 0
+    cached: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    def record(self, result: TextResult) -> None:
+        if result.ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        # Cache hits never reach the service; their ~0 ms would skew the
+        # latency percentiles and the analysis throughput.
+        if result.cached:
+            self.cached += 1
+        else:
+            self.latencies_ms.append(result.latency_ms)
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        rank = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[rank]
+
+    def summary(self) -> dict:
+        total = self.succeeded + self.failed
+        analyzed = total - self.cached
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return {
+            "total": total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cached": self.cached,
+            "elapsed_s": round(elapsed, 3),
+            "texts_per_s": round(analyzed / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+        }
+
+
+def create_async_contentsafety_client() -> ContentSafetyClient:
+    """Initialize and return the async Content Safety client."""
+    if not AZURE_CONTENT_SAFETY_KEY or not AZURE_CONTENT_SAFETY_ENDPOINT:
+        raise EnvironmentError("Azure Content Safety credentials not set.")
+
+    return ContentSafetyClient(
+        endpoint=AZURE_CONTENT_SAFETY_ENDPOINT,
+        credential=AzureKeyCredential(AZURE_CONTENT_SAFETY_KEY),
+    )
+
+
+def iter_jsonl_texts(path: Path, text_field: str = "text") -> Iterator[str]:
+    """Lazily yield texts from a JSONL file of strings or objects."""
+    with path.open("r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            yield record if isinstance(record, str) else record[text_field]
+
+
+def describe_error(e: Exception) -> str:
+    """Flatten an Azure error into a short 'code: message' string."""
+    if isinstance(e, HttpResponseError) and e.error:
+        return f"{e.error.code}: {e.error.message}"
+    return f"{type(e).__name__}: {e}"
+
+
+async def _analyze_one(
+    client: ContentSafetyClient,
+    semaphore: asyncio.Semaphore,
+    index: int,
+    text: str,
+    cache: Optional[VerdictCache],
+) -> TextResult:
+    cache_key = None
+    if cache is not None:
+        cache_key = text_cache_key(text)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return TextResult(index=index, text=text, results=cached, cached=True)
+
+    async with semaphore:
+        started = time.perf_counter()
+        try:
+            response = await client.analyze_text(AnalyzeTextOptions(text=text))
+        except AzureError as e:
+            return TextResult(
+                index=index,
+                text=text,
+                error=describe_error(e),
+                latency_ms=(time.perf_counter() - started) * 1000,
+            )
+        results = to_severity_dict(response.categories_analysis)
+        if cache is not None:
+            cache.put(cache_key, results)
+        return TextResult(
+            index=index,
+            text=text,
+            results=results,
+            latency_ms=(time.perf_counter() - started) * 1000,
+        )
+
+
+async def analyze_texts(
+    texts: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    client: Optional[ContentSafetyClient] = None,
+    stats: Optional[BatchStats] = None,
+    cache: Optional[VerdictCache] = None,
+) -> AsyncIterator[TextResult]:
+    """Analyze texts concurrently over one client, yielding results in input order.
+
+    At most ``concurrency`` requests are in flight and at most
+    ``4 * concurrency`` results are buffered, so arbitrarily long input
+    streams run in constant memory. Texts already scored in ``cache`` are
+    answered locally without taking a concurrency slot.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+
+    owns_client = client is None
+    client = client or create_async_contentsafety_client()
+    semaphore = asyncio.Semaphore(concurrency)
+    window = 4 * concurrency
+    pending: Deque[asyncio.Task] = deque()
+
+    try:
+        for index, text in enumerate(texts):
+            pending.append(
+                asyncio.ensure_future(
+                    _analyze_one(client, semaphore, index, text, cache)
+                )
+            )
+            if len(pending) >= window:
+                result = await pending.popleft()
+                if stats:
+                    stats.record(result)
+                yield result
+
+        while pending:
+            result = await pending.popleft()
+            if stats:
+                stats.record(result)
+            yield result
+    finally:
+        for task in pending:
+            task.cancel()
+        if stats:
+            stats.finished_at = time.perf_counter()
+        if owns_client:
+            await client.close()
+
+
+async def analyze_texts_to_list(
+    texts: Iterable[str], concurrency: int = DEFAULT_CONCURRENCY
+) -> List[TextResult]:
+    """Convenience wrapper collecting every result of a (small) batch."""
+    return [result async for result in analyze_texts(texts, concurrency)]
+
+
+def print_batch_summary(stats: BatchStats) -> None:
+    """Print the throughput/latency summary of a finished batch."""
+    summary = stats.summary()
+    print("\n--- Batch Summary ---")
+    print(
+        f"Texts: {summary['total']} ({summary['failed']} failed, "
+        f"{summary['cached']} from cache)"
+    )
+    print(
+        f"Elapsed: {summary['elapsed_s']}s → {summary['texts_per_s']} "
+        "analyzed texts/s"
+    )
+    print(
+        f"Latency: p50 {summary['p50_ms']}ms, "
+        f"p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms"
+    )
+
+
+async def run_batch(
+    texts: Iterable[str],
+    output_path: Optional[Path],
+    concurrency: int,
+    cache: Optional[VerdictCache] = None,
+) -> BatchStats:
+    stats = BatchStats()
+    output = output_path.open("w", encoding="utf-8") if output_path else None
+    try:
+        async for result in analyze_texts(texts, concurrency, stats=stats, cache=cache):
+            if output:
+                output.write(json.dumps(result.as_dict()) + "\n")
+            elif result.ok:
+                print(f"[{result.index}] {result.results}")
+            else:
+                print(f"[{result.index}] [ERROR] {result.error}")
+    finally:
+        if output:
+            output.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("input", nargs="?", type=Path, help="JSONL file of texts")
+    parser.add_argument("-o", "--output", type=Path, help="JSONL file for results")
+    parser.add_argument("--field", default="text", help="text field in JSONL objects")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--cache", type=Path, help="SQLite verdict cache path")
+    args = parser.parse_args()
+
+    if args.input:
+        texts = iter_jsonl_texts(args.input, args.field)
+    else:
+        texts = [
+            "You are an idiot. I will kill you.",
+            "Have a wonderful day!",
+            "I hate people like you.",
+        ]
+
+    cache = VerdictCache(args.cache) if args.cache else None
+    try:
+        stats = asyncio.run(run_batch(texts, args.output, args.concurrency, cache))
+    finally:
+        if cache:
+            cache.close()
+    print_batch_summary(stats)
+    if cache:
+        print_cache_stats(cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -139,6 +139,17 @@ def list_block_items() -> None:
         handle_error("List block items", e)
 
 
+def fetch_block_items(
+    blocklist_name: str = BLOCKLIST_NAME,
+    client: Optional[BlocklistClient] = None,
+) -> List[TextBlocklistItem]:
+    client = client or create_blocklist_client()
+    try:
+        return list(client.list_text_blocklist_items(blocklist_name=blocklist_name))
+    except HttpResponseError as e:
+        handle_error("Fetch block items", e)
+
+
 def get_block_item(text: str) -> Optional[str]:
     client = create_blocklist_client()
     try:
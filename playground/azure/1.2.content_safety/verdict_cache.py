@@ -0,0 +1,193 @@
+"""
+Azure AI Content Safety - Verdict Cache
+Persistent SQLite cache of {category: severity} verdicts keyed by content hash.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import time
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / ".verdict_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1_000_000
+# COUNT(*) is a full index scan, so the size bound is enforced every N writes
+EVICTION_CHECK_INTERVAL = 256
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivial copies hash alike."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def _options_fingerprint(
+    kind: str,
+    categories: Optional[Iterable[str]] = None,
+    blocklist_names: Optional[Iterable[str]] = None,
+    output_type: Optional[str] = None,
+) -> bytes:
+    options = {
+        "kind": kind,
+        "categories": sorted(str(c) for c in categories) if categories else None,
+        "blocklists": sorted(blocklist_names) if blocklist_names else None,
+        "output_type": str(output_type) if output_type else None,
+    }
+    return json.dumps(options, sort_keys=True).encode("utf-8")
+
+
+def text_cache_key(
+    text: str,
+    categories: Optional[Iterable[str]] = None,
+    blocklist_names: Optional[Iterable[str]] = None,
+    output_type: Optional[str] = None,
+) -> str:
+    """SHA-256 of the normalized text plus the analysis options."""
+    digest = hashlib.sha256(
+        _options_fingerprint("text", categories, blocklist_names, output_type)
+    )
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def image_cache_key(
+    image_bytes: bytes,
+    categories: Optional[Iterable[str]] = None,
+    output_type: Optional[str] = None,
+) -> str:
+    """SHA-256 of the raw image bytes plus the analysis options."""
+    digest = hashlib.sha256(
+        _options_fingerprint("image", categories, None, output_type)
+    )
+    digest.update(b"\0")
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+class VerdictCache:
+    """SQLite-backed verdict store with TTL expiry and size-bounded LRU eviction."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_eviction = 0
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS verdicts (
+                key TEXT PRIMARY KEY,
+                verdict TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS verdicts_accessed ON verdicts (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, int]]:
+        """Return the cached verdict for ``key`` or None on miss/expiry."""
+        now = time.time()
+        row = self._conn.execute(
+            "SELECT verdict, created_at FROM verdicts WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        verdict, created_at = row
+        if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+            self._conn.execute("DELETE FROM verdicts WHERE key = ?", (key,))
+            self._conn.commit()
+            self.misses += 1
+            return None
+
+        self._conn.execute(
+            "UPDATE verdicts SET accessed_at = ? WHERE key = ?", (now, key)
+        )
+        self._conn.commit()
+        self.hits += 1
+        return json.loads(verdict)
+
+    def put(self, key: str, verdict: Dict[str, int]) -> None:
+        """Store a verdict and evict least recently used entries past the bound."""
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO verdicts (key, verdict, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?)",
+            (key, json.dumps(verdict), now, now),
+        )
+        self._writes_since_eviction += 1
+        if self._writes_since_eviction >= min(
+            EVICTION_CHECK_INTERVAL, self.max_entries
+        ):
+            self._evict()
+        self._conn.commit()
+
+    def _evict(self) -> None:
+        self._writes_since_eviction = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM verdicts WHERE key IN ("
+                "SELECT key FROM verdicts ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def purge_expired(self) -> int:
+        """Delete every entry older than the TTL and return how many went."""
+        if self.ttl_seconds is None:
+            return 0
+        cursor = self._conn.execute(
+            "DELETE FROM verdicts WHERE created_at < ?",
+            (time.time() - self.ttl_seconds,),
+        )
+        self._conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        (entries,) = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        self._evict()
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self) -> "VerdictCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def print_cache_stats(cache: VerdictCache) -> None:
+    """Print hit/miss counters of a cache."""
+    stats = cache.stats()
+    print("\n--- Verdict Cache ---")
+    print(f"Entries: {stats['entries']}")
+    print(f"Hits: {stats['hits']}, Misses: {stats['misses']}")
+    print(f"Hit rate: {stats['hit_rate']:.2%}")
@@ -0,0 +1,308 @@
+"""
+Azure AI Vision - Per-Feature Analysis Cache
+Persistent SQLite cache of Image Analysis results keyed by image content hash.
+Each visual feature is stored on its own together with the options that affect
+it, so a request for a subset of cached features never reaches the service and
+a request for more features only asks for the missing ones.
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import requests
+from azure.ai.vision.imageanalysis.aio import ImageAnalysisClient
+from azure.ai.vision.imageanalysis.models import VisualFeatures
+
+from analysis_results import feature_results, metadata_dict, to_original_coordinates
+from image_preprocess import ImagePreprocessor
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent / ".analysis_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 1_000_000
+EVICTION_CHECK_INTERVAL = 256
+METADATA = "metadata"  # image size and model version, stored like a feature
+
+# Which analyze() options can change the result of each feature.
+FEATURE_OPTIONS: Dict[str, Tuple[str, ...]] = {
+    VisualFeatures.CAPTION.value: ("language", "gender_neutral_caption"),
+    VisualFeatures.DENSE_CAPTIONS.value: ("language", "gender_neutral_caption"),
+    VisualFeatures.TAGS.value: ("language",),
+    VisualFeatures.OBJECTS.value: ("language",),
+    VisualFeatures.SMART_CROPS.value: ("smart_crops_aspect_ratios",),
+    VisualFeatures.READ.value: (),
+    VisualFeatures.PEOPLE.value: (),
+    METADATA: (),
+    # Computer Vision 3.2 domain models and features (see domain_analysis.py).
+    "cv32:landmarks": ("language",),
+    "cv32:celebrities": ("language",),
+    "cv32:brands": (),
+    "cv32:objects": (),
+}
+
+
+def image_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def feature_fingerprint(feature: str, options: dict) -> str:
+    """The options relevant to ``feature``, serialized canonically."""
+    relevant = {
+        name: options.get(name)
+        for name in FEATURE_OPTIONS[feature] + ("model_version",)
+    }
+    ratios = relevant.get("smart_crops_aspect_ratios")
+    if ratios:
+        relevant["smart_crops_aspect_ratios"] = sorted(float(r) for r in ratios)
+    return json.dumps(relevant, sort_keys=True)
+
+
+class AnalysisCache:
+    """SQLite-backed per-feature result store with TTL expiry and LRU eviction."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = DEFAULT_CACHE_PATH,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        check_same_thread: bool = True,
+    ):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.feature_hits = 0
+        self.feature_misses = 0
+        self.calls_avoided = 0
+        self.calls_narrowed = 0
+        self._writes_since_eviction = 0
+        # Pass check_same_thread=False only if callers serialize access.
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=check_same_thread
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS features (
+                image_hash TEXT NOT NULL,
+                feature TEXT NOT NULL,
+                options TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (image_hash, feature, options)
+            )
+            """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS features_accessed ON features (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(
+        self, image_hash: str, features: Iterable[str], options: dict
+    ) -> Dict[str, object]:
+        """Return the cached subset of ``features``; absent keys are misses."""
+        now = time.time()
+        oldest = now - self.ttl_seconds if self.ttl_seconds is not None else 0.0
+        found: Dict[str, object] = {}
+        for feature in features:
+            key = (image_hash, feature, feature_fingerprint(feature, options))
+            row = self._conn.execute(
+                "SELECT result, created_at FROM features "
+                "WHERE image_hash = ? AND feature = ? AND options = ?",
+                key,
+            ).fetchone()
+            if row is None or row[1] < oldest:
+                self.feature_misses += feature != METADATA
+                continue
+            self._conn.execute(
+                "UPDATE features SET accessed_at = ? "
+                "WHERE image_hash = ? AND feature = ? AND options = ?",
+                (now, *key),
+            )
+            self.feature_hits += feature != METADATA
+            found[feature] = json.loads(row[0])
+        self._conn.commit()
+        return found
+
+    def put(self, image_hash: str, results: Dict[str, object], options: dict) -> None:
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO features "
+            "(image_hash, feature, options, result, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    image_hash,
+                    feature,
+                    feature_fingerprint(feature, options),
+                    json.dumps(value),
+                    now,
+                    now,
+                )
+                for feature, value in results.items()
+            ],
+        )
+        self._writes_since_eviction += len(results)
+        if self._writes_since_eviction >= min(
+            EVICTION_CHECK_INTERVAL, self.max_entries
+        ):
+            self._evict()
+        self._conn.commit()
+
+    def _evict(self) -> None:
+        self._writes_since_eviction = 0
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM features").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM features WHERE rowid IN ("
+                "SELECT rowid FROM features ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,),
+            )
+
+    def purge_expired(self) -> int:
+        """Delete every entry older than the TTL and return how many went."""
+        if self.ttl_seconds is None:
+            return 0
+        cursor = self._conn.execute(
+            "DELETE FROM features WHERE created_at < ?",
+            (time.time() - self.ttl_seconds,),
+        )
+        self._conn.commit()
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        (entries,) = self._conn.execute("SELECT COUNT(*) FROM features").fetchone()
+        lookups = self.feature_hits + self.feature_misses
+        return {
+            "entries": entries,
+            "feature_hits": self.feature_hits,
+            "feature_misses": self.feature_misses,
+            "hit_rate": round(self.feature_hits / lookups, 4) if lookups else 0.0,
+            "calls_avoided": self.calls_avoided,
+            "calls_narrowed": self.calls_narrowed,
+        }
+
+    def close(self) -> None:
+        self._evict()
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self) -> "AnalysisCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def print_cache_stats(cache: AnalysisCache) -> None:
+    """Print hit/miss counters of a cache."""
+    stats = cache.stats()
+    print("\n--- Analysis Cache ---", file=sys.stderr)
+    print(f"Entries: {stats['entries']}", file=sys.stderr)
+    print(
+        f"Feature hits: {stats['feature_hits']}, misses: {stats['feature_misses']} "
+        f"({stats['hit_rate']:.2%})",
+        file=sys.stderr,
+    )
+    print(
+        f"Service calls avoided: {stats['calls_avoided']}, "
+        f"narrowed to missing features: {stats['calls_narrowed']}",
+        file=sys.stderr,
+    )
+
+
+async def read_image_bytes(source: str) -> bytes:
+    """Download a URL or read a local file without blocking the event loop."""
+    if source.startswith(("http://", "https://")):
+
+        def download() -> bytes:
+            response = requests.get(source, timeout=30)
+            response.raise_for_status()
+            return response.content
+
+        return await asyncio.to_thread(download)
+    return await asyncio.to_thread(Path(source).read_bytes)
+
+
+def _image_key(
+    data: bytes, source: str, preprocessor: Optional[ImagePreprocessor]
+) -> Tuple[str, Optional[ImagePreprocessor]]:
+    """Cache key of an image, and the preprocessor if it applies to ``source``."""
+    image_hash = image_digest(data)
+    if preprocessor is not None and not source.startswith(("http://", "https://")):
+        # Same key as PreparedImage.digest; preprocessing waits for a miss.
+        return f"{image_hash}:{preprocessor.target.name}", preprocessor
+    return image_hash, None
+
+
+async def cached_features(
+    cache: AnalysisCache,
+    source: str,
+    features: Sequence[VisualFeatures],
+    preprocessor: Optional[ImagePreprocessor] = None,
+    **options,
+) -> Tuple[Dict[str, object], Optional[dict]]:
+    """Return ``(features, metadata)`` from the cache only, never calling the service.
+
+    Features that are not cached are missing from the result; ``preprocessor``
+    only selects the key, as in ``analyze_with_cache``.
+    """
+    data = await read_image_bytes(source)
+    image_hash, _ = _image_key(data, source, preprocessor)
+    wanted = [VisualFeatures(f).value for f in features]
+    cached = cache.get(image_hash, wanted + [METADATA], options)
+    return cached, cached.pop(METADATA, None)
+
+
+async def analyze_with_cache(
+    client: ImageAnalysisClient,
+    cache: AnalysisCache,
+    source: str,
+    features: Sequence[VisualFeatures],
+    preprocessor: Optional[ImagePreprocessor] = None,
+    **options,
+) -> Tuple[Dict[str, object], Optional[dict], List[str]]:
+    """Return ``(features, metadata, fetched)`` serving cached features locally.
+
+    The image is always read so it can be hashed; URLs are therefore
+    downloaded once here and, on a partial hit, uploaded as bytes rather
+    than fetched a second time by the service. ``fetched`` lists the
+    features that had to be requested. Local files prepared by a
+    ``preprocessor`` are keyed by original content and target, and their
+    results are stored in original-image coordinates.
+    """
+    data = await read_image_bytes(source)
+    image_hash, preprocessor = _image_key(data, source, preprocessor)
+    wanted = [VisualFeatures(f).value for f in features]
+    cached = cache.get(image_hash, wanted + [METADATA], options)
+    missing = [f for f in wanted if f not in cached]
+    metadata = cached.pop(METADATA, None)
+    if not missing:
+        cache.calls_avoided += 1
+        return cached, metadata, []
+
+    if len(missing) < len(wanted):
+        cache.calls_narrowed += 1
+    prepared = await preprocessor.prepare(source) if preprocessor else None
+    if prepared is not None:
+        data = prepared.data
+    result = await client.analyze(
+        image_data=data,
+        visual_features=[VisualFeatures(f) for f in missing],
+        **options,
+    )
+    fresh, metadata = feature_results(result), metadata_dict(result)
+    if prepared is not None:
+        fresh, metadata = to_original_coordinates(
+            fresh, metadata, prepared.scale, prepared.original_size
+        )
+    # A requested feature the service returned nothing for is cached as None.
+    fetched = {feature: fresh.get(feature) for feature in missing}
+    cache.put(image_hash, {**fetched, METADATA: metadata}, options)
+    return {**cached, **fetched}, metadata, missing
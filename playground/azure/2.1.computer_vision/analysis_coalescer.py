@@ -0,0 +1,178 @@
+"""
+Azure AI Vision - Request Coalescing
+Merges analyses of the same image requested by independent callers within a
+short window into a single analyze call for the union of their features, and
+hands every caller only the features it asked for.
+"""
+
+import argparse
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Sequence, Set, Tuple
+
+from azure.ai.vision.imageanalysis.aio import ImageAnalysisClient
+from azure.ai.vision.imageanalysis.models import VisualFeatures
+
+from analysis_cache import AnalysisCache, analyze_with_cache
+from analysis_results import feature_results, metadata_dict
+from image_analysis_batch import DEFAULT_OPTIONS, analyze_source
+from vision_client import create_async_vision_client
+
+DEFAULT_WINDOW_MS = 25.0
+
+DEFAULT_IMAGE_URL = "https://learn.microsoft.com/azure/ai-services/computer-vision/media/quickstarts/presentation.png"
+
+
+@dataclass
+class _Batch:
+    """Features gathered for one (image, options) pair before the call goes out."""
+
+    features: Set[str] = field(default_factory=set)
+    future: asyncio.Future = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    requests: int = 0
+
+
+@dataclass
+class CoalescerStats:
+    requests: int = 0
+    service_calls: int = 0
+    joined_in_flight: int = 0
+
+    def print(self) -> None:
+        merged = self.requests - self.service_calls
+        print("\n--- Request Coalescing ---")
+        print(
+            f"Requests: {self.requests}, analyze calls: {self.service_calls} "
+            f"({merged} merged, {self.joined_in_flight} served by a call in flight)"
+        )
+
+
+class AnalysisCoalescer:
+    """Front for ``ImageAnalysisClient`` that merges near-simultaneous requests.
+
+    The first request for an image opens a batch and waits ``window_ms``;
+    requests arriving meanwhile add their features to it. A request whose
+    features are all covered by a call already in flight waits for that call
+    instead of opening a new batch.
+    """
+
+    def __init__(
+        self,
+        client: Optional[ImageAnalysisClient] = None,
+        window_ms: float = DEFAULT_WINDOW_MS,
+        cache: Optional[AnalysisCache] = None,
+    ):
+        self.client = client or create_async_vision_client()
+        self.window_s = window_ms / 1000
+        self.cache = cache
+        self.stats = CoalescerStats()
+        self._open: Dict[Tuple[str, str], _Batch] = {}
+        self._in_flight: Dict[Tuple[str, str], _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def analyze(
+        self, source: str, features: Sequence[VisualFeatures], **options
+    ) -> Dict[str, object]:
+        """Return ``{feature: result, "metadata": ...}`` for the requested features."""
+        options = {**DEFAULT_OPTIONS, **options}
+        wanted = {VisualFeatures(f).value for f in features}
+        key = (source, json.dumps(options, sort_keys=True))
+        self.stats.requests += 1
+
+        running = self._in_flight.get(key)
+        if running is not None and wanted <= running.features:
+            self.stats.joined_in_flight += 1
+            batch = running
+        else:
+            batch = self._open.get(key)
+            if batch is None:
+                batch = self._open[key] = _Batch()
+                asyncio.get_running_loop().call_later(
+                    self.window_s, self._dispatch, key, source, options
+                )
+            batch.features |= wanted
+        batch.requests += 1
+
+        results = await asyncio.shield(batch.future)
+        sliced = {f: results[f] for f in wanted if f in results}
+        sliced["metadata"] = results.get("metadata")
+        return sliced
+
+    def _dispatch(self, key: Tuple[str, str], source: str, options: dict) -> None:
+        batch = self._open.pop(key)
+        self._in_flight[key] = batch
+        self.stats.service_calls += 1
+        # The loop only holds weak references to tasks; keep ours until done.
+        task = asyncio.ensure_future(self._run(key, batch, source, options))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(
+        self, key: Tuple[str, str], batch: _Batch, source: str, options: dict
+    ) -> None:
+        features = [VisualFeatures(f) for f in sorted(batch.features)]
+        try:
+            if self.cache is not None:
+                results, metadata, _ = await analyze_with_cache(
+                    self.client, self.cache, source, features, **options
+                )
+            else:
+                result = await analyze_source(self.client, source, features, **options)
+                results, metadata = feature_results(result), metadata_dict(result)
+            batch.future.set_result({**results, "metadata": metadata})
+        except Exception as e:  # every waiting caller gets the failure
+            batch.future.set_exception(e)
+        finally:
+            if self._in_flight.get(key) is batch:
+                del self._in_flight[key]
+
+    # Drop-in equivalents of the separate Computer Vision calls.
+
+    async def describe(self, source: str, **options) -> Optional[dict]:
+        result = await self.analyze(source, [VisualFeatures.CAPTION], **options)
+        return result.get(VisualFeatures.CAPTION.value)
+
+    async def tags(self, source: str, **options) -> Optional[list]:
+        result = await self.analyze(source, [VisualFeatures.TAGS], **options)
+        return result.get(VisualFeatures.TAGS.value)
+
+    async def read(self, source: str, **options) -> Optional[list]:
+        result = await self.analyze(source, [VisualFeatures.READ], **options)
+        return result.get(VisualFeatures.READ.value)
+
+    async def close(self) -> None:
+        """Wait for calls still in flight, then close the client."""
+        await asyncio.gather(*self._tasks)
+        await self.client.close()
+
+
+async def run_demo(image_url: str, window_ms: float) -> None:
+    coalescer = AnalysisCoalescer(window_ms=window_ms)
+    try:
+        # Three independent consumers asking about the same image at once.
+        caption, tags, lines = await asyncio.gather(
+            coalescer.describe(image_url),
+            coalescer.tags(image_url),
+            coalescer.read(image_url),
+        )
+    finally:
+        await coalescer.close()
+    print(f"Caption: {caption}")
+    print(f"Tags: {[t['name'] for t in tags or []]}")
+    print(f"Text lines: {[line['text'] for line in lines or []]}")
+    coalescer.stats.print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("url", nargs="?", default=DEFAULT_IMAGE_URL)
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS)
+    args = parser.parse_args()
+    asyncio.run(run_demo(args.url, args.window_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Azure AI Vision - Image Analysis result helpers
+"""
+
+from typing import Dict, List, Tuple
+
+from azure.ai.vision.imageanalysis.models import ImageAnalysisResult, VisualFeatures
+
+
+def _box(box) -> List[int]:
+    return [box.x, box.y, box.width, box.height]
+
+
+def _polygon(points) -> List[int]:
+    return [c for point in points for c in (point.x, point.y)]
+
+
+def feature_results(result: ImageAnalysisResult) -> Dict[str, object]:
+    """Flatten an analysis result into ``{feature name: JSON-ready value}``."""
+    features: Dict[str, object] = {}
+    if result.caption:
+        features[VisualFeatures.CAPTION.value] = {
+            "text": result.caption.text,
+            "confidence": result.caption.confidence,
+        }
+    if result.dense_captions:
+        features[VisualFeatures.DENSE_CAPTIONS.value] = [
+            {"text": c.text, "confidence": c.confidence, "box": _box(c.bounding_box)}
+            for c in result.dense_captions.list
+        ]
+    if result.tags:
+        features[VisualFeatures.TAGS.value] = [
+            {"name": t.name, "confidence": t.confidence} for t in result.tags.list
+        ]
+    if result.objects:
+        features[VisualFeatures.OBJECTS.value] = [
+            {
+                "name": o.tags[0].name,
+                "confidence": o.tags[0].confidence,
+                "box": _box(o.bounding_box),
+            }
+            for o in result.objects.list
+        ]
+    if result.people:
+        features[VisualFeatures.PEOPLE.value] = [
+            {"confidence": p.confidence, "box": _box(p.bounding_box)}
+            for p in result.people.list
+        ]
+    if result.smart_crops:
+        features[VisualFeatures.SMART_CROPS.value] = [
+            {"aspect_ratio": c.aspect_ratio, "box": _box(c.bounding_box)}
+            for c in result.smart_crops.list
+        ]
+    if result.read is not None:
+        features[VisualFeatures.READ.value] = [
+            {"text": line.text, "polygon": _polygon(line.bounding_polygon)}
+            for block in result.read.blocks
+            for line in block.lines
+        ]
+    return features
+
+
+def metadata_dict(result: ImageAnalysisResult) -> Dict[str, object]:
+    return {
+        "width": result.metadata.width,
+        "height": result.metadata.height,
+        "model_version": result.model_version,
+    }
+
+
+def to_original_coordinates(
+    features: Dict[str, object],
+    metadata: Dict[str, object],
+    scale: Tuple[float, float],
+    original_size: Tuple[int, int],
+) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """Map boxes and polygons of a downscaled upload back onto the original image."""
+    sx, sy = scale
+    if (sx, sy) != (1.0, 1.0):
+        for items in features.values():
+            if not isinstance(items, list):
+                continue
+            for item in items:
+                if "box" in item:
+                    x, y, w, h = item["box"]
+                    item["box"] = [
+                        round(x * sx),
+                        round(y * sy),
+                        round(w * sx),
+                        round(h * sy),
+                    ]
+                if "polygon" in item:
+                    item["polygon"] = [
+                        round(c * (sx if i % 2 == 0 else sy))
+                        for i, c in enumerate(item["polygon"])
+                    ]
+    metadata = {**metadata, "width": original_size[0], "height": original_size[1]}
+    return features, metadata
@@ -0,0 +1,137 @@
+"""
+Benchmark - Multiplexed Read Engine vs Sequential Fixed-Sleep Polling
+Replays the same simulated Read workload through the loop used by the OCR
+scripts (one job at a time, time.sleep(1) between polls) and through ReadEngine.
+No Azure credentials are needed; all times are scaled down by --time-scale so
+the run stays short, and reported in unscaled seconds.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from azure.cognitiveservices.vision.computervision.models import OperationStatusCodes
+
+from ocr_engine import CompletionModel, ReadEngine, ReadJob
+
+
+class FakeReadClient:
+    """Thread-safe stand-in for the Read endpoints of ComputerVisionClient."""
+
+    def __init__(self, durations, latency_s: float, time_scale: float):
+        self._durations = durations
+        self._latency = latency_s * time_scale
+        self._scale = time_scale
+        self._done_at = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _roundtrip(self) -> None:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self._latency)
+
+    def read(self, url, raw=False, **kwargs):
+        # The SDK serializes pages as '[str]' joined by commas; a bare string
+        # would go out one character per selector.
+        pages = kwargs.get("pages")
+        assert pages is None or (
+            isinstance(pages, list) and all(isinstance(p, str) for p in pages)
+        ), f"pages must be a list of selectors, got {pages!r}"
+        self._roundtrip()
+        index = int(url.rsplit("/", 1)[-1])
+        with self._lock:
+            self._done_at[str(index)] = (
+                time.monotonic() + self._durations[index] * self._scale
+            )
+        return SimpleNamespace(headers={"Operation-Location": f"ops/{index}"})
+
+    def get_read_result(self, operation_id, raw=False, **kwargs):
+        self._roundtrip()
+        done = time.monotonic() >= self._done_at[operation_id]
+        status = (
+            OperationStatusCodes.succeeded if done else OperationStatusCodes.running
+        )
+        output = SimpleNamespace(status=status, analyze_result=None)
+        if raw:
+            return SimpleNamespace(output=output, response=SimpleNamespace(headers={}))
+        return output
+
+
+def run_sequential(client: FakeReadClient, jobs: int, time_scale: float) -> float:
+    """The loop from 5_ocr_extract_text_from_url_image.py, one job after another."""
+    started = time.perf_counter()
+    for index in range(jobs):
+        response = client.read(f"https://example/{index}", raw=True)
+        operation_id = response.headers["Operation-Location"].split("/")[-1]
+        while True:
+            result = client.get_read_result(operation_id)
+            if result.status not in ["notStarted", "running"]:
+                break
+            time.sleep(1 * time_scale)
+    return time.perf_counter() - started
+
+
+def run_engine(client: FakeReadClient, jobs: int, time_scale: float, args) -> tuple:
+    model = CompletionModel(
+        initial_s=1.0 * time_scale,
+        min_interval_s=0.25 * time_scale,
+        max_interval_s=5.0 * time_scale,
+    )
+    engine = ReadEngine(
+        client,
+        max_outstanding=args.max_outstanding,
+        rate_per_second=args.rate / time_scale,
+        model=model,
+    )
+
+    async def drain() -> None:
+        work = (ReadJob(i, f"https://example/{i}") for i in range(jobs))
+        async for _ in engine.read_many(work):
+            pass
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(drain())
+    finally:
+        engine.close()
+    return time.perf_counter() - started, engine.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--jobs", type=int, default=200)
+    parser.add_argument("--median-s", type=float, default=2.5, help="Read duration")
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="per call")
+    parser.add_argument("--max-outstanding", type=int, default=64)
+    parser.add_argument("--rate", type=float, default=10.0, help="calls per second")
+    parser.add_argument("--time-scale", type=float, default=0.02)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    durations = [rng.lognormvariate(0, 0.5) * args.median_s for _ in range(args.jobs)]
+    scale, latency = args.time_scale, args.latency_ms / 1000
+
+    baseline = FakeReadClient(durations, latency, scale)
+    sequential_s = run_sequential(baseline, args.jobs, scale) / scale
+    engine_client = FakeReadClient(durations, latency, scale)
+    engine_s, stats = run_engine(engine_client, args.jobs, scale, args)
+    engine_s /= scale
+
+    print(f"Jobs: {args.jobs}, median Read time {args.median_s}s")
+    print(
+        f"Sequential, sleep(1): {sequential_s:8.1f}s, "
+        f"{baseline.calls - args.jobs} polls"
+    )
+    print(
+        f"ReadEngine:           {engine_s:8.1f}s, {stats.polls} polls, "
+        f"{stats.throttled} throttled"
+    )
+    print(f"Speedup: x{sequential_s / engine_s:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Azure AI Vision - Detection Results as NumPy Structured Arrays
+Turns the objects, people and dense captions of many Image Analysis results into
+one structured array (image, feature, label, confidence, x, y, w, h), so that
+confidence filtering, IoU matrices, NMS, normalization and per-class histograms
+run as array math instead of walking result objects box by box.
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+from azure.ai.vision.imageanalysis.models import ImageAnalysisResult, VisualFeatures
+from numpy.lib.recfunctions import structured_to_unstructured
+
+from analysis_results import feature_results, metadata_dict
+from detection_ops import DEFAULT_NMS_THRESHOLD, OVERLAP_METRICS, pairwise_overlap
+
+BOX_FEATURES = (
+    VisualFeatures.OBJECTS.value,
+    VisualFeatures.PEOPLE.value,
+    VisualFeatures.DENSE_CAPTIONS.value,
+)
+PERSON_LABEL = "person"
+
+DETECTION_DTYPE = np.dtype(
+    [
+        ("image", np.int32),  # index into DetectionBatch.sources / sizes
+        ("feature", np.int8),  # index into BOX_FEATURES
+        ("label", np.int32),  # index into DetectionBatch.labels
+        ("confidence", np.float32),
+        ("x", np.float32),
+        ("y", np.float32),
+        ("w", np.float32),
+        ("h", np.float32),
+    ]
+)
+NMS_CHUNK_ELEMENTS = 1 << 22  # bound on groups * K * K overlap values per step
+
+
+@dataclass
+class DetectionBatch:
+    """Detections of many images plus the tables their integer codes refer to."""
+
+    detections: np.ndarray
+    sizes: np.ndarray  # (images, 2) width, height in pixels
+    sources: List[str] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.detections)
+
+    def select(self, index: np.ndarray) -> "DetectionBatch":
+        """A batch of the rows picked by a mask or index array."""
+        return DetectionBatch(
+            self.detections[index], self.sizes, self.sources, self.labels
+        )
+
+    def label_names(self) -> np.ndarray:
+        return np.asarray(self.labels, dtype=object)[self.detections["label"]]
+
+
+class _Vocabulary:
+    def __init__(self):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def __call__(self, name: str) -> int:
+        code = self._ids.get(name)
+        if code is None:
+            code = self._ids[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+def from_feature_records(records: Iterable[dict]) -> DetectionBatch:
+    """Build a batch from ``feature_results``-style dicts.
+
+    Each record needs the feature lists and ``metadata`` with the image size,
+    as written by image_analysis_batch.py; records with an ``error`` keep
+    their image index but contribute no rows.
+    """
+    vocabulary = _Vocabulary()
+    sources: List[str] = []
+    sizes: List[tuple] = []
+
+    def rows() -> Iterator[tuple]:
+        for image, record in enumerate(records):
+            sources.append(record.get("source", str(image)))
+            metadata = record.get("metadata") or {}
+            sizes.append((metadata.get("width", 0), metadata.get("height", 0)))
+            for code, feature in enumerate(BOX_FEATURES):
+                for item in record.get(feature) or []:
+                    name = item.get("name") or item.get("text") or PERSON_LABEL
+                    yield (
+                        image,
+                        code,
+                        vocabulary(name),
+                        item["confidence"],
+                        *item["box"],
+                    )
+
+    detections = np.fromiter(rows(), dtype=DETECTION_DTYPE)
+    return DetectionBatch(
+        detections,
+        np.asarray(sizes, dtype=np.float64).reshape(-1, 2),
+        sources,
+        vocabulary.names,
+    )
+
+
+def from_results(
+    results: Iterable[ImageAnalysisResult], sources: Optional[Iterable[str]] = None
+) -> DetectionBatch:
+    """Build a batch straight from SDK results."""
+    names = iter(sources) if sources is not None else None
+    return from_feature_records(
+        {
+            **feature_results(result),
+            "metadata": metadata_dict(result),
+            **({"source": next(names)} if names is not None else {}),
+        }
+        for result in results
+    )
+
+
+def load_jsonl(paths: Iterable[Union[str, Path]]) -> DetectionBatch:
+    """Read image_analysis_batch.py output files into one batch."""
+
+    def records() -> Iterator[dict]:
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+    return from_feature_records(records())
+
+
+def boxes(detections: np.ndarray) -> np.ndarray:
+    """(N, 4) float64 x, y, w, h."""
+    return structured_to_unstructured(
+        detections[["x", "y", "w", "h"]], dtype=np.float64
+    )
+
+
+def confidence_mask(
+    detections: np.ndarray, threshold: Union[float, Dict[str, float]]
+) -> np.ndarray:
+    """Rows at or above ``threshold``, which may be set per feature name."""
+    if isinstance(threshold, dict):
+        per_feature = np.array([threshold.get(f, 0.0) for f in BOX_FEATURES])
+        return detections["confidence"] >= per_feature[detections["feature"]]
+    return detections["confidence"] >= threshold
+
+
+def iou_matrix(
+    a: np.ndarray, b: Optional[np.ndarray] = None, metric: str = "iou"
+) -> np.ndarray:
+    """Pairwise overlap between the rows of two detection arrays."""
+    return pairwise_overlap(boxes(a), boxes(a if b is None else b), metric)
+
+
+def normalize(detections: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """A copy with x, w divided by the image width and y, h by its height."""
+    out = detections.copy()
+    size = sizes[detections["image"]]
+    width = np.where(size[:, 0] > 0, size[:, 0], 1.0)
+    height = np.where(size[:, 1] > 0, size[:, 1], 1.0)
+    out["x"] /= width
+    out["w"] /= width
+    out["y"] /= height
+    out["h"] /= height
+    return out
+
+
+def batched_nms(
+    detections: np.ndarray,
+    threshold: float = DEFAULT_NMS_THRESHOLD,
+    metric: str = "iou",
+) -> np.ndarray:
+    """Sorted indices of the rows kept by NMS within each (image, feature, label).
+
+    Groups are padded to a (groups, K, K) overlap tensor, and greedy
+    suppression steps through the K ranks for all groups at once. Groups are
+    processed by size so small groups are not padded up to the largest one.
+    """
+    n = len(detections)
+    if n == 0:
+        return np.empty(0, dtype=np.intp)
+    image, feature, label = (detections[k] for k in ("image", "feature", "label"))
+    order = np.lexsort((-detections["confidence"], label, feature, image))
+    image, feature, label = image[order], feature[order], label[order]
+    change = np.ones(n, dtype=bool)
+    change[1:] = (np.diff(image) != 0) | (np.diff(feature) != 0) | (np.diff(label) != 0)
+    starts = np.flatnonzero(change)
+    counts = np.diff(np.append(starts, n))
+
+    xywh = boxes(detections)[order]
+    x1, y1 = xywh[:, 0], xywh[:, 1]
+    x2, y2 = x1 + xywh[:, 2], y1 + xywh[:, 3]
+    areas = xywh[:, 2] * xywh[:, 3]
+
+    kept = [starts[counts == 1]]  # a box alone in its group always survives
+    multi = np.flatnonzero(counts > 1)
+    multi = multi[np.argsort(counts[multi], kind="stable")]
+    begin = 0
+    while begin < len(multi):
+        # Take groups of similar size while groups * K * K stays bounded.
+        end = begin + 1
+        while (
+            end < len(multi)
+            and (end - begin + 1) * counts[multi[end]] ** 2 <= NMS_CHUNK_ELEMENTS
+        ):
+            end += 1
+        k = counts[multi[end - 1]]
+        groups = multi[begin:end]
+        rank = np.arange(k)
+        valid = rank[None, :] < counts[groups][:, None]
+        index = np.where(
+            valid, starts[groups][:, None] + rank[None, :], starts[groups][:, None]
+        )
+
+        gx1, gy1, gx2, gy2 = x1[index], y1[index], x2[index], y2[index]
+        iw = np.minimum(gx2[:, :, None], gx2[:, None, :]) - np.maximum(
+            gx1[:, :, None], gx1[:, None, :]
+        )
+        ih = np.minimum(gy2[:, :, None], gy2[:, None, :]) - np.maximum(
+            gy1[:, :, None], gy1[:, None, :]
+        )
+        inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+        ga = areas[index]
+        if metric == "iou":
+            denom = ga[:, :, None] + ga[:, None, :] - inter
+        elif metric == "ios":
+            denom = np.minimum(ga[:, :, None], ga[:, None, :])
+        else:
+            raise ValueError(f"metric must be one of {OVERLAP_METRICS}")
+        overlap = np.divide(inter, denom, out=np.zeros_like(inter), where=denom > 0)
+
+        keep = valid.copy()
+        for r in range(k - 1):
+            suppress = keep[:, r, None] & (overlap[:, r, :] > threshold)
+            suppress[:, : r + 1] = False
+            keep &= ~suppress
+        kept.append(index[keep])
+        begin = end
+    return np.sort(order[np.concatenate(kept)])
+
+
+def class_counts(detections: np.ndarray, n_labels: int) -> np.ndarray:
+    return np.bincount(detections["label"], minlength=n_labels)
+
+
+def confidence_histogram(
+    detections: np.ndarray, n_labels: int, bins: int = 10
+) -> np.ndarray:
+    """(labels, bins) counts of confidences in equal-width bins over [0, 1]."""
+    bucket = np.clip((detections["confidence"] * bins).astype(np.int64), 0, bins - 1)
+    flat = np.bincount(detections["label"] * bins + bucket, minlength=n_labels * bins)
+    return flat.reshape(n_labels, bins)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "files", nargs="+", type=Path, help="JSONL from image_analysis_batch.py"
+    )
+    parser.add_argument("--min-confidence", type=float, default=0.5)
+    parser.add_argument("--nms-threshold", type=float, default=DEFAULT_NMS_THRESHOLD)
+    parser.add_argument("--top", type=int, default=20, help="classes to list")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    batch = load_jsonl(args.files)
+    loaded = time.perf_counter()
+    batch = batch.select(confidence_mask(batch.detections, args.min_confidence))
+    batch = batch.select(batched_nms(batch.detections, args.nms_threshold))
+    counts = class_counts(batch.detections, len(batch.labels))
+    histogram = confidence_histogram(batch.detections, len(batch.labels))
+    finished = time.perf_counter()
+
+    for code in np.argsort(-counts)[: args.top]:
+        if counts[code]:
+            bars = " ".join(f"{c:>5}" for c in histogram[code])
+            print(f"{batch.labels[code][:30]:<30} {counts[code]:>8}  {bars}")
+    print(
+        f"\n{len(batch.sources)} images, {len(batch)} detections kept; "
+        f"load {loaded - started:.2f}s, array ops {finished - loaded:.3f}s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
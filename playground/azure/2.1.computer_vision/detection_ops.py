@@ -0,0 +1,85 @@
+"""
+Azure AI Vision - Vectorized Box Operations
+NumPy helpers for detection boxes in the services' (x, y, w, h) pixel format:
+pairwise overlap matrices and class-aware non-maximum suppression.
+"""
+
+from typing import Optional
+
+import numpy as np
+
+DEFAULT_NMS_THRESHOLD = 0.5
+OVERLAP_METRICS = ("iou", "ios")
+
+
+def _corners(boxes: np.ndarray):
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    return x1, y1, x1 + boxes[:, 2], y1 + boxes[:, 3]
+
+
+def pairwise_overlap(a: np.ndarray, b: np.ndarray, metric: str = "iou") -> np.ndarray:
+    """(N, M) overlap between (N, 4) and (M, 4) xywh boxes.
+
+    ``iou`` is intersection over union; ``ios`` is intersection over the
+    smaller box, which also scores a box cut off at a tile edge against the
+    whole object.
+    """
+    ax1, ay1, ax2, ay2 = (c[:, None] for c in _corners(a))
+    bx1, by1, bx2, by2 = (c[None, :] for c in _corners(b))
+    iw = np.clip(np.minimum(ax2, bx2) - np.maximum(ax1, bx1), 0, None)
+    ih = np.clip(np.minimum(ay2, by2) - np.maximum(ay1, by1), 0, None)
+    inter = iw * ih
+    area_a = (ax2 - ax1) * (ay2 - ay1)
+    area_b = (bx2 - bx1) * (by2 - by1)
+    if metric == "iou":
+        denom = area_a + area_b - inter
+    elif metric == "ios":
+        denom = np.minimum(area_a, area_b)
+    else:
+        raise ValueError(f"metric must be one of {OVERLAP_METRICS}")
+    return np.divide(inter, denom, out=np.zeros_like(inter), where=denom > 0)
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    classes: Optional[np.ndarray] = None,
+    threshold: float = DEFAULT_NMS_THRESHOLD,
+    metric: str = "iou",
+) -> np.ndarray:
+    """Indices of the boxes kept by greedy NMS, highest score first.
+
+    With ``classes``, boxes of different classes never suppress each other:
+    each class is shifted to its own region of the plane, so one pass
+    handles every class.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4).copy()
+    scores = np.asarray(scores, dtype=np.float64)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+    if classes is not None:
+        extent = (boxes[:, :2] + boxes[:, 2:]).max() + 1
+        boxes[:, :2] += np.asarray(classes)[:, None] * extent
+
+    x1, y1, x2, y2 = _corners(boxes)
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        iw = np.clip(
+            np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None
+        )
+        ih = np.clip(
+            np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None
+        )
+        inter = iw * ih
+        if metric == "iou":
+            denom = areas[best] + areas[rest] - inter
+        else:
+            denom = np.minimum(areas[best], areas[rest])
+        overlap = np.divide(inter, denom, out=np.zeros_like(inter), where=denom > 0)
+        order = rest[overlap <= threshold]
+    return np.asarray(keep, dtype=np.intp)
@@ -0,0 +1,329 @@
+"""
+Azure AI Vision - Batch Domain-Model Analysis (Landmarks, Brands, ...)
+Runs (image, kind) jobs on a thread pool over one Computer Vision client, where
+a kind is a domain model (landmarks, celebrities) or a detection feature
+(brands, objects). Each image is downloaded and hashed once, results are cached
+per image hash and kind, and every job becomes one JSONL record of detections
+with rectangles normalized to the image size.
+"""
+
+import argparse
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+from azure.cognitiveservices.vision.computervision.models import (
+    VisualFeatureTypes,
+)
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+from analysis_cache import AnalysisCache, image_digest, print_cache_stats
+from image_analysis_batch import AnalysisStats, is_url, iter_sources
+from service_retry import call_with_retry
+from vision_client import create_computer_vision_client
+
+DEFAULT_WORKERS = 8
+MAX_ATTEMPTS = 5
+DOMAIN_MODELS = ("landmarks", "celebrities")
+FEATURE_KINDS = {
+    "brands": VisualFeatureTypes.brands,
+    "objects": VisualFeatureTypes.objects,
+}
+KINDS = DOMAIN_MODELS + tuple(FEATURE_KINDS)
+
+
+def _cache_key(kind: str) -> str:
+    return f"cv32:{kind}"
+
+
+def _normalize(x: float, y: float, w: float, h: float, size: Tuple[int, int]) -> list:
+    width, height = size
+    return [
+        round(x / width, 5),
+        round(y / height, 5),
+        round(w / width, 5),
+        round(h / height, 5),
+    ]
+
+
+def domain_detections(result: dict, model: str, size: Tuple[int, int]) -> List[dict]:
+    """``[{name, confidence, box}]`` from ``DomainModelResults.result``.
+
+    Landmarks carry no rectangle, so their ``box`` is None.
+    """
+    detections = []
+    for item in result.get(model, []):
+        rect = item.get("faceRectangle")
+        box = None
+        if rect:
+            box = _normalize(
+                rect["left"], rect["top"], rect["width"], rect["height"], size
+            )
+        detections.append(
+            {"name": item["name"], "confidence": item.get("confidence"), "box": box}
+        )
+    return detections
+
+
+def feature_detections(analysis, kind: str, size: Tuple[int, int]) -> List[dict]:
+    """``[{name, confidence, box}]`` for brands or objects of an ``ImageAnalysis``."""
+    detections = []
+    for item in getattr(analysis, kind) or []:
+        rect = item.rectangle
+        name = item.name if kind == "brands" else item.object_property
+        detections.append(
+            {
+                "name": name,
+                "confidence": item.confidence,
+                "box": _normalize(rect.x, rect.y, rect.w, rect.h, size),
+            }
+        )
+    return detections
+
+
+@dataclass
+class DomainRecord:
+    """Outcome of one (image, kind) job."""
+
+    source: str
+    kind: str
+    image_hash: Optional[str] = None
+    size: Optional[Tuple[int, int]] = None
+    detections: List[dict] = field(default_factory=list)
+    cached: bool = False
+    error: Optional[str] = None
+    latency_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "kind": self.kind,
+            "image_hash": self.image_hash,
+            "width": self.size[0] if self.size else None,
+            "height": self.size[1] if self.size else None,
+            "detections": self.detections,
+            "cached": self.cached,
+            "error": self.error,
+            "latency_ms": round(self.latency_ms, 2),
+        }
+
+
+def load_source_bytes(source: str) -> bytes:
+    if is_url(source):
+        response = requests.get(source, timeout=30)
+        response.raise_for_status()
+        return response.content
+    return Path(source).read_bytes()
+
+
+def _group_by_source(
+    jobs: Iterable[Tuple[str, str]],
+) -> Iterator[Tuple[str, List[str]]]:
+    for source, group in groupby(jobs, key=lambda job: job[0]):
+        kinds: List[str] = []
+        for _, kind in group:
+            if kind not in KINDS:
+                raise ValueError(f"Unknown kind {kind!r}; expected one of {KINDS}")
+            if kind not in kinds:
+                kinds.append(kind)
+        yield source, kinds
+
+
+class DomainAnalyzer:
+    """Thread-pool runner for domain models and detection features.
+
+    msrest keeps one requests session per thread, so sharing a single client
+    across the pool gives every worker its own kept-alive connection. All
+    missing features of an image go out in one analyze call; each missing
+    domain model is one more call on the same uploaded bytes.
+    """
+
+    def __init__(
+        self,
+        client: Optional[ComputerVisionClient] = None,
+        max_workers: int = DEFAULT_WORKERS,
+        cache: Optional[AnalysisCache] = None,
+        language: str = "en",
+    ):
+        self.client = client or create_computer_vision_client()
+        self.max_workers = max_workers
+        self.cache = cache
+        self.options = {"language": language}
+        self.service_calls = 0
+        self._lock = threading.Lock()  # guards the cache and the call counter
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _call(self, fn: Callable):
+        """Run ``fn`` (one SDK call) through ``call_with_retry``, counting attempts.
+
+        ``fn`` builds its own stream, so a retried upload starts at byte 0.
+        """
+
+        def attempt():
+            with self._lock:
+                self.service_calls += 1
+            return fn()
+
+        return call_with_retry(attempt, MAX_ATTEMPTS)
+
+    def fetch(self, data: bytes, kinds: Sequence[str]) -> Dict[str, object]:
+        """Call the service for ``kinds``: ``{cache key: {size, detections}}``."""
+        fresh: Dict[str, object] = {}
+        features = [k for k in kinds if k in FEATURE_KINDS]
+        if features:
+            analysis = self._call(
+                lambda: self.client.analyze_image_in_stream(
+                    io.BytesIO(data),
+                    visual_features=[FEATURE_KINDS[k] for k in features],
+                    **self.options,
+                )
+            )
+            size = (analysis.metadata.width, analysis.metadata.height)
+            for kind in features:
+                fresh[_cache_key(kind)] = {
+                    "size": size,
+                    "detections": feature_detections(analysis, kind, size),
+                }
+        for model in (k for k in kinds if k in DOMAIN_MODELS):
+            result = self._call(
+                lambda: self.client.analyze_image_by_domain_in_stream(
+                    model, io.BytesIO(data), **self.options
+                )
+            )
+            size = (result.metadata.width, result.metadata.height)
+            fresh[_cache_key(model)] = {
+                "size": size,
+                "detections": domain_detections(result.result, model, size),
+            }
+        return fresh
+
+    def analyze(self, source: str, kinds: Sequence[str]) -> List[DomainRecord]:
+        """Run every kind for one image; failures become error records."""
+        started = time.perf_counter()
+        records = [DomainRecord(source, kind) for kind in kinds]
+        try:
+            data = load_source_bytes(source)
+            image_hash = image_digest(data)
+            keys = [_cache_key(kind) for kind in kinds]
+            cached: Dict[str, object] = {}
+            if self.cache is not None:
+                with self._lock:
+                    cached = self.cache.get(image_hash, keys, self.options)
+            missing = [kind for kind in kinds if _cache_key(kind) not in cached]
+            fresh = self.fetch(data, missing) if missing else {}
+            if self.cache is not None:
+                with self._lock:
+                    if not missing:
+                        self.cache.calls_avoided += 1
+                    elif len(missing) < len(kinds):
+                        self.cache.calls_narrowed += 1
+                    if fresh:
+                        self.cache.put(image_hash, fresh, self.options)
+            for record in records:
+                key = _cache_key(record.kind)
+                entry = cached.get(key) or fresh[key]
+                record.image_hash = image_hash
+                record.size = tuple(entry["size"])
+                record.detections = entry["detections"]
+                record.cached = key in cached
+        except (
+            HttpOperationError,
+            ClientRequestError,
+            requests.RequestException,
+            OSError,
+        ) as e:
+            for record in records:
+                record.error = f"{type(e).__name__}: {e}"
+        latency_ms = (time.perf_counter() - started) * 1000
+        for record in records:
+            record.latency_ms = latency_ms
+        return records
+
+    def run(self, jobs: Iterable[Tuple[str, str]]) -> Iterator[DomainRecord]:
+        """Run ``(source, kind)`` jobs, yielding records as images finish.
+
+        Consecutive jobs for the same image are grouped so it is read and
+        hashed once; jobs are consumed lazily and at most ``2 * max_workers``
+        images are in flight.
+        """
+        pending = _group_by_source(jobs)
+        running: set = set()
+        window = 2 * self.max_workers
+
+        def refill() -> None:
+            for source, kinds in pending:
+                running.add(self._executor.submit(self.analyze, source, kinds))
+                if len(running) >= window:
+                    return
+
+        refill()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.discard(future)
+                yield from future.result()
+            refill()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "inputs", nargs="+", help="image URLs, files, directories or @list.txt"
+    )
+    parser.add_argument(
+        "-k",
+        "--kinds",
+        default="landmarks",
+        help=f"comma-separated, any of: {', '.join(KINDS)}",
+    )
+    parser.add_argument("-o", "--output", type=Path, help="JSONL file for records")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--cache", type=Path, help="SQLite per-image result cache")
+    args = parser.parse_args()
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    cache = AnalysisCache(args.cache, check_same_thread=False) if args.cache else None
+    analyzer = DomainAnalyzer(
+        max_workers=args.workers, cache=cache, language=args.language
+    )
+    stats = AnalysisStats()
+    output = args.output.open("w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        jobs = (
+            (source, kind) for source in iter_sources(args.inputs) for kind in kinds
+        )
+        for record in analyzer.run(jobs):
+            stats.record(record)
+            output.write(json.dumps(record.as_dict()) + "\n")
+    finally:
+        stats.finished_at = time.perf_counter()
+        if output is not sys.stdout:
+            output.close()
+        analyzer.close()
+        if cache:
+            cache.close()
+    stats.print()
+    print(f"Service calls: {analyzer.service_calls}", file=sys.stderr)
+    if cache:
+        print_cache_stats(cache)
+
+
+if __name__ == "__main__":
+    main()
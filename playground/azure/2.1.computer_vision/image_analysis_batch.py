@@ -0,0 +1,390 @@
+"""
+Azure AI Vision - Batch Image Analysis
+Analyzes many image URLs and local files over one pooled async client with
+bounded concurrency and streams one JSONL record per image as it completes.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    AbstractSet,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import requests
+from azure.ai.vision.imageanalysis.aio import ImageAnalysisClient
+from azure.ai.vision.imageanalysis.models import ImageAnalysisResult, VisualFeatures
+from azure.core.exceptions import AzureError, HttpResponseError
+
+from analysis_cache import AnalysisCache, analyze_with_cache, print_cache_stats
+from analysis_results import feature_results, metadata_dict, to_original_coordinates
+from image_preprocess import TARGETS, ImagePreprocessor
+from vision_client import create_async_vision_client
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_FEATURES = (
+    VisualFeatures.TAGS,
+    VisualFeatures.OBJECTS,
+    VisualFeatures.CAPTION,
+    VisualFeatures.READ,
+    VisualFeatures.SMART_CROPS,
+    VisualFeatures.PEOPLE,
+)
+DEFAULT_OPTIONS = {
+    "language": "en",
+    "gender_neutral_caption": True,
+    "smart_crops_aspect_ratios": [0.9, 1.33],
+}
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp"}
+
+
+def is_url(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def iter_sources(
+    inputs: Iterable[str], suffixes: AbstractSet[str] = IMAGE_SUFFIXES
+) -> Iterator[str]:
+    """Expand URLs, files, directories and ``@list.txt`` files lazily."""
+    for item in inputs:
+        if is_url(item):
+            yield item
+        elif item.startswith("@"):
+            with open(item[1:], "r", encoding="utf-8") as f:
+                lines = (line.strip() for line in f if line.strip())
+                yield from iter_sources(lines, suffixes)
+        elif Path(item).is_dir():
+            for path in sorted(Path(item).rglob("*")):
+                if path.suffix.lower() in suffixes and path.is_file():
+                    yield str(path)
+        else:
+            yield item
+
+
+def describe_error(e: Exception) -> str:
+    """Flatten an Azure error into a short 'code: message' string."""
+    if isinstance(e, HttpResponseError) and e.error:
+        return f"{e.error.code}: {e.error.message}"
+    return f"{type(e).__name__}: {e}"
+
+
+@dataclass
+class AnalysisRecord:
+    """Outcome of analyzing one image of a batch."""
+
+    index: int
+    source: str
+    features: Dict[str, object] = field(default_factory=dict)
+    metadata: Optional[Dict[str, object]] = None
+    error: Optional[str] = None
+    latency_ms: float = 0.0
+    cached: bool = False  # served entirely from the analysis cache
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def as_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "source": self.source,
+            **self.features,
+            "metadata": self.metadata,
+            "error": self.error,
+            "cached": self.cached,
+            "latency_ms": round(self.latency_ms, 2),
+        }
+
+
+@dataclass
+class AnalysisStats:
+    """Throughput and latency counters collected while a batch runs."""
+
+    succeeded: int = 0
+    failed: int = 0
+    cached: int = 0
+    latencies_ms: List[float] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    finished_at: Optional[float] = None
+
+    def record(self, record: AnalysisRecord) -> None:
+        if record.ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        # Cache hits never reach the service; their ~0 ms would skew the
+        # latency percentiles and the analysis throughput.
+        if getattr(record, "cached", False):
+            self.cached += 1
+        else:
+            self.latencies_ms.append(record.latency_ms)
+
+    def percentile(self, pct: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        rank = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[rank]
+
+    def summary(self) -> dict:
+        total = self.succeeded + self.failed
+        analyzed = total - self.cached
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        return {
+            "total": total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cached": self.cached,
+            "elapsed_s": round(elapsed, 3),
+            "images_per_s": round(analyzed / elapsed, 2) if elapsed > 0 else 0.0,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+        }
+
+    def print(self) -> None:
+        summary = self.summary()
+        print("\n--- Batch Summary ---", file=sys.stderr)
+        print(
+            f"Images: {summary['total']} ({summary['failed']} failed, "
+            f"{summary['cached']} from cache)",
+            file=sys.stderr,
+        )
+        print(
+            f"Elapsed: {summary['elapsed_s']}s → {summary['images_per_s']} "
+            "analyzed images/s",
+            file=sys.stderr,
+        )
+        print(
+            f"Latency: p50 {summary['p50_ms']}ms, "
+            f"p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms",
+            file=sys.stderr,
+        )
+
+
+async def analyze_source(
+    client: ImageAnalysisClient,
+    source: str,
+    features: Sequence[VisualFeatures],
+    **options,
+) -> ImageAnalysisResult:
+    """Analyze a URL in place or upload a local file's bytes."""
+    if is_url(source):
+        return await client.analyze_from_url(
+            image_url=source, visual_features=list(features), **options
+        )
+    data = await asyncio.to_thread(Path(source).read_bytes)
+    return await client.analyze(
+        image_data=data, visual_features=list(features), **options
+    )
+
+
+async def analyze_flat(
+    client: ImageAnalysisClient,
+    source: str,
+    features: Sequence[VisualFeatures],
+    preprocessor: Optional[ImagePreprocessor] = None,
+    **options,
+) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """Return ``(features, metadata)`` in the coordinates of the original image.
+
+    Local files go through ``preprocessor`` when one is given; URLs are always
+    fetched by the service itself.
+    """
+    if preprocessor is None or is_url(source):
+        result = await analyze_source(client, source, features, **options)
+        return feature_results(result), metadata_dict(result)
+    prepared = await preprocessor.prepare(source)
+    result = await client.analyze(
+        image_data=prepared.data, visual_features=list(features), **options
+    )
+    return to_original_coordinates(
+        feature_results(result),
+        metadata_dict(result),
+        prepared.scale,
+        prepared.original_size,
+    )
+
+
+async def _analyze_one(
+    client: ImageAnalysisClient,
+    index: int,
+    source: str,
+    features: Sequence[VisualFeatures],
+    options: dict,
+    cache: Optional[AnalysisCache],
+    preprocessor: Optional[ImagePreprocessor],
+) -> AnalysisRecord:
+    record = AnalysisRecord(index=index, source=source)
+    started = time.perf_counter()
+    try:
+        if cache is not None:
+            record.features, record.metadata, fetched = await analyze_with_cache(
+                client, cache, source, features, preprocessor, **options
+            )
+            record.cached = not fetched
+        else:
+            record.features, record.metadata = await analyze_flat(
+                client, source, features, preprocessor, **options
+            )
+    except (AzureError, OSError, requests.RequestException) as e:
+        record.error = describe_error(e)
+    record.latency_ms = (time.perf_counter() - started) * 1000
+    return record
+
+
+async def analyze_images(
+    sources: Iterable[str],
+    features: Sequence[VisualFeatures] = DEFAULT_FEATURES,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    client: Optional[ImageAnalysisClient] = None,
+    stats: Optional[AnalysisStats] = None,
+    cache: Optional[AnalysisCache] = None,
+    preprocessor: Optional[ImagePreprocessor] = None,
+    **options,
+) -> AsyncIterator[AnalysisRecord]:
+    """Analyze images concurrently over one client, yielding in completion order.
+
+    Exactly ``concurrency`` tasks exist at any time and a local file is only
+    read once its task starts, so memory stays bounded for any input size.
+    ``options`` are passed to ``analyze`` (``language``, ``gender_neutral_caption``,
+    ``smart_crops_aspect_ratios``, ``model_version``). With a ``cache``,
+    features already known for an image's content are not requested again;
+    with a ``preprocessor``, local files are downscaled in worker processes
+    while earlier requests are on the wire.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+
+    owns_client = client is None
+    client = client or create_async_vision_client()
+    options = {**DEFAULT_OPTIONS, **options}
+    pending = iter(enumerate(sources))
+    running: set = set()
+
+    def refill() -> None:
+        while len(running) < concurrency:
+            item = next(pending, None)
+            if item is None:
+                return
+            index, source = item
+            running.add(
+                asyncio.ensure_future(
+                    _analyze_one(
+                        client, index, source, features, options, cache, preprocessor
+                    )
+                )
+            )
+
+    try:
+        refill()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                running.discard(task)
+                record = task.result()
+                if stats:
+                    stats.record(record)
+                yield record
+            refill()
+    finally:
+        for task in running:
+            task.cancel()
+        if stats:
+            stats.finished_at = time.perf_counter()
+        if owns_client:
+            await client.close()
+
+
+async def run_batch(
+    sources: Iterable[str],
+    output_path: Optional[Path],
+    features: Sequence[VisualFeatures],
+    concurrency: int,
+    cache: Optional[AnalysisCache] = None,
+    preprocessor: Optional[ImagePreprocessor] = None,
+) -> AnalysisStats:
+    stats = AnalysisStats()
+    output = output_path.open("w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        async for record in analyze_images(
+            sources,
+            features,
+            concurrency,
+            stats=stats,
+            cache=cache,
+            preprocessor=preprocessor,
+        ):
+            output.write(json.dumps(record.as_dict()) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return stats
+
+
+def parse_features(value: str) -> List[VisualFeatures]:
+    return [VisualFeatures(name.strip()) for name in value.split(",") if name.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "inputs", nargs="+", help="image URLs, files, directories or @list.txt"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="JSONL file for results")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--features",
+        type=parse_features,
+        default=list(DEFAULT_FEATURES),
+        help="comma-separated visual features, e.g. tags,caption,read",
+    )
+    parser.add_argument("--cache", type=Path, help="SQLite per-feature result cache")
+    parser.add_argument(
+        "--preprocess",
+        action="store_true",
+        help="downscale local files before upload (process pool)",
+    )
+    args = parser.parse_args()
+
+    cache = AnalysisCache(args.cache) if args.cache else None
+    preprocessor = (
+        ImagePreprocessor(TARGETS["image_analysis"]) if args.preprocess else None
+    )
+    try:
+        stats = asyncio.run(
+            run_batch(
+                iter_sources(args.inputs),
+                args.output,
+                args.features,
+                args.concurrency,
+                cache,
+                preprocessor,
+            )
+        )
+    finally:
+        if cache:
+            cache.close()
+        if preprocessor:
+            preprocessor.close()
+    stats.print()
+    if cache:
+        print_cache_stats(cache)
+    if preprocessor:
+        preprocessor.stats.print()
+
+
+if __name__ == "__main__":
+    main()
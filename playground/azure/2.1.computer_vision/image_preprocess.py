@@ -0,0 +1,255 @@
+"""
+Image Preprocessing - Decode Once, Downscale, Re-encode
+Shrinks local images to what each Azure service actually needs before upload:
+draft-mode JPEG decoding, EXIF orientation, a per-service long-edge target and a
+compact JPEG/WebP re-encode, run in a process pool so CPU work overlaps network
+I/O. Only Pillow is required, so the module can be reused by any sample folder.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+
+@dataclass(frozen=True)
+class ServiceTarget:
+    """Upload constraints of one service and the size worth sending to it."""
+
+    name: str
+    long_edge: int
+    max_bytes: int
+    min_edge: int = 50
+    formats: Tuple[str, ...] = ("JPEG", "PNG", "GIF", "BMP", "WEBP")
+    output_format: str = "JPEG"
+    quality: int = 85
+
+
+TARGETS = {
+    # Image Analysis 4.0: < 20 MB, 50-16000 px; detail beyond ~2k is not used.
+    "image_analysis": ServiceTarget("image_analysis", 2048, 20 * 1024 * 1024),
+    # Read keeps more pixels: small print must survive the downscale.
+    "read": ServiceTarget("read", 3200, 50 * 1024 * 1024, quality=90),
+    # Content Safety: < 4 MB, 50-7200 px.
+    "content_safety": ServiceTarget(
+        "content_safety", 2048, 4 * 1024 * 1024, output_format="WEBP", quality=80
+    ),
+    # Custom Vision training/prediction: < 4 MB for prediction, no WebP.
+    "custom_vision": ServiceTarget(
+        "custom_vision",
+        1600,
+        4 * 1024 * 1024,
+        min_edge=256,
+        formats=("JPEG", "PNG", "BMP", "GIF"),
+    ),
+}
+DEFAULT_TARGET = "image_analysis"
+
+
+@dataclass
+class PreparedImage:
+    """Bytes ready for upload plus what is needed to map results back."""
+
+    data: bytes
+    content_type: str
+    original_size: Tuple[int, int]
+    size: Tuple[int, int]
+    original_bytes: int
+    digest: str  # SHA-256 of the original file, tagged with the target
+    reencoded: bool
+
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """Factors mapping coordinates in ``data`` back to the original image."""
+        return (
+            self.original_size[0] / self.size[0],
+            self.original_size[1] / self.size[1],
+        )
+
+
+def prepare_image(path: str, target: ServiceTarget) -> PreparedImage:
+    """Decode, orient, downscale and re-encode one file (runs in a worker)."""
+    raw = Path(path).read_bytes()
+    digest = f"{hashlib.sha256(raw).hexdigest()}:{target.name}"
+    with Image.open(io.BytesIO(raw)) as image:
+        source_format = image.format
+        # Orientation tag 1 (or none) means the pixels are already upright.
+        orientation = image.getexif().get(0x0112, 1)
+        original_size = image.size
+        if orientation in (5, 6, 7, 8):
+            original_size = original_size[::-1]
+        long_edge = max(original_size)
+
+        if (
+            long_edge <= target.long_edge
+            and orientation == 1
+            and source_format in target.formats
+            and len(raw) <= target.max_bytes
+        ):
+            return PreparedImage(
+                raw,
+                Image.MIME.get(source_format, "application/octet-stream"),
+                original_size,
+                original_size,
+                len(raw),
+                digest,
+                reencoded=False,
+            )
+
+        scale = min(1.0, target.long_edge / long_edge)
+        # Never shrink the short edge below what the service accepts.
+        scale = min(1.0, max(scale, target.min_edge / min(original_size)))
+        size = (
+            max(1, round(original_size[0] * scale)),
+            max(1, round(original_size[1] * scale)),
+        )
+        # draft() lets the JPEG decoder downscale by 1/2..1/8 while decoding;
+        # it works on the stored (not yet rotated) orientation.
+        image.draft("RGB", size[::-1] if orientation in (5, 6, 7, 8) else size)
+        upright = ImageOps.exif_transpose(image)
+        if upright.mode not in ("RGB", "L"):
+            upright = upright.convert("RGB")
+        if upright.size != size:
+            upright = upright.resize(size, Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        quality = target.quality
+        while True:
+            buffer.seek(0)
+            buffer.truncate()
+            upright.save(buffer, target.output_format, quality=quality, optimize=True)
+            if buffer.tell() <= target.max_bytes or quality <= 40:
+                break
+            quality -= 10
+
+    data = buffer.getvalue()
+    keep_original = (
+        len(data) >= len(raw)
+        and scale == 1.0
+        and orientation == 1
+        and source_format in target.formats
+        and len(raw) <= target.max_bytes
+    )
+    if keep_original:
+        # Re-encoding only made it bigger; the original already fits.
+        data, size, output_format = raw, original_size, source_format
+    else:
+        output_format = target.output_format
+    return PreparedImage(
+        data,
+        Image.MIME.get(output_format, "application/octet-stream"),
+        original_size,
+        size,
+        len(raw),
+        digest,
+        reencoded=not keep_original,
+    )
+
+
+@dataclass
+class PreprocessStats:
+    images: int = 0
+    reencoded: int = 0
+    original_bytes: int = 0
+    upload_bytes: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, prepared: PreparedImage) -> None:
+        with self._lock:
+            self.images += 1
+            self.reencoded += prepared.reencoded
+            self.original_bytes += prepared.original_bytes
+            self.upload_bytes += len(prepared.data)
+
+    def print(self) -> None:
+        saved = self.original_bytes - self.upload_bytes
+        ratio = saved / self.original_bytes if self.original_bytes else 0.0
+        print("\n--- Image Preprocessing ---")
+        print(f"Images: {self.images} ({self.reencoded} re-encoded)")
+        print(
+            f"Upload bytes: {self.upload_bytes / 1e6:.1f} MB of "
+            f"{self.original_bytes / 1e6:.1f} MB → saved {saved / 1e6:.1f} MB "
+            f"({ratio:.1%})"
+        )
+
+
+class ImagePreprocessor:
+    """Process-pool front end for ``prepare_image``.
+
+    Workers read the file themselves, so only the compact result crosses the
+    process boundary.
+    """
+
+    def __init__(
+        self,
+        target: ServiceTarget = TARGETS[DEFAULT_TARGET],
+        max_workers: Optional[int] = None,
+    ):
+        self.target = target
+        self.stats = PreprocessStats()
+        self._pool = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+
+    def submit(self, path: str) -> "Future[PreparedImage]":
+        future = self._pool.submit(prepare_image, str(path), self.target)
+        future.add_done_callback(self._record)
+        return future
+
+    def _record(self, future: "Future[PreparedImage]") -> None:
+        if not future.cancelled() and future.exception() is None:
+            self.stats.record(future.result())
+
+    async def prepare(self, path: str) -> PreparedImage:
+        return await asyncio.wrap_future(self.submit(path))
+
+    def map(self, paths: Iterable[str], window: int = 32) -> Iterator[PreparedImage]:
+        """Prepare many files, yielding in input order with ``window`` in flight."""
+        pending = []
+        for path in paths:
+            pending.append(self.submit(path))
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+    def close(self) -> None:
+        self._pool.shutdown()
+
+    def __enter__(self) -> "ImagePreprocessor":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("paths", nargs="+", type=Path, help="image files")
+    parser.add_argument("--target", choices=sorted(TARGETS), default=DEFAULT_TARGET)
+    parser.add_argument("-o", "--output-dir", type=Path, help="write prepared images")
+    args = parser.parse_args()
+
+    with ImagePreprocessor(TARGETS[args.target]) as preprocessor:
+        for path, prepared in zip(args.paths, preprocessor.map(args.paths)):
+            print(
+                f"{path}: {prepared.original_size} → {prepared.size}, "
+                f"{prepared.original_bytes} → {len(prepared.data)} bytes"
+            )
+            if args.output_dir:
+                args.output_dir.mkdir(parents=True, exist_ok=True)
+                suffix = "." + prepared.content_type.split("/")[-1]
+                (args.output_dir / path.stem).with_suffix(suffix).write_bytes(
+                    prepared.data
+                )
+        preprocessor.stats.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,393 @@
+"""
+Azure AI Vision - Multiplexed Read (OCR) Engine
+Submits many Read operations, polls all of them from one asyncio event loop and
+yields each result as soon as it is ready. Poll timing adapts to the completion
+times observed so far, and Retry-After is honoured on every call.
+"""
+
+import argparse
+import asyncio
+import functools
+import io
+import json
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
+
+from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+from azure.cognitiveservices.vision.computervision.models import OperationStatusCodes
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+from image_analysis_batch import IMAGE_SUFFIXES, AnalysisStats, is_url, iter_sources
+from ocr_index import DEFAULT_INDEX_PATH, OcrIndex
+from service_retry import retry_after_seconds
+from vision_client import create_computer_vision_client
+
+DEFAULT_MAX_OUTSTANDING = 64
+DEFAULT_RATE_PER_SECOND = 10.0  # S1 Read limit; raise it if your quota allows
+DEFAULT_IO_THREADS = 32
+MAX_ATTEMPTS = 6
+READ_SUFFIXES = IMAGE_SUFFIXES | {".pdf"}
+PENDING_STATUSES = {OperationStatusCodes.not_started, OperationStatusCodes.running}
+
+
+class AsyncRateLimiter:
+    """Spaces calls evenly so no more than ``rate`` start per second."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class CompletionModel:
+    """Learns how long Read operations take per page and when to poll them.
+
+    The first poll is timed for just before the median observed completion
+    time; later polls step towards the 90th percentile, so fast jobs are not
+    polled early and slow jobs are not hammered.
+    """
+
+    def __init__(
+        self,
+        initial_s: float = 1.0,
+        min_interval_s: float = 0.25,
+        max_interval_s: float = 5.0,
+        window: int = 256,
+    ):
+        self.initial_s = initial_s
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self._per_page: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float, pages: int = 1) -> None:
+        self._per_page.append(seconds / max(pages, 1))
+
+    def _quantile(self, q: float) -> float:
+        if not self._per_page:
+            return self.initial_s
+        ordered = sorted(self._per_page)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def first_delay(self, pages: int = 1) -> float:
+        return max(self.min_interval_s, 0.9 * self._quantile(0.5) * pages)
+
+    def next_delay(self, elapsed: float, pages: int = 1) -> float:
+        remaining = self._quantile(0.9) * pages - elapsed
+        # Past the p90 the job is an outlier: back off in proportion to its age.
+        delay = remaining if remaining > 0 else 0.25 * elapsed
+        return min(self.max_interval_s, max(self.min_interval_s, delay))
+
+
+@dataclass
+class ReadJob:
+    """One Read operation: a URL, a local file, or bytes standing in for ``source``."""
+
+    index: int
+    source: str
+    pages: Optional[List[str]] = None  # page selectors for the API, e.g. ["1-20"]
+    data: Optional[bytes] = None
+    page_count: int = 1  # expected pages, used only for poll timing
+    operation_id: Optional[str] = None
+    status: str = "pending"
+    results: List[dict] = field(default_factory=list)
+    error: Optional[str] = None
+    polls: int = 0
+    created_at: float = field(default_factory=time.perf_counter)
+    submitted_at: float = 0.0
+    finished_at: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def latency_ms(self) -> float:
+        return (self.finished_at - self.created_at) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "index": self.index,
+            "source": self.source,
+            "pages": self.pages,
+            "status": self.status,
+            "results": self.results,
+            "error": self.error,
+            "polls": self.polls,
+            "latency_ms": round(self.latency_ms, 2),
+        }
+
+
+def read_pages(read_result) -> List[dict]:
+    """Flatten a ReadOperationResult into ``[{page, width, height, unit, lines}]``."""
+    if read_result.analyze_result is None:
+        return []
+    return [
+        {
+            "page": page.page,
+            "width": page.width,
+            "height": page.height,
+            "unit": str(page.unit),
+            "angle": page.angle,
+            "lines": [
+                {"text": line.text, "bounding_box": line.bounding_box}
+                for line in page.lines
+            ],
+        }
+        for page in read_result.analyze_result.read_results
+    ]
+
+
+@dataclass
+class OcrStats(AnalysisStats):
+    """``AnalysisStats`` plus the polling and throttling counters of Read."""
+
+    polls: int = 0
+    throttled: int = 0
+
+    def record(self, job: ReadJob) -> None:
+        super().record(job)
+        self.polls += job.polls
+
+    def print(self) -> None:
+        summary = self.summary()
+        total = summary["total"]
+        print("\n--- Read Engine ---", file=sys.stderr)
+        print(f"Jobs: {total} ({summary['failed']} failed)", file=sys.stderr)
+        print(
+            f"Elapsed: {summary['elapsed_s']}s → {summary['images_per_s']} jobs/s",
+            file=sys.stderr,
+        )
+        print(
+            f"Polls: {self.polls} ({self.polls / max(total, 1):.2f}/job), "
+            f"throttled calls: {self.throttled}",
+            file=sys.stderr,
+        )
+        print(
+            f"Latency: p50 {summary['p50_ms']}ms, "
+            f"p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms",
+            file=sys.stderr,
+        )
+
+
+class ReadEngine:
+    """Runs many Read operations concurrently over one Computer Vision client.
+
+    The SDK is synchronous, so each HTTP call runs on a small thread pool while
+    waiting between polls costs nothing: every job is a coroutine on the same
+    event loop, sleeping until its next adaptive poll time.
+    """
+
+    def __init__(
+        self,
+        client: Optional[ComputerVisionClient] = None,
+        max_outstanding: int = DEFAULT_MAX_OUTSTANDING,
+        rate_per_second: float = DEFAULT_RATE_PER_SECOND,
+        model: Optional[CompletionModel] = None,
+        io_threads: int = DEFAULT_IO_THREADS,
+        **read_options,
+    ):
+        self.client = client or create_computer_vision_client()
+        self.max_outstanding = max_outstanding
+        self.limiter = AsyncRateLimiter(rate_per_second)
+        self.model = model or CompletionModel()
+        self.read_options = read_options  # language, model_version, reading_order
+        self.stats = OcrStats()
+        self._executor = ThreadPoolExecutor(max_workers=io_threads)
+
+    async def _call(self, fn: Callable, *args, **kwargs):
+        """Run a blocking SDK call, retrying throttling with Retry-After."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            await self.limiter.wait()
+            try:
+                return await loop.run_in_executor(
+                    self._executor, functools.partial(fn, *args, **kwargs)
+                )
+            except (HttpOperationError, ClientRequestError) as e:
+                response = getattr(e, "response", None)
+                status = getattr(response, "status_code", None)
+                if status not in (None, 429, 500, 503) or attempt == MAX_ATTEMPTS:
+                    raise
+                self.stats.throttled += status == 429
+                delay = retry_after_seconds(response) or 2 ** (attempt - 1)
+                await asyncio.sleep(delay + random.uniform(0, 0.25))
+        raise AssertionError("unreachable")
+
+    async def _submit(self, job: ReadJob) -> str:
+        options = {**self.read_options, "pages": job.pages, "raw": True}
+        if job.data is None and is_url(job.source):
+            raw = await self._call(self.client.read, job.source, **options)
+        else:
+            if job.data is None:
+                job.data = await asyncio.to_thread(Path(job.source).read_bytes)
+            # A fresh stream per attempt: a retried upload must start at byte 0.
+            raw = await self._call(
+                lambda: self.client.read_in_stream(io.BytesIO(job.data), **options)
+            )
+        job.data = None  # uploaded; do not hold the bytes while polling
+        return raw.headers["Operation-Location"].split("/")[-1]
+
+    async def run_job(self, job: ReadJob) -> ReadJob:
+        try:
+            job.operation_id = await self._submit(job)
+            job.submitted_at = time.perf_counter()
+            await asyncio.sleep(self.model.first_delay(job.page_count))
+            while True:
+                raw = await self._call(
+                    self.client.get_read_result, job.operation_id, raw=True
+                )
+                job.polls += 1
+                result = raw.output
+                if result.status not in PENDING_STATUSES:
+                    break
+                elapsed = time.perf_counter() - job.submitted_at
+                delay = self.model.next_delay(elapsed, job.page_count)
+                await asyncio.sleep(
+                    max(delay, retry_after_seconds(raw.response) or 0.0)
+                )
+
+            job.status = str(getattr(result.status, "value", result.status))
+            if result.status == OperationStatusCodes.succeeded:
+                job.results = read_pages(result)
+                self.model.observe(
+                    time.perf_counter() - job.submitted_at,
+                    max(len(job.results), 1),
+                )
+            else:
+                job.error = f"Read operation {job.status}"
+        except (HttpOperationError, ClientRequestError, OSError) as e:
+            job.status = "error"
+            job.error = f"{type(e).__name__}: {e}"
+        job.finished_at = time.perf_counter()
+        return job
+
+    async def read_many(
+        self, jobs: Union[Iterable[ReadJob], AsyncIterable[ReadJob]]
+    ) -> AsyncIterator[ReadJob]:
+        """Run jobs with up to ``max_outstanding`` operations open, yielding as each ends.
+
+        Pass an async iterable when building a job does blocking I/O, so that
+        work can leave the event loop the polls run on.
+        """
+        pending = aiter(jobs) if hasattr(jobs, "__aiter__") else _as_async(jobs)
+        running: set = set()
+
+        async def refill() -> None:
+            while len(running) < self.max_outstanding:
+                job = await anext(pending, None)
+                if job is None:
+                    return
+                running.add(asyncio.ensure_future(self.run_job(job)))
+
+        try:
+            await refill()
+            while running:
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    running.discard(task)
+                    job = task.result()
+                    self.stats.record(job)
+                    yield job
+                await refill()
+        finally:
+            for task in running:
+                task.cancel()
+            self.stats.finished_at = time.perf_counter()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+async def _as_async(jobs: Iterable[ReadJob]) -> AsyncIterator[ReadJob]:
+    for job in jobs:
+        yield job
+
+
+def iter_read_jobs(
+    inputs: Iterable[str], skip: Callable[[str], bool] = lambda source: False
+) -> Iterator[ReadJob]:
+    sources = (s for s in iter_sources(inputs, READ_SUFFIXES) if not skip(s))
+    for index, source in enumerate(sources):
+        yield ReadJob(index=index, source=source)
+
+
+async def run_ocr(
+    inputs: Iterable[str],
+    output_path: Optional[Path],
+    engine: ReadEngine,
+    index: Optional[OcrIndex] = None,
+) -> None:
+    """Write each finished job as JSONL and, with an ``index``, add its lines.
+
+    Sources the index already holds completely are not sent to the service.
+    """
+    skip = index.is_indexed if index is not None else lambda source: False
+    output = output_path.open("w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        async for job in engine.read_many(iter_read_jobs(inputs, skip)):
+            output.write(json.dumps(job.as_dict()) + "\n")
+            if index is not None and job.ok:
+                index.add_document(job.source, job.results)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "inputs", nargs="+", help="image/PDF URLs, files, directories or @list.txt"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="JSONL file for results")
+    parser.add_argument("--max-outstanding", type=int, default=DEFAULT_MAX_OUTSTANDING)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_SECOND)
+    parser.add_argument("--language", help="e.g. en; detected when omitted")
+    parser.add_argument(
+        "--index",
+        nargs="?",
+        type=Path,
+        const=DEFAULT_INDEX_PATH,
+        help="add lines to this search index (default %(const)s)",
+    )
+    args = parser.parse_args()
+
+    options = {"language": args.language} if args.language else {}
+    engine = ReadEngine(
+        max_outstanding=args.max_outstanding, rate_per_second=args.rate, **options
+    )
+    index = OcrIndex(args.index) if args.index else None
+    try:
+        asyncio.run(run_ocr(args.inputs, args.output, engine, index))
+    finally:
+        engine.close()
+        if index is not None:
+            index.close()
+    engine.stats.print()
+
+
+if __name__ == "__main__":
+    main()
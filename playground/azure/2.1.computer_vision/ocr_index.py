@@ -0,0 +1,281 @@
+"""
+Azure AI Vision - Full-Text Search over OCR Output
+Persistent SQLite FTS5 index of Read results: every line is stored with its
+text, bounding box, page and source, inserted as each OCR job finishes, so
+scans are searched locally instead of being sent through OCR again.
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, Union
+
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent / ".ocr_index.sqlite3"
+DEFAULT_LIMIT = 20
+
+
+def source_key(source: str) -> Tuple[str, Optional[str]]:
+    """``(key, fingerprint)`` identifying the content behind ``source``.
+
+    Local files are keyed by resolved path and fingerprinted by size and
+    mtime, so another spelling of the same path still matches and an edited
+    or replaced file does not. URLs are keyed as given, without a fingerprint.
+    """
+    if source.startswith(("http://", "https://")):
+        return source, None
+    path = Path(source).resolve()
+    try:
+        stat = path.stat()
+    except OSError:
+        return str(path), None
+    return str(path), f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def phrase_query(text: str) -> str:
+    """Quote ``text`` as one FTS5 phrase, so punctuation is not parsed as syntax."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+@dataclass
+class SearchHit:
+    source: str
+    page: int
+    line: int
+    text: str
+    bounding_box: List[float]
+    highlighted: str
+
+    def as_dict(self) -> dict:
+        return self.__dict__.copy()
+
+
+class OcrIndex:
+    """SQLite FTS5 line index with one row per OCR line.
+
+    A source is written as a unit: ``begin`` clears any earlier copy, pages
+    are added as they arrive, and ``finish`` marks it complete so callers can
+    skip it next time.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_INDEX_PATH):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                source TEXT NOT NULL UNIQUE,
+                pages INTEGER NOT NULL DEFAULT 0,
+                failed_pages INTEGER NOT NULL DEFAULT 0,
+                complete INTEGER NOT NULL DEFAULT 0,
+                indexed_at REAL NOT NULL,
+                fingerprint TEXT
+            )
+            """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+        if "fingerprint" not in columns:  # index created before fingerprints
+            self._conn.execute("ALTER TABLE documents ADD COLUMN fingerprint TEXT")
+        # Only ``text`` is tokenized; the rest rides along for hit locations.
+        self._conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS lines USING fts5(
+                text,
+                document_id UNINDEXED,
+                page UNINDEXED,
+                line UNINDEXED,
+                bounding_box UNINDEXED,
+                tokenize = 'unicode61 remove_diacritics 2'
+            )
+            """)
+        self._conn.commit()
+
+    def is_indexed(self, source: str) -> bool:
+        """True when ``source`` is complete and its file has not changed since."""
+        key, fingerprint = source_key(source)
+        row = self._conn.execute(
+            "SELECT complete, fingerprint FROM documents WHERE source = ?", (key,)
+        ).fetchone()
+        return bool(row and row[0]) and row[1] == fingerprint
+
+    def begin(self, source: str) -> int:
+        """Start (re)indexing ``source`` and return its document id.
+
+        The file's size and mtime are recorded now, so call this once its
+        content has been read.
+        """
+        key, fingerprint = source_key(source)
+        row = self._conn.execute(
+            "SELECT id FROM documents WHERE source = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self._conn.execute("DELETE FROM lines WHERE document_id = ?", row)
+            self._conn.execute("DELETE FROM documents WHERE id = ?", row)
+        cursor = self._conn.execute(
+            "INSERT INTO documents (source, indexed_at, fingerprint) VALUES (?, ?, ?)",
+            (key, time.time(), fingerprint),
+        )
+        self._conn.commit()
+        return cursor.lastrowid
+
+    def add_page(self, document_id: int, page: dict) -> None:
+        """Insert one page record (``{"page", "lines": [{"line"?, "text", ...}]}``).
+
+        Lines without a ``line`` number are numbered within the page. A page
+        carrying an ``error`` is counted as failed, which keeps the source
+        from being marked complete.
+        """
+        if page.get("error") is not None:
+            self._conn.execute(
+                "UPDATE documents SET failed_pages = failed_pages + 1 WHERE id = ?",
+                (document_id,),
+            )
+            self._conn.commit()
+            return
+        self._conn.executemany(
+            "INSERT INTO lines (text, document_id, page, line, bounding_box) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    line["text"],
+                    document_id,
+                    page["page"],
+                    line.get("line", number),
+                    json.dumps(line.get("bounding_box")),
+                )
+                for number, line in enumerate(page.get("lines", []), start=1)
+            ],
+        )
+        self._conn.execute(
+            "UPDATE documents SET pages = pages + 1 WHERE id = ?", (document_id,)
+        )
+        self._conn.commit()
+
+    def finish(self, document_id: int) -> None:
+        self._conn.execute(
+            "UPDATE documents SET complete = (failed_pages = 0), indexed_at = ? "
+            "WHERE id = ?",
+            (time.time(), document_id),
+        )
+        self._conn.commit()
+
+    def add_document(self, source: str, pages: Iterable[dict]) -> None:
+        """Index a whole source at once, e.g. the ``results`` of a ReadJob."""
+        document_id = self.begin(source)
+        for page in pages:
+            self.add_page(document_id, page)
+        self.finish(document_id)
+
+    def search(
+        self,
+        query: str,
+        limit: int = DEFAULT_LIMIT,
+        source: Optional[str] = None,
+        raw: bool = False,
+        ranked: bool = False,
+    ) -> List[SearchHit]:
+        """Lines matching ``query`` as a phrase, or FTS5 syntax when ``raw``.
+
+        Hits come in index order, which lets SQLite stop at ``limit``;
+        ``ranked`` sorts by bm25 instead, which scores every match first.
+        """
+        sql = (
+            "SELECT d.source, l.page, l.line, l.text, l.bounding_box, "
+            "highlight(lines, 0, '[', ']') "
+            "FROM lines AS l JOIN documents AS d ON d.id = l.document_id "
+            "WHERE lines MATCH ?"
+        )
+        params: list = [query if raw else phrase_query(query)]
+        if source is not None:
+            sql += " AND d.source = ?"
+            params.append(source_key(source)[0])
+        sql += " ORDER BY rank LIMIT ?" if ranked else " LIMIT ?"
+        params.append(limit)
+        return [
+            SearchHit(src, page, line, text, json.loads(box), highlighted)
+            for src, page, line, text, box, highlighted in self._conn.execute(
+                sql, params
+            )
+        ]
+
+    def optimize(self) -> None:
+        """Merge the b-tree segments left behind by many small inserts."""
+        self._conn.execute("INSERT INTO lines (lines) VALUES ('optimize')")
+        self._conn.commit()
+
+    def stats(self) -> dict:
+        (documents,) = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+        (lines,) = self._conn.execute("SELECT COUNT(*) FROM lines").fetchone()
+        return {"documents": documents, "lines": lines}
+
+    def close(self) -> None:
+        self._conn.commit()
+        self._conn.close()
+
+    def __enter__(self) -> "OcrIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def import_jsonl(index: OcrIndex, path: Path) -> int:
+    """Load saved ocr_engine or paged_ocr output; returns the sources indexed."""
+    open_documents = {}
+    with path.open("r", encoding="utf-8") as f:
+        for raw_line in f:
+            record = json.loads(raw_line)
+            source = record["source"]
+            if "results" in record:  # ocr_engine: one record per source
+                if record.get("error") is None:
+                    index.add_document(source, record["results"])
+                    open_documents[source] = None
+            else:  # paged_ocr: one record per page, in order
+                if source not in open_documents:
+                    open_documents[source] = index.begin(source)
+                index.add_page(open_documents[source], record)
+    for document_id in open_documents.values():
+        if document_id is not None:
+            index.finish(document_id)
+    return len(open_documents)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    search = commands.add_parser("search", help="phrase search")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    search.add_argument("--source", help="restrict to one source")
+    search.add_argument("--raw", action="store_true", help="FTS5 query syntax")
+    search.add_argument("--ranked", action="store_true", help="best matches first")
+
+    load = commands.add_parser("import", help="index saved OCR JSONL output")
+    load.add_argument("files", nargs="+", type=Path)
+    load.add_argument("--optimize", action="store_true")
+    args = parser.parse_args()
+
+    with OcrIndex(args.index) as index:
+        if args.command == "import":
+            for path in args.files:
+                print(f"{path}: {import_jsonl(index, path)} sources", file=sys.stderr)
+            if args.optimize:
+                index.optimize()
+            print(index.stats(), file=sys.stderr)
+            return
+
+        started = time.perf_counter()
+        hits = index.search(args.query, args.limit, args.source, args.raw, args.ranked)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        for hit in hits:
+            print(json.dumps(hit.as_dict()))
+        print(f"{len(hits)} hits in {elapsed_ms:.2f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
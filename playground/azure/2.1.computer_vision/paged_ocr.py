@@ -0,0 +1,329 @@
+"""
+Azure AI Vision - Page-Range Parallel OCR for Multi-Page Documents
+Counts the pages of each PDF/TIFF locally, submits fixed-size page ranges as
+independent Read operations through ReadEngine, and writes pages back out in
+document order, one JSONL record per page, as soon as every earlier range of
+that document has arrived. Lines are numbered across the whole document.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import re
+import sys
+import urllib.request
+import zlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from PIL import Image
+
+from image_analysis_batch import is_url, iter_sources
+from ocr_engine import (
+    DEFAULT_MAX_OUTSTANDING,
+    DEFAULT_RATE_PER_SECOND,
+    READ_SUFFIXES,
+    ReadEngine,
+    ReadJob,
+)
+from ocr_index import DEFAULT_INDEX_PATH, OcrIndex
+
+DEFAULT_PAGES_PER_JOB = 10
+TIFF_SUFFIXES = {".tif", ".tiff"}
+
+_COUNT = re.compile(rb"/Count\s+(\d+)")
+_STREAM = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.DOTALL)
+_DICT_DELIMITER = re.compile(rb"<<|>>")
+_PAGES_NODE = re.compile(rb"/Type\s*/Pages(?![A-Za-z])")
+_PAGE_LEAF = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+
+
+def _dictionaries(body: bytes) -> Iterator[bytes]:
+    """Top-level ``<< ... >>`` dictionaries of a PDF body, nested ones included."""
+    depth, start = 0, 0
+    for match in _DICT_DELIMITER.finditer(body):
+        if match[0] == b"<<":
+            start = match.start() if depth == 0 else start
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                yield body[start : match.end()]
+
+
+def _page_tree(body: bytes) -> Tuple[List[int], int]:
+    """/Count of every /Type /Pages node, and the number of /Type /Page leaves."""
+    counts, leaves = [], 0
+    for dictionary in _dictionaries(body):
+        if _PAGES_NODE.search(dictionary):
+            count = _COUNT.search(dictionary)
+            if count:
+                counts.append(int(count[1]))
+        elif _PAGE_LEAF.search(dictionary):
+            leaves += 1
+    return counts, leaves
+
+
+def pdf_page_count(data: bytes) -> int:
+    """Page count of a PDF from its page tree, without a PDF library.
+
+    Only /Type /Pages nodes are read, since outline items carry a /Count too;
+    the root node has the largest one. Since PDF 1.5 the tree may sit inside
+    compressed object streams, so Flate streams are searched when the plain
+    body has no /Pages node, and the /Type /Page leaves are counted when no
+    node can be read at all. Returns 0 when nothing is found.
+    """
+    # Stream contents are binary and may contain stray "<<" or ">>".
+    counts, leaves = _page_tree(_STREAM.sub(b"stream\nendstream", data))
+    if not counts:
+        for match in _STREAM.finditer(data):
+            try:
+                stream_counts, stream_leaves = _page_tree(zlib.decompress(match[1]))
+            except zlib.error:
+                continue
+            counts.extend(stream_counts)
+            leaves += stream_leaves
+    return max(counts, default=leaves)
+
+
+def page_count(data: bytes, suffix: str) -> int:
+    if suffix == ".pdf" or data.startswith(b"%PDF"):
+        return pdf_page_count(data)
+    with Image.open(io.BytesIO(data)) as image:
+        return getattr(image, "n_frames", 1)
+
+
+def split_tiff(data: bytes, first: int, last: int) -> bytes:
+    """Re-pack pages ``first..last`` (1-based) of a TIFF into a new TIFF."""
+    with Image.open(io.BytesIO(data)) as image:
+        compression = image.info.get("compression", "tiff_lzw")
+        frames = []
+        for index in range(first - 1, last):
+            image.seek(index)
+            frames.append(image.copy())
+    buffer = io.BytesIO()
+    frames[0].save(
+        buffer,
+        "TIFF",
+        save_all=True,
+        append_images=frames[1:],
+        compression=None if compression == "raw" else compression,
+    )
+    return buffer.getvalue()
+
+
+def page_ranges(pages: int, per_job: int) -> List[Tuple[int, int]]:
+    return [
+        (first, min(first + per_job - 1, pages))
+        for first in range(1, pages + 1, per_job)
+    ]
+
+
+@dataclass
+class Document:
+    """Reassembles the page ranges of one source back into document order."""
+
+    source: str
+    pages: int
+    ranges: List[Tuple[int, int]]
+    _done: Dict[int, ReadJob] = field(default_factory=dict)
+    _next: int = 0  # index into ranges of the first range not yet written
+    _line: int = 0
+
+    @property
+    def complete(self) -> bool:
+        return self._next == len(self.ranges)
+
+    def add(self, first: int, job: ReadJob) -> Iterator[dict]:
+        """Store a finished range and yield every page now ready, in order."""
+        self._done[first] = job
+        while not self.complete and self.ranges[self._next][0] in self._done:
+            first, last = self.ranges[self._next]
+            yield from self._pages(first, last, self._done.pop(first))
+            self._next += 1
+
+    def _pages(self, first: int, last: int, job: ReadJob) -> Iterator[dict]:
+        if not job.ok:
+            for page in range(first, last + 1):
+                yield {"source": self.source, "page": page, "error": job.error}
+            return
+        for result in sorted(job.results, key=lambda r: r["page"]):
+            lines = []
+            for line in result["lines"]:
+                self._line += 1
+                lines.append({"line": self._line, **line})
+            yield {
+                "source": self.source,
+                **result,
+                "page": result["page"] + job.page_offset,
+                "lines": lines,
+            }
+
+
+@dataclass
+class RangeJob(ReadJob):
+    """A ReadJob for part of a document; ``page_offset`` maps its pages back."""
+
+    document: int = 0
+    first_page: int = 1
+    page_offset: int = 0  # added to result page numbers when the range was split
+
+
+def _load(source: str) -> bytes:
+    if is_url(source):
+        with urllib.request.urlopen(source, timeout=60) as response:
+            return response.read()
+    return Path(source).read_bytes()
+
+
+def _prepare(source: str, suffix: str) -> Tuple[Optional[bytes], int]:
+    try:
+        data = _load(source)
+        return data, page_count(data, suffix)
+    except (OSError, ValueError) as e:
+        print(f"{source}: cannot count pages ({e})", file=sys.stderr)
+        return None, 0
+
+
+async def plan_documents(
+    inputs: Iterable[str],
+    pages_per_job: int,
+    documents: Dict[int, Document],
+    skip: Callable[[str], bool] = lambda source: False,
+) -> AsyncIterator[RangeJob]:
+    """Yield one RangeJob per page range, registering each input in ``documents``.
+
+    Local TIFFs are split so each job uploads only its own pages. PDFs (and
+    URLs, which the service fetches itself) are sent whole with a ``pages``
+    selector. Listing, downloading, counting and splitting run in worker
+    threads so the engine keeps polling meanwhile.
+    """
+    index = 0
+    sources = iter_sources(inputs, READ_SUFFIXES)
+    number = 0
+    while True:
+        source = await asyncio.to_thread(next, sources, None)
+        if source is None:
+            return
+        # On the loop thread: skip may be OcrIndex.is_indexed, whose SQLite
+        # connection only works on the thread that opened it.
+        if skip(source):
+            continue
+        suffix = Path(source.split("?", 1)[0]).suffix.lower()
+        data, pages = await asyncio.to_thread(_prepare, source, suffix)
+
+        if pages <= 1:  # single image, or unknown: one job for the whole file
+            documents[number] = Document(source, max(pages, 1), [(1, 1)])
+            data = None if is_url(source) else data
+            yield RangeJob(index, source, data=data, document=number)
+            index += 1
+            number += 1
+            continue
+
+        ranges = page_ranges(pages, pages_per_job)
+        documents[number] = Document(source, pages, ranges)
+        split = suffix in TIFF_SUFFIXES and not is_url(source)
+        for first, last in ranges:
+            job = RangeJob(
+                index,
+                source,
+                page_count=last - first + 1,
+                document=number,
+                first_page=first,
+            )
+            if split:
+                job.data = await asyncio.to_thread(split_tiff, data, first, last)
+                job.page_offset = first - 1
+            else:
+                job.pages = [f"{first}-{last}"]
+                job.data = None if is_url(source) else data
+            yield job
+            index += 1
+        number += 1
+
+
+async def run_paged_ocr(
+    inputs: Iterable[str],
+    output_path: Optional[Path],
+    engine: ReadEngine,
+    pages_per_job: int = DEFAULT_PAGES_PER_JOB,
+    index: Optional[OcrIndex] = None,
+) -> None:
+    """Stream pages as JSONL and, with an ``index``, add them as they are written.
+
+    Sources the index already holds completely are not sent to the service.
+    """
+    documents: Dict[int, Document] = {}
+    indexed: Dict[int, int] = {}  # document number -> index document id
+    skip = index.is_indexed if index is not None else lambda source: False
+    output = output_path.open("w", encoding="utf-8") if output_path else sys.stdout
+    try:
+        jobs = plan_documents(inputs, pages_per_job, documents, skip)
+        async for job in engine.read_many(jobs):
+            document = documents[job.document]
+            if index is not None and job.document not in indexed:
+                indexed[job.document] = index.begin(document.source)
+            for page in document.add(job.first_page, job):
+                output.write(json.dumps(page) + "\n")
+                if index is not None:
+                    index.add_page(indexed[job.document], page)
+            output.flush()
+            if document.complete:
+                del documents[job.document]
+                if index is not None:
+                    index.finish(indexed.pop(job.document))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "inputs", nargs="+", help="PDF/TIFF/image URLs, files, directories or @list.txt"
+    )
+    parser.add_argument(
+        "-o", "--output", type=Path, help="JSONL file, one page per line"
+    )
+    parser.add_argument("--pages-per-job", type=int, default=DEFAULT_PAGES_PER_JOB)
+    parser.add_argument("--max-outstanding", type=int, default=DEFAULT_MAX_OUTSTANDING)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE_PER_SECOND)
+    parser.add_argument("--language", help="e.g. en; detected when omitted")
+    parser.add_argument(
+        "--index",
+        nargs="?",
+        type=Path,
+        const=DEFAULT_INDEX_PATH,
+        help="add pages to this search index (default %(const)s)",
+    )
+    args = parser.parse_args()
+
+    options = {"language": args.language} if args.language else {}
+    engine = ReadEngine(
+        max_outstanding=args.max_outstanding, rate_per_second=args.rate, **options
+    )
+    index = OcrIndex(args.index) if args.index else None
+    try:
+        asyncio.run(
+            run_paged_ocr(args.inputs, args.output, engine, args.pages_per_job, index)
+        )
+    finally:
+        engine.close()
+        if index is not None:
+            index.close()
+    engine.stats.print()
+
+
+if __name__ == "__main__":
+    main()
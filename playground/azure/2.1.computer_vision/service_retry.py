@@ -0,0 +1,54 @@
+"""
+Azure AI Vision - shared retry helpers
+"""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, TypeVar
+
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+MAX_ATTEMPTS = 5
+RETRYABLE_STATUS = (None, 429, 500, 503)  # None: the request never got an answer
+
+T = TypeVar("T")
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Retry-After as seconds; it may be delta-seconds or an HTTP-date."""
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def call_with_retry(fn: Callable[[], T], max_attempts: int = MAX_ATTEMPTS) -> T:
+    """Run ``fn`` (one msrest SDK call), retrying throttling and 5xx responses.
+
+    Waits for Retry-After when the service sends one, otherwise backs off
+    exponentially from one second. ``fn`` should build any request stream
+    itself, so a retried upload starts at byte 0.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return fn()
+        except (HttpOperationError, ClientRequestError) as e:
+            response = getattr(e, "response", None)
+            status = getattr(response, "status_code", None)
+            if status not in RETRYABLE_STATUS or attempt == max_attempts:
+                raise
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = 2 ** (attempt - 1)
+            time.sleep(delay + random.uniform(0, 0.25))
+    raise AssertionError("unreachable")
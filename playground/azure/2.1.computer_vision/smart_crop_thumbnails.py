@@ -0,0 +1,306 @@
+"""
+Azure AI Vision - Smart-Crop Thumbnails at Catalog Scale
+Gets smart-crop boxes for every image (from the analysis cache when known,
+otherwise from the service) and renders thumbnails at several widths per aspect
+ratio in a process pool: reduced-size JPEG decoding, one decode per image and
+parallel writes. With --offline only cached crop boxes are used, so a re-run
+with new sizes never touches the network.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Union
+
+import requests
+from azure.ai.vision.imageanalysis.aio import ImageAnalysisClient
+from azure.ai.vision.imageanalysis.models import VisualFeatures
+from PIL import Image, ImageOps
+
+from analysis_cache import (
+    DEFAULT_CACHE_PATH,
+    AnalysisCache,
+    cached_features,
+    print_cache_stats,
+    read_image_bytes,
+)
+from image_analysis_batch import (
+    DEFAULT_CONCURRENCY,
+    DEFAULT_OPTIONS,
+    AnalysisRecord,
+    analyze_images,
+    describe_error,
+    is_url,
+    iter_sources,
+)
+from image_preprocess import TARGETS, ImagePreprocessor
+
+DEFAULT_RATIOS = (0.9, 1.33)
+DEFAULT_WIDTHS = (160, 320, 640)
+DEFAULT_QUALITY = 85
+SMART_CROPS = VisualFeatures.SMART_CROPS.value
+
+
+def thumbnail_name(source: str, ratio: float, width: int) -> str:
+    """``<stem>-<8 hex of the source>_<ratio>_<width>.jpg``, unique per source."""
+    stem = Path(source.split("?", 1)[0]).stem or "image"
+    tag = hashlib.sha1(source.encode("utf-8")).hexdigest()[:8]
+    return f"{stem}-{tag}_{ratio:g}_{width}.jpg"
+
+
+def render_thumbnails(
+    source: str,
+    image: Union[str, bytes],
+    crops: Sequence[dict],
+    analyzed_size: Sequence[int],
+    widths: Sequence[int],
+    output_dir: str,
+    quality: int = DEFAULT_QUALITY,
+) -> List[str]:
+    """Decode once and write every (crop, width) thumbnail; runs in a worker.
+
+    ``crops`` are ``{"aspect_ratio", "box": [x, y, w, h]}`` in the coordinates
+    of ``analyzed_size``. Widths larger than a crop are skipped rather than
+    upscaled.
+    """
+    out = Path(output_dir)
+    meta_w, meta_h = analyzed_size
+    # The largest output decides how much resolution the decoder must keep.
+    needed = max(
+        (w / c["box"][2] for c in crops for w in widths if w <= c["box"][2]),
+        default=0.0,
+    )
+    if needed == 0.0:
+        return []
+    data = image if isinstance(image, bytes) else Path(image).read_bytes()
+    with Image.open(io.BytesIO(data)) as opened:
+        draft = (math.ceil(meta_w * needed), math.ceil(meta_h * needed))
+        if opened.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            draft = draft[::-1]  # draft() works on the stored orientation
+        opened.draft("RGB", draft)
+        upright = ImageOps.exif_transpose(opened)
+        if upright.mode not in ("RGB", "L"):
+            upright = upright.convert("RGB")
+    fx, fy = upright.width / meta_w, upright.height / meta_h
+
+    written = []
+    for crop in crops:
+        x, y, w, h = crop["box"]
+        region = (x * fx, y * fy, (x + w) * fx, (y + h) * fy)
+        for width in widths:
+            if width > w:
+                continue
+            size = (width, max(1, round(width * h / w)))
+            thumb = upright.resize(size, Image.Resampling.LANCZOS, box=region)
+            path = out / thumbnail_name(source, crop["aspect_ratio"], width)
+            thumb.save(path, "JPEG", quality=quality, optimize=True)
+            written.append(str(path))
+    return written
+
+
+@dataclass
+class ThumbnailStats:
+    images: int = 0
+    failed: int = 0
+    uncached: int = 0
+    thumbnails: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def print(self) -> None:
+        elapsed = time.perf_counter() - self.started_at
+        print("\n--- Smart-Crop Thumbnails ---", file=sys.stderr)
+        print(
+            f"Images: {self.images} ({self.failed} failed, "
+            f"{self.uncached} without cached crops)",
+            file=sys.stderr,
+        )
+        print(
+            f"Thumbnails: {self.thumbnails} in {elapsed:.2f}s → "
+            f"{self.thumbnails / max(elapsed, 1e-9):.1f}/s",
+            file=sys.stderr,
+        )
+
+
+async def _cached_records(
+    sources: Iterable[str],
+    cache: AnalysisCache,
+    preprocessor: Optional[ImagePreprocessor],
+    options: dict,
+) -> AsyncIterator[AnalysisRecord]:
+    """AnalysisRecords built from the cache alone."""
+    for index, source in enumerate(sources):
+        record = AnalysisRecord(index=index, source=source)
+        try:
+            record.features, record.metadata = await cached_features(
+                cache, source, [VisualFeatures.SMART_CROPS], preprocessor, **options
+            )
+        except OSError as e:
+            record.error = describe_error(e)
+        yield record
+
+
+async def generate_thumbnails(
+    sources: Iterable[str],
+    output_dir: Path,
+    ratios: Sequence[float] = DEFAULT_RATIOS,
+    widths: Sequence[int] = DEFAULT_WIDTHS,
+    cache: Optional[AnalysisCache] = None,
+    offline: bool = False,
+    preprocessor: Optional[ImagePreprocessor] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    max_workers: Optional[int] = None,
+    quality: int = DEFAULT_QUALITY,
+    client: Optional[ImageAnalysisClient] = None,
+) -> AsyncIterator[dict]:
+    """Yield ``{source, thumbnails, error}`` per image as its files are written.
+
+    Crop boxes stream in from ``analyze_images`` (or the cache when
+    ``offline``) and each image is handed to the process pool at once, so
+    rendering overlaps the remaining service calls.
+    """
+    if offline and cache is None:
+        raise ValueError("offline mode needs a cache")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    options = {**DEFAULT_OPTIONS, "smart_crops_aspect_ratios": list(ratios)}
+    if offline:
+        records = _cached_records(sources, cache, preprocessor, options)
+    else:
+        records = analyze_images(
+            sources,
+            [VisualFeatures.SMART_CROPS],
+            concurrency,
+            client=client,
+            cache=cache,
+            preprocessor=preprocessor,
+            **options,
+        )
+
+    loop = asyncio.get_running_loop()
+    workers = max_workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        async def render(record: AnalysisRecord) -> dict:
+            result = {"source": record.source, "thumbnails": [], "error": record.error}
+            crops = record.features.get(SMART_CROPS)
+            if record.ok and crops and record.metadata:
+                size = (record.metadata["width"], record.metadata["height"])
+                try:
+                    # Workers read local files themselves; URLs go over as bytes.
+                    image = (
+                        await read_image_bytes(record.source)
+                        if is_url(record.source)
+                        else record.source
+                    )
+                    result["thumbnails"] = await loop.run_in_executor(
+                        pool,
+                        render_thumbnails,
+                        record.source,
+                        image,
+                        crops,
+                        size,
+                        list(widths),
+                        str(output_dir),
+                        quality,
+                    )
+                except (OSError, requests.RequestException) as e:
+                    result["error"] = describe_error(e)
+            elif record.ok:
+                result["error"] = "no cached smart crops" if offline else "no crops"
+            return result
+
+        rendering: set = set()
+        async for record in records:
+            rendering.add(asyncio.ensure_future(render(record)))
+            # Keep the pool busy without holding every image's task at once.
+            if len(rendering) >= 2 * workers:
+                done, rendering = await asyncio.wait(
+                    rendering, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+        for task in asyncio.as_completed(rendering):
+            yield await task
+
+
+async def run_thumbnails(args) -> ThumbnailStats:
+    stats = ThumbnailStats()
+    cache = AnalysisCache(args.cache) if args.cache else None
+    preprocessor = (
+        ImagePreprocessor(TARGETS["image_analysis"]) if args.preprocess else None
+    )
+    try:
+        async for result in generate_thumbnails(
+            iter_sources(args.inputs),
+            args.output_dir,
+            args.ratios,
+            args.widths,
+            cache=cache,
+            offline=args.offline,
+            preprocessor=preprocessor,
+            concurrency=args.concurrency,
+            max_workers=args.workers,
+            quality=args.quality,
+        ):
+            stats.images += 1
+            stats.thumbnails += len(result["thumbnails"])
+            if result["error"] == "no cached smart crops":
+                stats.uncached += 1
+            elif result["error"]:
+                stats.failed += 1
+            print(json.dumps(result))
+    finally:
+        if preprocessor:
+            preprocessor.close()
+        if cache:
+            print_cache_stats(cache)
+            cache.close()
+    return stats
+
+
+def _numbers(kind):
+    return lambda value: tuple(kind(v) for v in value.split(",") if v.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "inputs", nargs="+", help="image URLs, files, directories or @list.txt"
+    )
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path("thumbnails"))
+    parser.add_argument("--ratios", type=_numbers(float), default=DEFAULT_RATIOS)
+    parser.add_argument("--widths", type=_numbers(int), default=DEFAULT_WIDTHS)
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_CACHE_PATH,
+        help="SQLite analysis cache (default %(const)s)",
+    )
+    parser.add_argument(
+        "--offline", action="store_true", help="only use crop boxes in the cache"
+    )
+    parser.add_argument(
+        "--preprocess", action="store_true", help="downscale uploads (process pool)"
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("-w", "--workers", type=int, help="render processes")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY)
+    args = parser.parse_args()
+    if args.offline and args.cache is None:
+        args.cache = DEFAULT_CACHE_PATH
+
+    stats = asyncio.run(run_thumbnails(args))
+    stats.print()
+
+
+if __name__ == "__main__":
+    main()
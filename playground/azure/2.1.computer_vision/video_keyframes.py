@@ -0,0 +1,429 @@
+"""
+Azure AI Vision - Keyframe Video Analysis
+Decodes a video locally at a fixed sampling rate, drops frames that barely
+differ from the last keyframe (NumPy mean absolute difference of tiny grayscale
+thumbnails), sends only keyframes to Image Analysis and carries their tags and
+caption forward to produce a per-timestamp timeline.
+
+Videos are decoded by the ffmpeg command-line tool (must be on PATH); animated
+GIF, WebP and PNG files are decoded with Pillow.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Deque,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+from azure.ai.vision.imageanalysis.aio import ImageAnalysisClient
+from azure.ai.vision.imageanalysis.models import VisualFeatures
+from azure.core.exceptions import AzureError
+from PIL import Image, ImageSequence
+
+from analysis_results import feature_results
+from image_analysis_batch import DEFAULT_OPTIONS, describe_error
+from vision_client import create_async_vision_client
+
+DEFAULT_FPS = 2.0
+DEFAULT_THRESHOLD = 0.06  # mean |Δ| of 0-1 grayscale thumbnails
+DEFAULT_MAX_GAP_S = 30.0
+DEFAULT_CONCURRENCY = 8
+DEFAULT_FEATURES = (VisualFeatures.TAGS, VisualFeatures.CAPTION)
+MAX_EDGE = 1024  # frames are uploaded at this long edge at most
+SIGNATURE_SIZE = (32, 18)
+PILLOW_SUFFIXES = {".gif", ".webp", ".png", ".apng"}
+
+
+@dataclass
+class Frame:
+    index: int
+    timestamp: float
+    image: Image.Image
+
+
+def _fit(width: int, height: int, max_edge: int) -> Tuple[int, int]:
+    scale = min(1.0, max_edge / max(width, height))
+    # Even sizes keep ffmpeg's scaler and chroma subsampling happy.
+    return max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2)
+
+
+def _probe_size(path: Path) -> Tuple[int, int]:
+    """Display size of the first video stream.
+
+    ffprobe reports the coded size, but ffmpeg rotates frames by the stream's
+    rotation metadata while decoding, so width and height swap for 90/270.
+    """
+    probe = subprocess.run(
+        [
+            "ffprobe",
+            "-v",
+            "error",
+            "-select_streams",
+            "v:0",
+            "-show_entries",
+            "stream=width,height:stream_tags=rotate:stream_side_data=rotation",
+            "-of",
+            "json",
+            str(path),
+        ],
+        capture_output=True,
+        text=True,
+    )
+    if probe.returncode != 0:
+        raise RuntimeError(f"ffprobe failed on {path}: {probe.stderr.strip()}")
+    streams = json.loads(probe.stdout).get("streams") or []
+    if not streams:
+        raise RuntimeError(f"{path} has no video stream")
+    stream = streams[0]
+    rotation = stream.get("tags", {}).get("rotate", 0)
+    for side_data in stream.get("side_data_list", []):
+        rotation = side_data.get("rotation", rotation)
+    width, height = int(stream["width"]), int(stream["height"])
+    if round(float(rotation)) % 180:
+        width, height = height, width
+    return width, height
+
+
+def _ffmpeg_frames(path: Path, fps: float, max_edge: int) -> Iterator[Frame]:
+    if shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None:
+        raise OSError("ffmpeg and ffprobe must be on PATH to decode video")
+    width, height = _fit(*_probe_size(path), max_edge)
+    # stderr goes to a file: a pipe nobody reads could fill up and stall ffmpeg.
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            [
+                "ffmpeg",
+                "-v",
+                "error",
+                "-i",
+                str(path),
+                "-vf",
+                f"fps={fps},scale={width}:{height}",
+                "-f",
+                "rawvideo",
+                "-pix_fmt",
+                "rgb24",
+                "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=errors,
+        )
+        frame_bytes = width * height * 3
+        try:
+            index = 0
+            while True:
+                raw = process.stdout.read(frame_bytes)
+                if len(raw) < frame_bytes:
+                    break
+                image = Image.frombuffer(
+                    "RGB", (width, height), raw, "raw", "RGB", 0, 1
+                )
+                yield Frame(index, index / fps, image)
+                index += 1
+            if process.wait() != 0:
+                errors.seek(0)
+                lines = errors.read().decode("utf-8", "replace").strip().splitlines()
+                message = "\n".join(lines[-10:])  # the cause is usually last
+                raise RuntimeError(
+                    f"ffmpeg exited with status {process.returncode} "
+                    f"after {index} frames: {message}"
+                )
+        finally:
+            process.stdout.close()
+            process.kill()
+            process.wait()
+
+
+def _pillow_frames(path: Path, fps: float, max_edge: int) -> Iterator[Frame]:
+    """Resample an animation to ``fps`` using each frame's duration."""
+    with Image.open(path) as animation:
+        clock, next_sample, index = 0.0, 0.0, 0
+        for frame in ImageSequence.Iterator(animation):
+            duration = frame.info.get("duration", 100) / 1000 or 0.1
+            end = clock + duration - 1e-9  # summed durations drift slightly
+            if end > next_sample:
+                image = frame.convert("RGB")
+                image.thumbnail((max_edge, max_edge))
+                while next_sample < end:
+                    yield Frame(index, next_sample, image)
+                    index += 1
+                    next_sample = index / fps
+            clock += duration
+
+
+def iter_frames(
+    path: Path, fps: float = DEFAULT_FPS, max_edge: int = MAX_EDGE
+) -> Generator[Frame, None, None]:
+    """Frames sampled at ``fps``, downscaled to at most ``max_edge``."""
+    if path.suffix.lower() in PILLOW_SUFFIXES:
+        return _pillow_frames(path, fps, max_edge)
+    return _ffmpeg_frames(path, fps, max_edge)
+
+
+def frame_signature(image: Image.Image) -> np.ndarray:
+    """Tiny grayscale thumbnail in [0, 1]; cheap to compare frame to frame."""
+    small = image.convert("L").resize(SIGNATURE_SIZE, Image.Resampling.BILINEAR)
+    return np.asarray(small, dtype=np.float32) / 255.0
+
+
+class KeyframeSelector:
+    """Marks a frame as a keyframe when it differs enough from the last one.
+
+    Comparing against the last keyframe rather than the previous frame means
+    a slow pan still triggers once the accumulated change is large enough.
+    """
+
+    def __init__(
+        self, threshold: float = DEFAULT_THRESHOLD, max_gap_s: float = DEFAULT_MAX_GAP_S
+    ):
+        self.threshold = threshold
+        self.max_gap_s = max_gap_s
+        self._signature: Optional[np.ndarray] = None
+        self._timestamp = 0.0
+
+    def score(self, signature: np.ndarray) -> float:
+        if self._signature is None:
+            return 1.0
+        return float(np.abs(signature - self._signature).mean())
+
+    def is_keyframe(self, frame: Frame) -> bool:
+        signature = frame_signature(frame.image)
+        if (
+            self._signature is None
+            or self.score(signature) >= self.threshold
+            or frame.timestamp - self._timestamp >= self.max_gap_s
+        ):
+            self._signature, self._timestamp = signature, frame.timestamp
+            return True
+        return False
+
+
+@dataclass
+class Keyframe:
+    """A keyframe, its analysis, and the sampled frames that reuse it."""
+
+    frame: Frame
+    task: Optional[asyncio.Task] = None
+    timestamps: List[Tuple[int, float]] = field(default_factory=list)
+
+
+@dataclass
+class VideoStats:
+    frames: int = 0
+    keyframes: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def print(self) -> None:
+        elapsed = time.perf_counter() - self.started_at
+        reduction = self.frames / max(self.keyframes, 1)
+        print("\n--- Keyframe Video Analysis ---", file=sys.stderr)
+        print(
+            f"Sampled frames: {self.frames}, analyzed keyframes: {self.keyframes} "
+            f"(x{reduction:.1f} fewer calls, {self.failed} failed)",
+            file=sys.stderr,
+        )
+        print(f"Elapsed: {elapsed:.2f}s", file=sys.stderr)
+
+
+def _jpeg(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+async def _analyze_frame(
+    client: ImageAnalysisClient,
+    semaphore: asyncio.Semaphore,
+    image: Image.Image,
+    features: Sequence[VisualFeatures],
+    options: dict,
+) -> dict:
+    async with semaphore:
+        data = await asyncio.to_thread(_jpeg, image)
+        try:
+            result = await client.analyze(
+                image_data=data, visual_features=list(features), **options
+            )
+        except AzureError as e:
+            return {"error": describe_error(e)}
+    return feature_results(result)
+
+
+def _timeline_rows(keyframe: Keyframe, results: dict) -> Iterator[dict]:
+    caption = results.get(VisualFeatures.CAPTION.value)
+    tags = results.get(VisualFeatures.TAGS.value) or []
+    for index, timestamp in keyframe.timestamps:
+        yield {
+            "frame": index,
+            "t": round(timestamp, 3),
+            "keyframe": keyframe.frame.index,
+            "carried": index != keyframe.frame.index,
+            "caption": caption["text"] if caption else None,
+            "tags": [t["name"] for t in tags],
+            "error": results.get("error"),
+        }
+
+
+async def analyze_video(
+    path: Path,
+    fps: float = DEFAULT_FPS,
+    selector: Optional[KeyframeSelector] = None,
+    client: Optional[ImageAnalysisClient] = None,
+    features: Sequence[VisualFeatures] = DEFAULT_FEATURES,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    stats: Optional[VideoStats] = None,
+    **options,
+) -> AsyncIterator[dict]:
+    """Yield one timeline row per sampled frame, in time order.
+
+    Decoding runs in a worker thread while up to ``concurrency`` keyframes are
+    being analyzed; rows are released as soon as their keyframe's result is in,
+    and decoding pauses while ``2 * concurrency`` keyframes are waiting.
+    """
+    selector = selector or KeyframeSelector()
+    stats = stats or VideoStats()
+    owns_client = client is None
+    client = client or create_async_vision_client()
+    options = {**DEFAULT_OPTIONS, **options}
+    options.pop("smart_crops_aspect_ratios", None)
+    semaphore = asyncio.Semaphore(concurrency)
+    frames = iter_frames(path, fps)
+    pending: Deque[Keyframe] = deque()
+    try:
+        while True:
+            frame = await asyncio.to_thread(next, frames, None)
+            if frame is None:
+                break
+            stats.frames += 1
+            if selector.is_keyframe(frame):  # always true for the first frame
+                keyframe = Keyframe(frame)
+                keyframe.task = asyncio.ensure_future(
+                    _analyze_frame(client, semaphore, frame.image, features, options)
+                )
+                pending.append(keyframe)
+                stats.keyframes += 1
+            pending[-1].timestamps.append((frame.index, frame.timestamp))
+            # Release finished keyframes at the head, keeping rows in order.
+            # With 2 * concurrency queued, wait for the head instead, so
+            # decoding cannot run arbitrarily far ahead of the service.
+            while len(pending) > 1 and (
+                pending[0].task.done() or len(pending) >= 2 * concurrency
+            ):
+                done = pending.popleft()
+                results = await done.task
+                stats.failed += "error" in results
+                for row in _timeline_rows(done, results):
+                    yield row
+        while pending:
+            done = pending.popleft()
+            results = await done.task
+            stats.failed += "error" in results
+            for row in _timeline_rows(done, results):
+                yield row
+    finally:
+        for keyframe in pending:
+            keyframe.task.cancel()
+        # Stops ffmpeg when the consumer leaves early or analysis raises.
+        try:
+            frames.close()
+        except ValueError:  # a cancelled next() is still running in its thread
+            pass
+        if owns_client:
+            await client.close()
+
+
+def segments(rows: Sequence[dict]) -> List[dict]:
+    """Collapse timeline rows into spans that share one keyframe."""
+    spans: List[dict] = []
+    for row in rows:
+        if spans and spans[-1]["keyframe"] == row["keyframe"]:
+            spans[-1]["end"] = row["t"]
+            continue
+        spans.append(
+            {
+                "start": row["t"],
+                "end": row["t"],
+                "keyframe": row["keyframe"],
+                "caption": row["caption"],
+                "tags": row["tags"],
+                "error": row["error"],
+            }
+        )
+    return spans
+
+
+async def run_video(args) -> VideoStats:
+    stats = VideoStats()
+    selector = KeyframeSelector(args.threshold, args.max_gap)
+    output = args.output.open("w", encoding="utf-8") if args.output else sys.stdout
+    rows = []
+    try:
+        async for row in analyze_video(
+            args.video,
+            args.fps,
+            selector,
+            concurrency=args.concurrency,
+            stats=stats,
+            language=args.language,
+        ):
+            if args.segments:
+                rows.append(row)
+            else:
+                output.write(json.dumps(row) + "\n")
+        for span in segments(rows):
+            output.write(json.dumps(span) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("video", type=Path)
+    parser.add_argument("--fps", type=float, default=DEFAULT_FPS, help="sampling rate")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="difference that makes a new keyframe (0-1)",
+    )
+    parser.add_argument(
+        "--max-gap",
+        type=float,
+        default=DEFAULT_MAX_GAP_S,
+        help="seconds after which a keyframe is forced",
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--language", default="en")
+    parser.add_argument(
+        "--segments", action="store_true", help="one row per keyframe span"
+    )
+    parser.add_argument("-o", "--output", type=Path, help="JSONL file")
+    args = parser.parse_args()
+
+    stats = asyncio.run(run_video(args))
+    stats.print()
+
+
+if __name__ == "__main__":
+    main()
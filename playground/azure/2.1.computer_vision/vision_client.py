@@ -0,0 +1,52 @@
+"""
+Azure AI Vision - shared client factories
+"""
+
+import os
+
+from azure.ai.vision.imageanalysis import ImageAnalysisClient
+from azure.ai.vision.imageanalysis.aio import (
+    ImageAnalysisClient as AsyncImageAnalysisClient,
+)
+from azure.cognitiveservices.vision.computervision import ComputerVisionClient
+from azure.core.credentials import AzureKeyCredential
+from msrest.authentication import CognitiveServicesCredentials
+
+try:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+except ImportError:
+    pass
+
+AZURE_VISION_ENDPOINT = os.getenv("AZURE_VISION_ENDPOINT")
+AZURE_VISION_KEY = os.getenv("AZURE_VISION_KEY")
+
+
+def _require_credentials() -> None:
+    if not AZURE_VISION_ENDPOINT or not AZURE_VISION_KEY:
+        raise EnvironmentError("Azure Vision endpoint or key is missing.")
+
+
+def create_vision_client() -> ImageAnalysisClient:
+    """Initialize and return the Image Analysis client."""
+    _require_credentials()
+    return ImageAnalysisClient(
+        endpoint=AZURE_VISION_ENDPOINT, credential=AzureKeyCredential(AZURE_VISION_KEY)
+    )
+
+
+def create_async_vision_client() -> AsyncImageAnalysisClient:
+    """Initialize and return the async Image Analysis client."""
+    _require_credentials()
+    return AsyncImageAnalysisClient(
+        endpoint=AZURE_VISION_ENDPOINT, credential=AzureKeyCredential(AZURE_VISION_KEY)
+    )
+
+
+def create_computer_vision_client() -> ComputerVisionClient:
+    """Initialize and return the Computer Vision (Read/OCR) client."""
+    _require_credentials()
+    return ComputerVisionClient(
+        AZURE_VISION_ENDPOINT, CognitiveServicesCredentials(AZURE_VISION_KEY)
+    )
@@ -1,3 +1,4 @@
+import argparse
 import os
 import uuid
 import time
@@ -10,14 +11,22 @@ from azure.cognitiveservices.vision.customvision.prediction import (
     CustomVisionPredictionClient,
 )
 from azure.cognitiveservices.vision.customvision.training.models import (
-    ImageFileCreateBatch,
-    ImageFileCreateEntry,
     Tag,
     Project,
     Iteration,
 )
 from msrest.authentication import ApiKeyCredentials
 
+from training_sync import (
+    TrainingSetSync,
+    ensure_tags,
+    get_or_create_project,
+    latest_trained_iteration,
+    publish_and_prune,
+    start_training,
+)
+from training_upload import TrainingImageUploader, UploadItem
+
 try:
     from dotenv import load_dotenv
 
@@ -37,6 +46,7 @@ PREDICTION_RESOURCE_ID: Optional[str] = os.getenv(
 )
 
 PUBLISH_NAME: str = "classifyModel"
+PROJECT_NAME: str = "FlowerClassifier"  # kept across runs with --incremental
 IMAGE_ROOT_DIR: str = os.path.join(
     os.path.dirname(__file__), "image_classification_resources"
 )
@@ -83,25 +93,23 @@ def create_and_tag_project(
     return project, hemlock_tag, cherry_tag
 
 
-def load_images_for_tag(
-    tag_name: str, count: int, tag_id: str
-) -> List[ImageFileCreateEntry]:
-    entries: List[ImageFileCreateEntry] = []
+def load_images_for_tag(tag_name: str, count: int, tag_id: str) -> List[UploadItem]:
+    items: List[UploadItem] = []
     for i in range(1, count + 1):
         file_path = os.path.join(
             IMAGE_ROOT_DIR,
             tag_name.replace(" ", "_"),
             f"{tag_name.lower().replace(' ', '_')}_{i}.jpg",
         )
-        with open(file_path, "rb") as f:
-            entries.append(
-                ImageFileCreateEntry(
-                    name=os.path.basename(file_path),
-                    contents=f.read(),
-                    tag_ids=[tag_id],
-                )
+        # Files are read batch by batch during the upload, not here.
+        items.append(
+            UploadItem(
+                path=file_path,
+                name=os.path.relpath(file_path, IMAGE_ROOT_DIR),
+                tag_ids=[tag_id],
             )
-    return entries
+        )
+    return items
 
 
 def upload_images(
@@ -111,39 +119,75 @@ def upload_images(
     cherry_tag: Tag,
 ) -> None:
     print("📤 Uploading images...")
-    images: List[ImageFileCreateEntry] = []
+    images: List[UploadItem] = []
     images.extend(load_images_for_tag("Hemlock", 10, hemlock_tag.id))
     images.extend(load_images_for_tag("Japanese Cherry", 10, cherry_tag.id))
 
-    upload_result = trainer.create_images_from_files(
-        project_id, ImageFileCreateBatch(images=images)
-    )
-    if not upload_result.is_batch_successful:
+    uploader = TrainingImageUploader(trainer, project_id)
+    try:
+        stats = uploader.upload(images)
+    finally:
+        uploader.close()
+    if stats.failed:
         raise RuntimeError(
-            "❌ Image upload failed: "
-            + ", ".join([img.status for img in upload_result.images])
+            f"❌ {stats.failed} image(s) failed to upload; "
+            f"statuses are in {uploader.manifest.path}"
         )
 
 
 def train_and_publish_model(
-    trainer: CustomVisionTrainingClient, project: Project
+    trainer: CustomVisionTrainingClient,
+    project: Project,
+    iteration: Optional[Iteration] = None,
 ) -> Iteration:
     print("🧠 Training model...")
-    # start training
+    # start training, unless the caller already did
     # iteration is an async operation that returns an Iteration object which contains the training status
-    iteration: Iteration = trainer.train_project(project.id)
+    if iteration is None:
+        iteration = trainer.train_project(project.id)
     while iteration.status != "Completed":
         print(f"⏳ Training status: {iteration.status}... waiting 10s")
         time.sleep(10)
         iteration = trainer.get_iteration(project.id, iteration.id)
 
     print("✅ Training complete. Publishing...")
-    trainer.publish_iteration(
-        project.id, iteration.id, PUBLISH_NAME, PREDICTION_RESOURCE_ID
+    publish_and_prune(
+        trainer, project.id, iteration.id, PUBLISH_NAME, PREDICTION_RESOURCE_ID
     )
     return iteration
 
 
+def sync_project(trainer: CustomVisionTrainingClient) -> Project:
+    """Bring the kept project up to date; train only if its images changed."""
+    print("🔄 Syncing training set...")
+    project = get_or_create_project(trainer, PROJECT_NAME)
+    tags = ensure_tags(trainer, project.id, ["Hemlock", "Japanese Cherry"])
+    images: List[UploadItem] = []
+    images.extend(load_images_for_tag("Hemlock", 10, tags["Hemlock"].id))
+    images.extend(
+        load_images_for_tag("Japanese Cherry", 10, tags["Japanese Cherry"].id)
+    )
+    plan, stats = TrainingSetSync(trainer, project.id).sync(images)
+    print(f"  {plan.summary()}")
+    if stats.failed:
+        raise RuntimeError(f"❌ {stats.failed} image(s) failed to upload.")
+
+    # Ask the service rather than trusting the plan: an earlier run may have
+    # stopped between uploading and training.
+    iteration = start_training(trainer, project.id)
+    if iteration is not None:
+        train_and_publish_model(trainer, project, iteration)
+        return project
+    iteration = latest_trained_iteration(trainer, project.id)
+    if iteration.publish_name != PUBLISH_NAME:
+        publish_and_prune(
+            trainer, project.id, iteration.id, PUBLISH_NAME, PREDICTION_RESOURCE_ID
+        )
+    else:
+        print("✅ Training set unchanged; keeping the published iteration.")
+    return project
+
+
 def run_prediction(predictor: CustomVisionPredictionClient, project_id: str) -> None:
     print("🔍 Running prediction on test image...")
     test_image_path = os.path.join(IMAGE_ROOT_DIR, "Test", "test_image.jpg")
@@ -155,11 +199,22 @@ def run_prediction(predictor: CustomVisionPredictionClient, project_id: str) ->
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"keep the {PROJECT_NAME!r} project and sync only what changed",
+    )
+    args = parser.parse_args()
+
     trainer = get_trainer()
-    clean_all_projects(trainer)
-    project, hemlock_tag, cherry_tag = create_and_tag_project(trainer)
-    upload_images(trainer, project.id, hemlock_tag, cherry_tag)
-    train_and_publish_model(trainer, project)
+    if args.incremental:
+        project = sync_project(trainer)
+    else:
+        clean_all_projects(trainer)
+        project, hemlock_tag, cherry_tag = create_and_tag_project(trainer)
+        upload_images(trainer, project.id, hemlock_tag, cherry_tag)
+        train_and_publish_model(trainer, project)
     predictor = get_predictor()
     run_prediction(predictor, project.id)
 
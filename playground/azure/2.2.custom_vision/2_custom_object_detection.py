@@ -1,7 +1,8 @@
+import argparse
 import os
 import time
 import uuid
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 from azure.cognitiveservices.vision.customvision.training import (
     CustomVisionTrainingClient,
@@ -10,8 +11,6 @@ from azure.cognitiveservices.vision.customvision.prediction import (
     CustomVisionPredictionClient,
 )
 from azure.cognitiveservices.vision.customvision.training.models import (
-    ImageFileCreateEntry,
-    ImageFileCreateBatch,
     Region,
     Tag,
     Iteration,
@@ -19,6 +18,16 @@ from azure.cognitiveservices.vision.customvision.training.models import (
 )
 from msrest.authentication import ApiKeyCredentials
 
+from training_sync import (
+    TrainingSetSync,
+    ensure_tags,
+    get_or_create_project,
+    latest_trained_iteration,
+    publish_and_prune,
+    start_training,
+)
+from training_upload import UPLOADED, TrainingImageUploader, UploadItem
+
 try:
     from dotenv import load_dotenv
 
@@ -36,6 +45,7 @@ PREDICTION_KEY = os.getenv("AZURE_CUSTOMVISION_PREDICTION_KEY")
 PREDICTION_RESOURCE_ID = os.getenv("AZURE_CUSTOMVISION_PREDICTION_RESOURCE_ID")
 
 PUBLISH_NAME = "detectModel"
+PROJECT_NAME = "ObjectDetection"  # kept across runs with --incremental
 IMAGE_DIR = os.path.join(os.path.dirname(__file__), "object_detection_resources")
 
 
@@ -66,16 +76,20 @@ def cleanup_projects(trainer: CustomVisionTrainingClient) -> None:
         trainer.delete_project(project.id)
 
 
-def create_project_with_tags(
-    trainer: CustomVisionTrainingClient,
-) -> Tuple[Project, Tag, Tag]:
-    domain = next(
-        d
+def get_detection_domain_id(trainer: CustomVisionTrainingClient) -> str:
+    return next(
+        d.id
         for d in trainer.get_domains()
         if d.type == "ObjectDetection" and d.name == "General"
     )
+
+
+def create_project_with_tags(
+    trainer: CustomVisionTrainingClient,
+) -> Tuple[Project, Tag, Tag]:
+    domain_id = get_detection_domain_id(trainer)
     project_name = f"ObjectDetection-{uuid.uuid4()}"
-    project = trainer.create_project(project_name, domain_id=domain.id)
+    project = trainer.create_project(project_name, domain_id=domain_id)
     fork_tag = trainer.create_tag(project.id, "fork")
     scissors_tag = trainer.create_tag(project.id, "scissors")
     return project, fork_tag, scissors_tag
@@ -83,22 +97,17 @@ def create_project_with_tags(
 
 def prepare_images_with_regions(
     label: str, tag_id: str, region_data: Dict[str, List[float]], base_dir: str
-) -> List[ImageFileCreateEntry]:
-    entries: List[ImageFileCreateEntry] = []
+) -> List[UploadItem]:
+    entries: List[UploadItem] = []
     label_folder = os.path.join(base_dir, label)
 
     for file_name, (left, top, width, height) in region_data.items():
         image_path = os.path.join(label_folder, f"{file_name}.jpg")
         if not os.path.isfile(image_path):
             raise FileNotFoundError(f"Missing image: {image_path}")
-        with open(image_path, "rb") as f:
-            region = Region(
-                tag_id=tag_id, left=left, top=top, width=width, height=height
-            )
-            entry = ImageFileCreateEntry(
-                name=file_name, contents=f.read(), regions=[region]
-            )
-            entries.append(entry)
+        region = Region(tag_id=tag_id, left=left, top=top, width=width, height=height)
+        # Files are read batch by batch during the upload, not here.
+        entries.append(UploadItem(path=image_path, name=file_name, regions=[region]))
     return entries
 
 
@@ -117,29 +126,77 @@ def upload_images(
         "scissors", scissors_tag.id, scissors_regions, IMAGE_DIR
     )
 
-    upload_result = trainer.create_images_from_files(
-        project_id, ImageFileCreateBatch(images=entries)
-    )
-    if not upload_result.is_batch_successful:
-        for img in upload_result.images:
-            print(f"Failed: {img.status}")
+    uploader = TrainingImageUploader(trainer, project_id)
+    try:
+        stats = uploader.upload(entries)
+    finally:
+        uploader.close()
+    if stats.failed:
+        for name, entry in uploader.manifest.entries(project_id).items():
+            if entry["status"] not in UPLOADED:
+                print(f"Failed: {name}: {entry['status']}")
         raise RuntimeError("❌ Image upload failed.")
 
 
-def train_model(trainer: CustomVisionTrainingClient, project_id: str) -> Iteration:
+def train_model(
+    trainer: CustomVisionTrainingClient,
+    project_id: str,
+    iteration: Optional[Iteration] = None,
+) -> Iteration:
+    """Train (or wait for ``iteration``, already started), then publish it."""
     print("🧠 Training model...")
-    iteration = trainer.train_project(project_id)
+    if iteration is None:
+        iteration = trainer.train_project(project_id)
     while iteration.status != "Completed":
         print(f"⏳ Training status: {iteration.status} (waiting 2s)")
         time.sleep(2)
         iteration = trainer.get_iteration(project_id, iteration.id)
     print("✅ Training complete.")
-    trainer.publish_iteration(
-        project_id, iteration.id, PUBLISH_NAME, PREDICTION_RESOURCE_ID
+    publish_and_prune(
+        trainer, project_id, iteration.id, PUBLISH_NAME, PREDICTION_RESOURCE_ID
     )
     return iteration
 
 
+def sync_project(
+    trainer: CustomVisionTrainingClient,
+    fork_regions: Dict[str, List[float]],
+    scissors_regions: Dict[str, List[float]],
+) -> Project:
+    """Bring the kept project up to date; train only if its images changed."""
+    print("🔄 Syncing tagged images...")
+    project = get_or_create_project(
+        trainer, PROJECT_NAME, domain_id=get_detection_domain_id(trainer)
+    )
+    tags = ensure_tags(trainer, project.id, ["fork", "scissors"])
+    entries = []
+    entries += prepare_images_with_regions(
+        "fork", tags["fork"].id, fork_regions, IMAGE_DIR
+    )
+    entries += prepare_images_with_regions(
+        "scissors", tags["scissors"].id, scissors_regions, IMAGE_DIR
+    )
+    plan, stats = TrainingSetSync(trainer, project.id).sync(entries)
+    print(f"  {plan.summary()}")
+    if stats.failed:
+        raise RuntimeError("❌ Image upload failed.")
+
+    # Ask the service rather than trusting the plan: an earlier run may have
+    # stopped between uploading and training.
+    iteration = start_training(trainer, project.id)
+    if iteration is not None:
+        train_model(trainer, project.id, iteration)
+        return project
+    iteration = latest_trained_iteration(trainer, project.id)
+    if iteration.publish_name != PUBLISH_NAME:
+        publish_and_prune(
+            trainer, project.id, iteration.id, PUBLISH_NAME, PREDICTION_RESOURCE_ID
+        )
+    else:
+        print("✅ Training set unchanged; keeping the published iteration.")
+    return project
+
+
 def predict(predictor: CustomVisionPredictionClient, project_id: str) -> None:
     print("🔍 Predicting...")
     test_image_path = os.path.join(IMAGE_DIR, "test", "test_image.jpg")
@@ -156,24 +213,35 @@ def predict(predictor: CustomVisionPredictionClient, project_id: str) -> None:
 
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"keep the {PROJECT_NAME!r} project and sync only what changed",
+    )
+    args = parser.parse_args()
+
     trainer, predictor = get_clients()
-    cleanup_projects(trainer)
-    project, fork_tag, scissors_tag = create_project_with_tags(trainer)
 
     from object_detection_resources.region_data import (
         fork_image_regions,
         scissors_image_regions,
     )
 
-    upload_images(
-        trainer,
-        project.id,
-        fork_tag,
-        scissors_tag,
-        fork_image_regions,
-        scissors_image_regions,
-    )
-    train_model(trainer, project.id)
+    if args.incremental:
+        project = sync_project(trainer, fork_image_regions, scissors_image_regions)
+    else:
+        cleanup_projects(trainer)
+        project, fork_tag, scissors_tag = create_project_with_tags(trainer)
+        upload_images(
+            trainer,
+            project.id,
+            fork_tag,
+            scissors_tag,
+            fork_image_regions,
+            scissors_image_regions,
+        )
+        train_model(trainer, project.id)
     predict(predictor, project.id)
 
 
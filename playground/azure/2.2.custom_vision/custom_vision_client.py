@@ -0,0 +1,93 @@
+"""
+Azure Custom Vision - shared client factories and retry handling
+"""
+
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Optional, TypeVar
+
+from azure.cognitiveservices.vision.customvision.prediction import (
+    CustomVisionPredictionClient,
+)
+from azure.cognitiveservices.vision.customvision.training import (
+    CustomVisionTrainingClient,
+)
+from msrest.authentication import ApiKeyCredentials
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+try:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+except ImportError:
+    pass
+
+TRAINING_ENDPOINT = os.getenv("AZURE_CUSTOMVISION_TRAINING_ENDPOINT")
+TRAINING_KEY = os.getenv("AZURE_CUSTOMVISION_TRAINING_KEY")
+PREDICTION_ENDPOINT = os.getenv("AZURE_CUSTOMVISION_PREDICTION_ENDPOINT")
+PREDICTION_KEY = os.getenv("AZURE_CUSTOMVISION_PREDICTION_KEY")
+
+MAX_ATTEMPTS = 5
+RETRYABLE_STATUS = (None, 429, 500, 503)  # None: the request never got an answer
+
+T = TypeVar("T")
+
+
+def create_training_client() -> CustomVisionTrainingClient:
+    """Initialize and return the Custom Vision training client."""
+    if not TRAINING_ENDPOINT or not TRAINING_KEY:
+        raise EnvironmentError("Missing training endpoint or key.")
+    return CustomVisionTrainingClient(
+        endpoint=TRAINING_ENDPOINT,
+        credentials=ApiKeyCredentials(in_headers={"Training-key": TRAINING_KEY}),
+    )
+
+
+def create_prediction_client() -> CustomVisionPredictionClient:
+    """Initialize and return the Custom Vision prediction client."""
+    if not PREDICTION_ENDPOINT or not PREDICTION_KEY:
+        raise EnvironmentError("Missing prediction endpoint or key.")
+    return CustomVisionPredictionClient(
+        endpoint=PREDICTION_ENDPOINT,
+        credentials=ApiKeyCredentials(in_headers={"Prediction-key": PREDICTION_KEY}),
+    )
+
+
+def retry_after_seconds(response) -> Optional[float]:
+    """Retry-After as seconds; it may be delta-seconds or an HTTP-date."""
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def call_with_retry(fn: Callable[[], T], max_attempts: int = MAX_ATTEMPTS) -> T:
+    """Run ``fn`` (one training API call), retrying throttling and 5xx responses.
+
+    Waits for Retry-After when the service sends one, otherwise backs off
+    exponentially from one second.
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return fn()
+        except (HttpOperationError, ClientRequestError) as e:
+            response = getattr(e, "response", None)
+            status = getattr(response, "status_code", None)
+            if status not in RETRYABLE_STATUS or attempt == max_attempts:
+                raise
+            delay = retry_after_seconds(response)
+            if delay is None:
+                delay = 2 ** (attempt - 1)
+            time.sleep(delay + random.uniform(0, 0.25))
+    raise AssertionError("unreachable")
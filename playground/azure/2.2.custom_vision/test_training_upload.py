@@ -0,0 +1,114 @@
+"""
+Azure Custom Vision - result pairing checks for training_upload
+Run from this folder with ``python -m unittest test_training_upload``.
+"""
+
+import tempfile
+import unittest
+from pathlib import Path
+
+from azure.cognitiveservices.vision.customvision.training.models import (
+    ImageCreateSummary,
+)
+
+from training_upload import (
+    TrainingImageUploader,
+    UploadItem,
+    UploadManifest,
+    UploadStats,
+    pair_results,
+)
+
+# create_images_from_files response for a two-image Hemlock batch: the names
+# come back quoted, without their folder and not in request order.
+RECORDED_SUMMARY = {
+    "isBatchSuccessful": False,
+    "images": [
+        {
+            "sourceUrl": '"hemlock_10.jpg"',
+            "status": "OKDuplicate",
+            "image": {
+                "id": "4d8a1b4e-3c1f-4c59-9b57-1f0d6f2e8a10",
+                "created": "2024-05-02T09:14:31.123Z",
+                "width": 1024,
+                "height": 768,
+            },
+        },
+        {
+            "sourceUrl": '"hemlock_1.jpg"',
+            "status": "OK",
+            "image": {
+                "id": "0b0c6a52-7a0e-4f0e-8f55-2a7c2b7e9d01",
+                "created": "2024-05-02T09:14:31.456Z",
+                "width": 800,
+                "height": 600,
+            },
+        },
+    ],
+}
+
+
+def recorded_results(*source_urls):
+    summary = ImageCreateSummary.deserialize(RECORDED_SUMMARY)
+    for result, source_url in zip(summary.images, source_urls):
+        result.source_url = source_url
+    return summary.images
+
+
+class FakeTrainer:
+    def __init__(self, summary):
+        self.summary = summary
+
+    def create_images_from_files(self, project_id, batch):
+        return self.summary
+
+
+class PairResultsTest(unittest.TestCase):
+    def test_quoted_basenames_match_folder_names(self):
+        created = ImageCreateSummary.deserialize(RECORDED_SUMMARY).images
+        names = ["Hemlock/hemlock_1.jpg", "Hemlock/hemlock_10.jpg"]
+        paired = pair_results(names, created)
+        self.assertEqual([r.status for r in paired], ["OK", "OKDuplicate"])
+
+    def test_ambiguous_basenames_fall_back_to_position(self):
+        created = recorded_results('"1.jpg"', '"1.jpg"')
+        paired = pair_results(["Hemlock/1.jpg", "Cherry/1.jpg"], created)
+        self.assertEqual(paired, created)
+
+    def test_unanswered_entry_is_none(self):
+        created = recorded_results('"hemlock_10.jpg"')[:1]
+        names = ["Hemlock/hemlock_1.jpg", "Hemlock/hemlock_10.jpg"]
+        paired = pair_results(names, created)
+        self.assertIsNone(paired[0])
+        self.assertIs(paired[1], created[0])
+
+    def test_send_records_statuses_from_summary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            batch = []
+            for name in ["Hemlock/hemlock_1.jpg", "Hemlock/hemlock_10.jpg"]:
+                path = root / name
+                path.parent.mkdir(exist_ok=True)
+                path.write_bytes(name.encode())
+                item = UploadItem(str(path), name, tag_ids=["hemlock"])
+                item.stat()
+                batch.append(item)
+            manifest = UploadManifest(root / "manifest.json")
+            summary = ImageCreateSummary.deserialize(RECORDED_SUMMARY)
+            uploader = TrainingImageUploader(FakeTrainer(summary), "p", manifest)
+            try:
+                stats = UploadStats()
+                uploader._send(batch, stats)
+            finally:
+                uploader.close()
+            entries = manifest.entries("p")
+            self.assertEqual(entries["Hemlock/hemlock_1.jpg"]["status"], "OK")
+            self.assertEqual(
+                entries["Hemlock/hemlock_10.jpg"]["image_id"],
+                "4d8a1b4e-3c1f-4c59-9b57-1f0d6f2e8a10",
+            )
+            self.assertEqual((stats.uploaded, stats.duplicates), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
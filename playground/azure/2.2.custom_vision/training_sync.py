@@ -0,0 +1,349 @@
+"""
+Azure Custom Vision - Incremental Training-Set Sync
+Keeps one project across runs instead of rebuilding it. The project's tagged
+images are fetched once and compared with the local files by content hash
+(through the upload manifest) and by tag/region data: only new or changed
+images are uploaded, label-only changes are applied in place, images removed
+locally are deleted, and training is needed only when something changed.
+"""
+
+import hashlib
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from azure.cognitiveservices.vision.customvision.training import (
+    CustomVisionTrainingClient,
+)
+from azure.cognitiveservices.vision.customvision.training.models import (
+    CustomVisionErrorException,
+    Image,
+    ImageRegionCreateEntry,
+    ImageTagCreateEntry,
+    Iteration,
+    Project,
+    Tag,
+)
+
+from training_upload import (
+    DEFAULT_WORKERS,
+    TrainingImageUploader,
+    UploadItem,
+    UploadManifest,
+)
+
+PAGE_SIZE = 256  # largest page get_tagged_images returns
+DELETE_BATCH = 256  # image ids per delete_images call
+LABEL_BATCH = 64  # entries per create_image_tags / create_image_regions call
+REGION_TOLERANCE = 1e-4  # the service does not round-trip region floats exactly
+TRAINING_NOT_NEEDED = (
+    "BadRequestTrainingNotNeeded",
+    "BadRequestTrainingNotNeededButTrainingPipelineUpdated",
+)
+
+Labels = Tuple[tuple, ...]
+
+
+def get_or_create_project(
+    trainer: CustomVisionTrainingClient, name: str, domain_id: Optional[str] = None
+) -> Project:
+    for project in trainer.get_projects():
+        if project.name == name:
+            return project
+    return trainer.create_project(name, domain_id=domain_id)
+
+
+def ensure_tags(
+    trainer: CustomVisionTrainingClient, project_id: str, names: Sequence[str]
+) -> Dict[str, Tag]:
+    tags = {tag.name: tag for tag in trainer.get_tags(project_id)}
+    for name in names:
+        if name not in tags:
+            tags[name] = trainer.create_tag(project_id, name)
+    return tags
+
+
+def latest_trained_iteration(
+    trainer: CustomVisionTrainingClient, project_id: str
+) -> Optional[Iteration]:
+    completed = [
+        it for it in trainer.get_iterations(project_id) if it.status == "Completed"
+    ]
+    return max(completed, key=lambda it: it.trained_at, default=None)
+
+
+def start_training(
+    trainer: CustomVisionTrainingClient, project_id: str
+) -> Optional[Iteration]:
+    """Start training, or return None if the latest iteration is up to date.
+
+    The service compares the project's images with those of its last trained
+    iteration, so a run interrupted after uploading still trains next time.
+    If an earlier run left training in progress, that iteration is returned.
+    """
+    try:
+        return trainer.train_project(project_id)
+    except CustomVisionErrorException as e:
+        code = getattr(e.error, "code", None)
+        if code in TRAINING_NOT_NEEDED:
+            return None
+        if code == "BadRequestTrainingAlreadyInProgress":
+            for iteration in trainer.get_iterations(project_id):
+                if iteration.status == "Training":
+                    return iteration
+        raise
+
+
+def publish_and_prune(
+    trainer: CustomVisionTrainingClient,
+    project_id: str,
+    iteration_id: str,
+    publish_name: str,
+    prediction_resource_id: str,
+) -> None:
+    """Publish ``iteration_id`` as ``publish_name``, then drop older iterations.
+
+    The name is released only right before it is reused, so predictions keep
+    working while a new iteration trains. Every training adds an iteration
+    and a project holds a limited number, so once the publish succeeds the
+    iterations left unpublished are deleted; ones published under another
+    name, or still training, are kept.
+    """
+    others = [it for it in trainer.get_iterations(project_id) if it.id != iteration_id]
+    for iteration in others:
+        if iteration.publish_name == publish_name:
+            trainer.unpublish_iteration(project_id, iteration.id)
+            iteration.publish_name = None
+    trainer.publish_iteration(
+        project_id, iteration_id, publish_name, prediction_resource_id
+    )
+    for iteration in others:
+        if not iteration.publish_name and iteration.status != "Training":
+            trainer.delete_iteration(project_id, iteration.id)
+
+
+def _region_key(region) -> tuple:
+    return (region.tag_id, region.left, region.top, region.width, region.height)
+
+
+def local_labels(item: UploadItem) -> Labels:
+    if item.regions:
+        return tuple(sorted(_region_key(r) for r in item.regions))
+    return tuple(sorted((tag_id,) for tag_id in item.tag_ids))
+
+
+def remote_labels(image: Image) -> Labels:
+    if image.regions:
+        return tuple(sorted(_region_key(r) for r in image.regions))
+    return tuple(sorted((t.tag_id,) for t in image.tags or []))
+
+
+def labels_match(item: UploadItem, image: Image) -> bool:
+    """Same tags, and regions equal within ``REGION_TOLERANCE``."""
+    local, remote = local_labels(item), remote_labels(image)
+    return len(local) == len(remote) and all(
+        a[0] == b[0]
+        and all(abs(x - y) <= REGION_TOLERANCE for x, y in zip(a[1:], b[1:]))
+        for a, b in zip(local, remote)
+    )
+
+
+@dataclass
+class SyncPlan:
+    """What it takes to make the project match the local files."""
+
+    unchanged: List[str] = field(default_factory=list)
+    upload: List[UploadItem] = field(default_factory=list)
+    relabel: List[Tuple[UploadItem, Image]] = field(default_factory=list)
+    delete: Dict[str, str] = field(default_factory=dict)  # image id -> name
+    unknown: int = 0  # remote images the manifest does not know about
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.upload or self.relabel or self.delete)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.unchanged)} unchanged, {len(self.upload)} to upload, "
+            f"{len(self.relabel)} to relabel, {len(self.delete)} to delete, "
+            f"{self.unknown} untracked"
+        )
+
+
+@dataclass
+class SyncStats:
+    uploaded: int = 0
+    relabelled: int = 0
+    deleted: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+
+class TrainingSetSync:
+    """Diffs local ``UploadItem``s against one project and applies the diff.
+
+    The manifest written by ``TrainingImageUploader`` maps each image name to
+    the image id and SHA-256 it was uploaded with; files whose size and mtime
+    still match it are not read again. Remote images the manifest does not
+    know about are left alone.
+    """
+
+    def __init__(
+        self,
+        trainer: CustomVisionTrainingClient,
+        project_id: str,
+        manifest: Optional[UploadManifest] = None,
+        max_workers: int = DEFAULT_WORKERS,
+    ):
+        self.trainer = trainer
+        self.project_id = project_id
+        self.manifest = manifest or UploadManifest()
+        self.max_workers = max_workers
+
+    def remote_images(self) -> Dict[str, Image]:
+        """Every tagged image in the project, fetched page by page once."""
+        images: Dict[str, Image] = {}
+        skip = 0
+        while True:
+            page = self.trainer.get_tagged_images(
+                self.project_id, take=PAGE_SIZE, skip=skip
+            )
+            images.update((image.id, image) for image in page)
+            if len(page) < PAGE_SIZE:
+                return images
+            skip += PAGE_SIZE
+
+    def _content_hash(self, item: UploadItem, entry: Optional[dict]) -> str:
+        if entry and (entry["size"], entry["mtime_ns"]) == (item.size, item.mtime_ns):
+            return entry["sha256"]
+        return hashlib.sha256(Path(item.path).read_bytes()).hexdigest()
+
+    def plan(
+        self, items: Iterable[UploadItem], remote: Optional[Dict[str, Image]] = None
+    ) -> SyncPlan:
+        remote = self.remote_images() if remote is None else remote
+        entries = self.manifest.entries(self.project_id)
+        plan = SyncPlan()
+        local = set()
+        for item in items:
+            local.add(item.name)
+            item.stat()
+            entry = entries.get(item.name)
+            image = remote.get(entry["image_id"]) if entry else None
+            if image is None:
+                plan.upload.append(item)
+                continue
+            if self._content_hash(item, entry) != entry["sha256"]:
+                plan.delete[image.id] = item.name
+                plan.upload.append(item)
+                continue
+            if (entry["size"], entry["mtime_ns"]) != (item.size, item.mtime_ns):
+                # Touched but identical: remember the new stat to skip hashing.
+                self.manifest.record(
+                    self.project_id,
+                    item,
+                    entry["status"],
+                    image_id=entry["image_id"],
+                    sha256=entry["sha256"],
+                )
+            if not labels_match(item, image):
+                plan.relabel.append((item, image))
+            else:
+                plan.unchanged.append(item.name)
+        tracked = {entry["image_id"] for entry in entries.values()}
+        kept = {entries[name]["image_id"] for name in plan.unchanged}
+        kept.update(image.id for _, image in plan.relabel)
+        for name, entry in entries.items():
+            if name not in local and entry["image_id"] in remote:
+                plan.delete[entry["image_id"]] = name
+        # Identical files share one image; keep it while any of them remains.
+        plan.delete = {i: n for i, n in plan.delete.items() if i not in kept}
+        plan.unknown = len(set(remote) - tracked)
+        return plan
+
+    def _relabel(self, pairs: List[Tuple[UploadItem, Image]]) -> None:
+        # Detection images carry tags derived from their regions; only
+        # classification images have their tags replaced directly.
+        tagged = [image for item, image in pairs if not item.regions and image.tags]
+        tag_ids = sorted({t.tag_id for image in tagged for t in image.tags})
+        for start in range(0, len(tagged), LABEL_BATCH):
+            self.trainer.delete_image_tags(
+                self.project_id,
+                [image.id for image in tagged[start : start + LABEL_BATCH]],
+                tag_ids,
+            )
+        region_ids = [r.region_id for _, image in pairs for r in image.regions or []]
+        for start in range(0, len(region_ids), LABEL_BATCH):
+            self.trainer.delete_image_regions(
+                self.project_id, region_ids[start : start + LABEL_BATCH]
+            )
+
+        tags = [
+            ImageTagCreateEntry(image_id=image.id, tag_id=tag_id)
+            for item, image in pairs
+            if not item.regions
+            for tag_id in item.tag_ids
+        ]
+        regions = [
+            ImageRegionCreateEntry(
+                image_id=image.id,
+                tag_id=r.tag_id,
+                left=r.left,
+                top=r.top,
+                width=r.width,
+                height=r.height,
+            )
+            for item, image in pairs
+            for r in item.regions
+        ]
+        for start in range(0, len(tags), LABEL_BATCH):
+            self.trainer.create_image_tags(
+                self.project_id, tags=tags[start : start + LABEL_BATCH]
+            )
+        for start in range(0, len(regions), LABEL_BATCH):
+            self.trainer.create_image_regions(
+                self.project_id, regions=regions[start : start + LABEL_BATCH]
+            )
+
+    def apply(self, plan: SyncPlan) -> SyncStats:
+        """Delete, relabel, then upload; the manifest follows each step."""
+        stats = SyncStats()
+        ids = list(plan.delete)
+        for start in range(0, len(ids), DELETE_BATCH):
+            self.trainer.delete_images(
+                self.project_id, image_ids=ids[start : start + DELETE_BATCH]
+            )
+        self.manifest.forget(self.project_id, plan.delete.values())
+        stats.deleted = len(ids)
+        self.manifest.save()
+
+        if plan.relabel:
+            self._relabel(plan.relabel)
+            stats.relabelled = len(plan.relabel)
+
+        if plan.upload:
+            # Forgotten entries make the uploader send these images again.
+            self.manifest.forget(self.project_id, (i.name for i in plan.upload))
+            uploader = TrainingImageUploader(
+                self.trainer,
+                self.project_id,
+                self.manifest,
+                max_workers=self.max_workers,
+            )
+            try:
+                upload_stats = uploader.upload(plan.upload)
+            finally:
+                uploader.close()
+            stats.uploaded = upload_stats.uploaded + upload_stats.duplicates
+            stats.failed = upload_stats.failed
+        self.manifest.save()
+        return stats
+
+    def sync(self, items: Iterable[UploadItem]) -> Tuple[SyncPlan, SyncStats]:
+        plan = self.plan(items)
+        return plan, self.apply(plan)
@@ -0,0 +1,419 @@
+"""
+Azure Custom Vision - Chunked, Parallel, Resumable Training Image Upload
+Packs training images into batches that respect both the per-batch image limit
+and a byte budget, reads each file only when its batch is sent, uploads several
+batches at once and records every image's status in a local JSON manifest.
+A re-run against the same project sends only images that failed, are missing
+from the manifest or changed on disk since they were uploaded.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from azure.cognitiveservices.vision.customvision.training import (
+    CustomVisionTrainingClient,
+)
+from azure.cognitiveservices.vision.customvision.training.models import (
+    ImageCreateResult,
+    ImageCreateSummary,
+    ImageFileCreateBatch,
+    ImageFileCreateEntry,
+    Region,
+)
+from msrest.exceptions import ClientRequestError, HttpOperationError
+
+from custom_vision_client import call_with_retry, create_training_client
+
+MAX_BATCH_IMAGES = 64  # service limit per create_images_from_files call
+MAX_IMAGE_BYTES = 6 * 1024 * 1024  # service limit per training image
+DEFAULT_BATCH_BYTES = 32 * 1024 * 1024
+DEFAULT_WORKERS = 4
+DEFAULT_MANIFEST_PATH = Path(__file__).resolve().parent / ".upload_manifest.json"
+UPLOADED = ("OK", "OKDuplicate")
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+
+
+@dataclass
+class UploadItem:
+    """One training image: where it lives and how it is labelled.
+
+    ``name`` is the manifest key and the image name sent to the service, so
+    it must be unique within a project.
+    """
+
+    path: str
+    name: str
+    tag_ids: List[str] = field(default_factory=list)
+    regions: List[Region] = field(default_factory=list)
+    size: int = 0
+    mtime_ns: int = 0
+
+    def stat(self) -> None:
+        st = os.stat(self.path)
+        self.size, self.mtime_ns = st.st_size, st.st_mtime_ns
+
+    def entry(self, contents: bytes) -> ImageFileCreateEntry:
+        return ImageFileCreateEntry(
+            name=self.name,
+            contents=contents,
+            tag_ids=self.tag_ids or None,
+            regions=self.regions or None,
+        )
+
+
+def items_from_folder(
+    folder: Union[str, Path], tag_id: str, root: Optional[Union[str, Path]] = None
+) -> List[UploadItem]:
+    """Every image in ``folder`` tagged ``tag_id``, named relative to ``root``."""
+    folder = Path(folder)
+    root = Path(root) if root else folder.parent
+    return [
+        UploadItem(str(p), p.relative_to(root).as_posix(), tag_ids=[tag_id])
+        for p in sorted(folder.iterdir())
+        if p.suffix.lower() in IMAGE_SUFFIXES
+    ]
+
+
+class UploadManifest:
+    """``{project id: {image name: status record}}`` persisted as JSON.
+
+    Saves go through a temporary file and ``os.replace`` so an interrupted
+    run never leaves a truncated manifest behind.
+    """
+
+    def __init__(self, path: Union[str, Path] = DEFAULT_MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._projects: Dict[str, Dict[str, dict]] = {}
+        if self.path.exists():
+            self._projects = json.loads(self.path.read_text(encoding="utf-8"))
+
+    def entries(self, project_id: str) -> Dict[str, dict]:
+        return self._projects.setdefault(project_id, {})
+
+    def is_uploaded(self, project_id: str, item: UploadItem) -> bool:
+        entry = self.entries(project_id).get(item.name)
+        return (
+            entry is not None
+            and entry["status"] in UPLOADED
+            and entry["size"] == item.size
+            and entry["mtime_ns"] == item.mtime_ns
+        )
+
+    def record(
+        self,
+        project_id: str,
+        item: UploadItem,
+        status: str,
+        image_id: Optional[str] = None,
+        sha256: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        with self._lock:
+            self.entries(project_id)[item.name] = {
+                "path": item.path,
+                "size": item.size,
+                "mtime_ns": item.mtime_ns,
+                "sha256": sha256,
+                "status": status,
+                "image_id": image_id,
+                "error": error,
+            }
+
+    def forget(self, project_id: str, names: Iterable[str]) -> None:
+        with self._lock:
+            entries = self.entries(project_id)
+            for name in names:
+                entries.pop(name, None)
+
+    def save(self) -> None:
+        with self._lock:
+            data = json.dumps(self._projects, indent=1, sort_keys=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+def _source_name(source_url: Optional[str]) -> str:
+    # File uploads echo the entry name as source_url, sometimes wrapped in
+    # literal quotes and without the folder part.
+    return (source_url or "").strip().strip('"')
+
+
+def pair_results(
+    names: List[str], created: List[ImageCreateResult]
+) -> List[Optional[ImageCreateResult]]:
+    """The result for each entry name sent in one batch, or None if it has none.
+
+    Matches the full name first, then the basename when it is unique on both
+    sides. If the service answered once per entry, leftover results fill the
+    remaining slots in order.
+    """
+    by_name: Dict[str, ImageCreateResult] = {}
+    by_base: Dict[str, List[ImageCreateResult]] = defaultdict(list)
+    for result in created:
+        key = _source_name(result.source_url)
+        by_name.setdefault(key, result)
+        by_base[PurePosixPath(key).name].append(result)
+    base_counts = Counter(PurePosixPath(name).name for name in names)
+
+    paired: List[Optional[ImageCreateResult]] = []
+    for name in names:
+        result = by_name.get(name)
+        base = PurePosixPath(name).name
+        if result is None and base_counts[base] == 1 and len(by_base[base]) == 1:
+            result = by_base[base][0]
+        paired.append(result)
+
+    if len(created) == len(names) and None in paired:
+        used = {id(result) for result in paired if result is not None}
+        spare = iter([result for result in created if id(result) not in used])
+        paired = [
+            result if result is not None else next(spare, None) for result in paired
+        ]
+    return paired
+
+
+def pack_batches(
+    items: Iterable[UploadItem],
+    max_images: int = MAX_BATCH_IMAGES,
+    max_bytes: int = DEFAULT_BATCH_BYTES,
+) -> Iterator[List[UploadItem]]:
+    """Greedy, order-preserving packing by image count and file size.
+
+    Items must already be ``stat()``-ed; an item larger than ``max_bytes``
+    travels alone.
+    """
+    batch: List[UploadItem] = []
+    batch_bytes = 0
+    for item in items:
+        if batch and (len(batch) == max_images or batch_bytes + item.size > max_bytes):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(item)
+        batch_bytes += item.size
+    if batch:
+        yield batch
+
+
+@dataclass
+class UploadStats:
+    images: int = 0
+    skipped: int = 0
+    uploaded: int = 0
+    duplicates: int = 0
+    failed: int = 0
+    batches: int = 0
+    bytes_sent: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    def print(self) -> None:
+        elapsed = time.perf_counter() - self.started_at
+        print("\n--- Training Image Upload ---", file=sys.stderr)
+        print(
+            f"Images: {self.images} ({self.skipped} already uploaded, "
+            f"{self.uploaded} uploaded, {self.duplicates} duplicates, "
+            f"{self.failed} failed)",
+            file=sys.stderr,
+        )
+        print(
+            f"Batches: {self.batches}, {self.bytes_sent / 1e6:.1f} MB "
+            f"in {elapsed:.2f}s",
+            file=sys.stderr,
+        )
+
+
+class TrainingImageUploader:
+    """Uploads ``UploadItem``s to one project in concurrent, bounded batches.
+
+    At most ``max_workers`` batches are read into memory at any time, so
+    peak memory is about ``max_workers * max_bytes`` however large the
+    training set is.
+    """
+
+    def __init__(
+        self,
+        trainer: Optional[CustomVisionTrainingClient],
+        project_id: str,
+        manifest: Optional[UploadManifest] = None,
+        max_workers: int = DEFAULT_WORKERS,
+        max_images: int = MAX_BATCH_IMAGES,
+        max_bytes: int = DEFAULT_BATCH_BYTES,
+    ):
+        self.trainer = trainer or create_training_client()
+        self.project_id = project_id
+        self.manifest = manifest or UploadManifest()
+        self.max_workers = max_workers
+        self.max_images = min(max_images, MAX_BATCH_IMAGES)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _pending(self, items: Iterable[UploadItem], stats: UploadStats):
+        """Items that still need uploading; records oversized ones as failed."""
+        for item in items:
+            stats.images += 1
+            try:
+                item.stat()
+            except OSError as e:
+                self.manifest.record(self.project_id, item, "ErrorSource", error=str(e))
+                stats.failed += 1
+                continue
+            if self.manifest.is_uploaded(self.project_id, item):
+                stats.skipped += 1
+            elif item.size > MAX_IMAGE_BYTES:
+                self.manifest.record(
+                    self.project_id,
+                    item,
+                    "ErrorImageSize",
+                    error=f"{item.size} bytes exceeds {MAX_IMAGE_BYTES}",
+                )
+                stats.failed += 1
+            else:
+                yield item
+
+    def _send(self, batch: List[UploadItem], stats: UploadStats) -> None:
+        """Read, upload and record one batch; runs in a worker thread."""
+        entries, hashes, outcomes, sent = [], {}, [], 0
+        for item in list(batch):
+            try:
+                contents = Path(item.path).read_bytes()
+            except OSError as e:
+                batch.remove(item)
+                outcomes.append((item, "ErrorSource", None, str(e)))
+                continue
+            hashes[item.name] = hashlib.sha256(contents).hexdigest()
+            entries.append(item.entry(contents))
+            sent += len(contents)
+        try:
+            created = []
+            if entries:
+                summary: ImageCreateSummary = call_with_retry(
+                    lambda: self.trainer.create_images_from_files(
+                        self.project_id, ImageFileCreateBatch(images=entries)
+                    )
+                )
+                created = summary.images or []
+            # An item with no result of its own is recorded as Missing and
+            # retried on the next run.
+            results = pair_results([item.name for item in batch], created)
+            outcomes += [
+                (
+                    item,
+                    result.status if result is not None else "Missing",
+                    getattr(result, "image", None),
+                    None,
+                )
+                for item, result in zip(batch, results)
+            ]
+        except (HttpOperationError, ClientRequestError) as e:
+            outcomes += [(item, "ErrorRequest", None, str(e)) for item in batch]
+
+        with self._lock:
+            stats.batches += 1
+            stats.bytes_sent += sent
+            for item, status, image, error in outcomes:
+                if status == "OK":
+                    stats.uploaded += 1
+                elif status == "OKDuplicate":
+                    stats.duplicates += 1
+                else:
+                    stats.failed += 1
+                self.manifest.record(
+                    self.project_id,
+                    item,
+                    status,
+                    image_id=image.id if image is not None else None,
+                    sha256=hashes.get(item.name),
+                    error=error,
+                )
+        self.manifest.save()
+
+    def upload(self, items: Iterable[UploadItem]) -> UploadStats:
+        """Upload everything not yet in the manifest; never raises per image.
+
+        Failures are recorded in the manifest and counted in the returned
+        stats, so calling ``upload`` again retries exactly those images.
+        """
+        stats = UploadStats()
+        batches = pack_batches(
+            self._pending(items, stats), self.max_images, self.max_bytes
+        )
+        running: set = set()
+
+        def refill() -> None:
+            for batch in batches:
+                running.add(self._executor.submit(self._send, batch, stats))
+                if len(running) >= self.max_workers:
+                    return
+
+        try:
+            refill()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.discard(future)
+                    future.result()
+                refill()
+        finally:
+            self.manifest.save()
+        return stats
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("project_id")
+    parser.add_argument(
+        "folders",
+        nargs="+",
+        type=Path,
+        help="one folder per tag; the folder name (underscores as spaces) is the tag",
+    )
+    parser.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST_PATH)
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument(
+        "--batch-mb",
+        type=float,
+        default=DEFAULT_BATCH_BYTES / (1024 * 1024),
+        help="byte budget per batch",
+    )
+    args = parser.parse_args()
+
+    trainer = create_training_client()
+    tags = {tag.name: tag for tag in trainer.get_tags(args.project_id)}
+    items: List[UploadItem] = []
+    for folder in args.folders:
+        name = folder.name.replace("_", " ")
+        tag = tags.get(name) or trainer.create_tag(args.project_id, name)
+        items += items_from_folder(folder, tag.id)
+
+    uploader = TrainingImageUploader(
+        trainer,
+        args.project_id,
+        UploadManifest(args.manifest),
+        max_workers=args.workers,
+        max_bytes=int(args.batch_mb * 1024 * 1024),
+    )
+    try:
+        stats = uploader.upload(items)
+    finally:
+        uploader.close()
+    stats.print()
+    sys.exit(1 if stats.failed else 0)
+
+
+if __name__ == "__main__":
+    main()